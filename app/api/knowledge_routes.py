@@ -1,17 +1,37 @@
 import os
-import shutil
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app.services.rag_service import RAGService
+from app.services.rag_service import RAGService, query_embedding_cache, retrieval_gate
 from app.config.database import get_db
 from app.repository.knowledge_repository import KnowledgeRepository
-from app.schemas.knowledge_schema import KnowledgeResponse
-from app.services.file_parser_service import FileParserService
-from app.services.llm_service import LLMService
+from app.repository.ingestion_job_repository import IngestionJobRepository
+from app.models.ingestion_job import IngestionStatus
+from app.repository.document_repository import DocumentRepository
+from app.repository.assistant_repository import AssistantRepository
+from app.schemas.knowledge_schema import (
+    DocumentResponse,
+    IngestionJobResponse,
+    IngestionJobProgress,
+)
+from app.services.file_parser_service import SUPPORTED_FILE_TYPES
+from app.services.ingestion_service import ingestion_queue
+from app.services.upload_service import UploadService
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_service import query_embedding_batcher
+from app.services.answer_cache import answer_cache
+from app.services.memory_vector_index import memory_vector_index
+from app.services.embedding_migration_service import (
+    EmbeddingMigrationService,
+    embedding_migration_runner,
+)
 from app.services.knowledge_service import KnowledgeService
 from app.services.auth import get_current_user 
+from app.config.settings import settings
+from app.utils.pagination import decode_cursor, next_page_cursor
+from app.utils.helpers import format_sse
 
 router = APIRouter(
     prefix="/knowledge",
@@ -23,56 +43,241 @@ UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+# Knowledge namespace: assistant_id scopes every call to that assistant's
+# documents; omitted = the global knowledge base. Namespaces never mix.
+async def check_namespace(db: AsyncSession, assistant_id: Optional[str]):
+    if assistant_id and not await AssistantRepository.get_by_id(db, assistant_id):
+        raise HTTPException(status_code=404, detail="Assistant not found")
+
+
 # 🌍 UPLOAD FILE (PROTECTED)
-@router.post("/upload", response_model=KnowledgeResponse)
+# Returns 202 right away; parsing / embedding runs in the ingestion workers
+@router.post(
+    "/upload",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
 async def upload_knowledge_file(
     file: UploadFile = File(...),
+    assistant_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await check_namespace(db, assistant_id)
 
     file_ext = file.filename.split(".")[-1].lower()
 
-    if file_ext == "pdf":
-        content = FileParserService.parse_pdf(file_path)
-    elif file_ext == "docx":
-        content = FileParserService.parse_docx(file_path)
-    elif file_ext == "txt":
-        content = FileParserService.parse_txt(file_path)
-    else:
+    if file_ext not in SUPPORTED_FILE_TYPES:
         raise HTTPException(
             status_code=400,
             detail="Unsupported file type. Only PDF, DOCX, TXT allowed."
         )
 
-    data = {
-        "file_name": file.filename,
-        "file_type": file_ext,
-        "content": content
-    }
+    # Streamed to disk in chunks, hashed in the same pass
+    stored = await UploadService.save(file, UPLOAD_DIR)
+
+    try:
+        job = await IngestionJobRepository.create(db, {
+            **stored,
+            "file_type": file_ext,
+            "assistant_id": assistant_id,
+        })
+    except BaseException:
+        UploadService.discard(stored["file_path"])
+        raise
+
+    await ingestion_queue.enqueue(job.id)
+    return job
+
+
+# ⏳ INGESTION JOBS (PROTECTED)
+# Keyset paginated, newest first. Pass X-Next-Cursor back as `cursor`.
+@router.get("/jobs", response_model=List[IngestionJobResponse])
+async def list_ingestion_jobs(
+    response: Response,
+    limit: int = Query(
+        settings.KNOWLEDGE_PAGE_DEFAULT_LIMIT,
+        ge=1,
+        le=settings.KNOWLEDGE_PAGE_MAX_LIMIT,
+    ),
+    cursor: Optional[str] = None,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    jobs = await IngestionJobRepository.get_page(db, limit, after, assistant_id)
+
+    next_cursor = next_page_cursor(jobs, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return jobs
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+    job = await IngestionJobRepository.get_by_id(db, job_id, assistant_id, scoped=True)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@router.get("/jobs/{job_id}/progress", response_model=IngestionJobProgress)
+async def get_ingestion_progress(
+    job_id: str,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+    job = await IngestionJobRepository.get_by_id(db, job_id, assistant_id, scoped=True)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.status == IngestionStatus.PROCESSED.value:
+        percent = 100.0
+    elif job.total_chunks:
+        percent = round(100 * job.processed_chunks / job.total_chunks, 1)
+    else:
+        percent = 0.0
+
+    return IngestionJobProgress(
+        job_id=job.id,
+        status=job.status,
+        stage=job.stage,
+        total_chunks=job.total_chunks,
+        processed_chunks=job.processed_chunks,
+        percent=percent,
+    )
+
+
+# 📄 FILE-LEVEL DOCUMENTS (PROTECTED)
+# Keyset paginated, newest first. Pass X-Next-Cursor back as `cursor`.
+@router.get("/documents", response_model=List[DocumentResponse])
+async def list_documents(
+    response: Response,
+    limit: int = Query(
+        settings.KNOWLEDGE_PAGE_DEFAULT_LIMIT,
+        ge=1,
+        le=settings.KNOWLEDGE_PAGE_MAX_LIMIT,
+    ),
+    cursor: Optional[str] = None,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    documents = await DocumentRepository.get_page(db, limit, after, assistant_id)
+
+    next_cursor = next_page_cursor(documents, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return documents
+
+
+@router.get("/documents/{document_id}", response_model=DocumentResponse)
+async def get_document(
+    document_id: str,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+    document = await DocumentRepository.get_by_id(db, document_id, assistant_id)
+
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return document
+
+
+# Deletes the file row; its chunks go with it (ON DELETE CASCADE)
+@router.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: str,
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+    deleted = await DocumentRepository.delete_by_id(db, document_id, assistant_id)
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
 
-    knowledge = await KnowledgeRepository.create(db, data)
-    return knowledge
+    return {"message": "Document deleted successfully"}
 
 
-# 📚 GET ALL KNOWLEDGE (PROTECTED)
-@router.get("/", response_model=List[KnowledgeResponse])
+# 📚 LIST KNOWLEDGE (PROTECTED)
+# Keyset paginated, newest first. Pass X-Next-Cursor back as `cursor`.
+# fields: comma separated (embedding excluded unless asked for)
+# format=ndjson streams every row from `cursor` on, one JSON object per line
+@router.get("/")
 async def get_all_knowledge(
+    response: Response,
+    limit: int = Query(
+        settings.KNOWLEDGE_PAGE_DEFAULT_LIMIT,
+        ge=1,
+        le=settings.KNOWLEDGE_PAGE_MAX_LIMIT,
+    ),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    content_chars: Optional[int] = Query(None, ge=1),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    assistant_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    return await KnowledgeRepository.get_all(db)
+    await check_namespace(db, assistant_id)
+
+    try:
+        selected = KnowledgeService.resolve_fields(fields)
+
+        if format == "ndjson":
+            decode_cursor(cursor)  # reject a bad cursor before streaming starts
+            return StreamingResponse(
+                KnowledgeService.export_ndjson(
+                    cursor, selected, content_chars, assistant_id
+                ),
+                media_type="application/x-ndjson",
+            )
+
+        items, next_cursor = await KnowledgeService.list_page(
+            db, limit, cursor, selected, content_chars, assistant_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return items
 
 
 # 🗑 DELETE BY ID (PROTECTED)
 @router.delete("/{knowledge_id}")
 async def delete_knowledge(
     knowledge_id: str,
+    assistant_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    deleted = await KnowledgeRepository.delete_by_id(db, knowledge_id)
+    await check_namespace(db, assistant_id)
+    deleted = await KnowledgeRepository.delete_by_id(db, knowledge_id, assistant_id)
 
     if not deleted:
         raise HTTPException(status_code=404, detail="Knowledge not found")
@@ -83,9 +288,14 @@ async def delete_knowledge(
 # 🧨 DELETE ALL (HIGHLY SENSITIVE - PROTECTED)
 @router.delete("/")
 async def delete_all_knowledge(
+    assistant_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    await KnowledgeRepository.delete_all(db)
+    await check_namespace(db, assistant_id)
+    await DocumentRepository.delete_all(db, assistant_id)
+
+    if assistant_id:
+        return {"message": "All assistant knowledge deleted successfully"}
     return {"message": "All global knowledge deleted successfully"}
 
 
@@ -93,32 +303,166 @@ async def delete_all_knowledge(
 @router.get("/rag/search")
 async def rag_search(
     query: str,
+    mode: Optional[str] = Query(None, pattern="^(vector|lexical|hybrid)$"),
+    assistant_id: Optional[str] = None,
+    max_distance: Optional[float] = None,
     db: AsyncSession = Depends(get_db),
 ):
     if not query:
         raise HTTPException(status_code=400, detail="Query is required")
 
-    # 1️⃣ Vector Search
-    results = await RAGService.semantic_search(db, query, limit=5)
+    await check_namespace(db, assistant_id)
+    max_distance = await RAGService.resolve_max_distance(db, assistant_id, max_distance)
 
-    if not results:
-        return {
-            "query": query,
-            "answer": "No relevant information found in uploaded documents."
-        }
+    return await RAGService.answer(
+        db, query, mode=mode, max_distance=max_distance, assistant_id=assistant_id
+    )
 
-    # 2️⃣ Build Context
-    context = "\n\n".join([r["content"] for r in results])
 
-    # 3️⃣ LLM Final Answer (TRUE RAG)
-    answer = LLMService.generate_answer(query, context)
+# ⚡ STREAMING RAG SEARCH (SSE, PROTECTED)
+# event: metadata (sources, cached) → token* → done (full answer)
+@router.get("/rag/search/stream")
+async def rag_search_stream(
+    query: str,
+    mode: Optional[str] = Query(None, pattern="^(vector|lexical|hybrid)$"),
+    assistant_id: Optional[str] = None,
+    max_distance: Optional[float] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    if not query:
+        raise HTTPException(status_code=400, detail="Query is required")
 
-    return {
-        "query": query,
-        "answer": answer
-    }
+    await check_namespace(db, assistant_id)
+    max_distance = await RAGService.resolve_max_distance(db, assistant_id, max_distance)
+
+    events = RAGService.stream_answer(
+        db, query, mode=mode, max_distance=max_distance, assistant_id=assistant_id
+    )
+
+    # retrieval runs here, while the request's DB session is still open
+    first = await anext(events)
+
+    async def event_stream():
+        yield format_sse(*first)
+        async for event, data in events:
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/stats")
 async def get_knowledge_stats(db: AsyncSession = Depends(get_db)):
     return await KnowledgeService.get_knowledge_stats(db)
 
+
+# 🔧 REBUILD STATS COUNTERS FROM THE DOCUMENTS TABLE
+@router.post("/stats/reconcile")
+async def reconcile_knowledge_stats(db: AsyncSession = Depends(get_db)):
+    return await KnowledgeService.reconcile_knowledge_stats(db)
+
+
+# 💾 EMBEDDING CACHE HIT / MISS COUNTERS
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats():
+    return embedding_cache.stats()
+
+
+# 🔁 RAG QUERY EMBEDDING CACHE COUNTERS
+@router.get("/rag/query-cache/stats")
+async def get_query_cache_stats():
+    return query_embedding_cache.stats()
+
+
+# 📦 QUERY EMBEDDING MICRO-BATCHING (batch sizes, added wait)
+@router.get("/rag/query-batcher/stats")
+async def get_query_batcher_stats():
+    return query_embedding_batcher.stats()
+
+
+# 💬 SEMANTIC ANSWER CACHE COUNTERS
+@router.get("/rag/answer-cache/stats")
+async def get_answer_cache_stats():
+    return answer_cache.stats()
+
+
+# 🚦 RETRIEVAL CONFIDENCE GATE COUNTERS
+@router.get("/rag/gate/stats")
+async def get_retrieval_gate_stats():
+    return retrieval_gate.stats()
+
+
+# 🧠 IN-MEMORY VECTOR INDEX (snapshot namespaces, counters)
+@router.get("/rag/memory-index/stats")
+async def get_memory_index_stats():
+    return memory_vector_index.stats()
+
+
+# Re-snapshots a namespace from Postgres (e.g. after manual SQL changes)
+@router.post("/rag/memory-index/rebuild")
+async def rebuild_memory_index(
+    assistant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    await check_namespace(db, assistant_id)
+
+    if not memory_vector_index.serves(assistant_id):
+        raise HTTPException(status_code=400, detail="Namespace is not served from memory")
+
+    snapshot = await memory_vector_index.rebuild(db, assistant_id)
+    return {"generation": snapshot.generation, "chunks": len(snapshot)}
+
+
+# 🔁 RE-EMBEDDING MIGRATION (stored model, backfill progress, switched namespaces)
+@router.get("/embedding-migration")
+async def get_embedding_migration():
+    return await EmbeddingMigrationService.status()
+
+
+# Starts backfilling knowledge.embedding_next with another model in the background
+@router.post("/embedding-migration")
+async def start_embedding_migration(
+    model: str = Query(..., min_length=1),
+    dimensions: int = Query(..., gt=0),
+):
+    try:
+        migration = await EmbeddingMigrationService.start(model, dimensions)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    embedding_migration_runner.wake()
+    return EmbeddingMigrationService.describe(migration)
+
+
+# Moves one namespace (or all of them) to the re-embedded vectors
+@router.post("/embedding-migration/switch")
+async def switch_embedding_migration(
+    assistant_id: Optional[str] = None,
+    all_namespaces: bool = Query(False, alias="all"),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        if all_namespaces:
+            return await EmbeddingMigrationService.switch_all()
+        await check_namespace(db, assistant_id)
+        return await EmbeddingMigrationService.switch(assistant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/embedding-migration/finalize")
+async def finalize_embedding_migration():
+    try:
+        return await EmbeddingMigrationService.finalize()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/embedding-migration/cancel")
+async def cancel_embedding_migration():
+    try:
+        return await EmbeddingMigrationService.cancel()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
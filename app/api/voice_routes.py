@@ -43,9 +43,14 @@ async def get_voice_config(
         detect_caller_number=assistant.detect_caller_number,
         multilingual_support=assistant.multilingual_support,
         voice_recording=assistant.voice_recording,
+        rag_max_distance=assistant.rag_max_distance,
     )
 
 
+# null resets the assistant to the global RAG_MAX_DISTANCE
+CLEARABLE_FIELDS = {"rag_max_distance"}
+
+
 # =====================================
 # 2️⃣ ADD + UPDATE VOICE CONFIG (SAVE BUTTON)
 # =====================================
@@ -60,11 +65,12 @@ async def add_or_update_voice_config(
     if not assistant:
         raise HTTPException(status_code=404, detail="Assistant not found")
 
-    update_data = data.dict(exclude_unset=True)
+    update_data = data.model_dump(exclude_unset=True)
 
-    # Smart update (avoid overwriting with None)
+    # Smart update (avoid overwriting with None), except for fields where
+    # an explicit null means "back to the default"
     for key, value in update_data.items():
-        if value is not None:
+        if value is not None or key in CLEARABLE_FIELDS:
             setattr(assistant, key, value)
 
     await db.commit()
@@ -81,6 +87,7 @@ async def add_or_update_voice_config(
         detect_caller_number=assistant.detect_caller_number,
         multilingual_support=assistant.multilingual_support,
         voice_recording=assistant.voice_recording,
+        rag_max_distance=assistant.rag_max_distance,
     )
 
 
@@ -1,4 +1,5 @@
 from typing import AsyncGenerator
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
@@ -6,6 +7,7 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase
 from app.config.settings import settings
+from app.utils.vector_codec import register_vector_codec
 
 # Create async engine for Neon PostgreSQL
 engine = create_async_engine(
@@ -16,6 +18,17 @@ engine = create_async_engine(
     max_overflow=20,          # Extra connections allowed
 )
 
+
+# Binary pgvector codec on every asyncpg connection, so vectors go over
+# the wire as packed float32 (COPY, bulk inserts) instead of text
+if engine.dialect.driver == "asyncpg":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_vector_codec(dbapi_connection, connection_record):
+        dbapi_connection.run_async(
+            lambda conn: register_vector_codec(conn, settings.PGVECTOR_SCHEMA)
+        )
+
+
 # Session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -10,10 +10,101 @@ class Settings(BaseSettings):
 
     # ===== DATABASE =====
     DATABASE_URL: str
+    PGVECTOR_SCHEMA: str = "public"  # schema the vector extension is installed in
 
     # ===== OPENAI =====
     OPENAI_API_KEY: str
 
+    # Shared async client (pooled connections + per-provider concurrency)
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_EMBEDDINGS_MAX_CONCURRENCY: int = 8
+    OPENAI_CHAT_MAX_CONCURRENCY: int = 16
+
+    # ===== EMBEDDINGS =====
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 1536
+    EMBEDDING_BATCH_MAX_ITEMS: int = 512        # inputs per embeddings.create call
+    EMBEDDING_BATCH_MAX_TOKENS: int = 200_000   # approx tokens per embeddings.create call
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # in-process LRU tier
+    EMBEDDING_SPACE_REFRESH_SECONDS: float = 5.0  # re-read stored model / migration state
+
+    # ===== EMBEDDING MIGRATION (re-embed into knowledge.embedding_next) =====
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = 256
+    EMBEDDING_MIGRATION_CHUNKS_PER_MINUTE: int = 20000  # backfill rate limit (0 = unlimited)
+    EMBEDDING_MIGRATION_POLL_SECONDS: float = 30.0       # how often workers look for a backfill to resume
+    EMBEDDING_MIGRATION_LOCKED_CHUNKS: int = 256         # max chunks embedded while switch / finalize block writes
+
+    # ===== RAG RETRIEVAL =====
+    RAG_SEARCH_MODE: str = "hybrid"            # vector | lexical | hybrid
+    HYBRID_CANDIDATES: int = 40                # rows taken from each ranking before fusion
+    RRF_K: int = 60                            # reciprocal rank fusion constant
+    RAG_MAX_DISTANCE: float | None = 0.75      # confidence gate (VECTOR_METRIC distance); None = off
+    RAG_CANDIDATES: int = 20                   # chunks retrieved before context packing
+    RAG_CONTEXT_MAX_TOKENS: int = 2000         # token budget of the LLM context
+    RAG_MMR_LAMBDA: float = 0.7                # 1 = pure relevance, 0 = pure diversity
+
+    # ===== QUERY EMBEDDING CACHE (RAG search) =====
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096          # max cached queries
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+
+    # ===== QUERY EMBEDDING BATCHING (concurrent searches share one API call) =====
+    QUERY_EMBEDDING_BATCH_WINDOW_MS: float = 5.0    # max wait for more queries (0 = off)
+    QUERY_EMBEDDING_BATCH_MAX_SIZE: int = 64        # flush as soon as this many are waiting
+
+    # ===== SEMANTIC ANSWER CACHE (RAG answers) =====
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95          # min cosine similarity to a cached query
+    ANSWER_CACHE_MAX_ENTRIES: int = 2048
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+
+    # ===== CHUNKING =====
+    CHUNKING_MODE: str = "tokens"              # "tokens" or legacy "chars" (800 / 100)
+    CHUNK_MAX_TOKENS: int = 400
+    CHUNK_OVERLAP_TOKENS: int = 50
+    TOKENIZER_ENCODING: str = "cl100k_base"    # encoding used by text-embedding-3 / gpt-4o-mini
+
+    # ===== FILE PARSING =====
+    PARSER_WORKERS: int = 0                    # parser processes (0 = one per CPU)
+    PDF_PAGES_PER_TASK: int = 20               # page range extracted per pool task
+
+    # ===== KNOWLEDGE INGESTION =====
+    KNOWLEDGE_MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024      # read/write size while streaming uploads
+    INGESTION_WORKERS: int = 2                 # background parse/chunk/embed workers
+    INGESTION_PROGRESS_STEP: int = 256         # chunks embedded between progress updates
+    INGESTION_RECOVER_ON_STARTUP: bool = True  # re-run jobs interrupted by a restart
+    INGESTION_HEARTBEAT_SECONDS: float = 15.0  # running jobs refresh their lease this often
+    INGESTION_LEASE_SECONDS: float = 120.0     # processing job without a heartbeat this long = abandoned
+
+    # ===== VECTOR INDEX =====
+    VECTOR_INDEX_TYPE: str = "hnsw"            # hnsw | ivfflat
+    VECTOR_METRIC: str = "cosine"              # cosine | ip | l2 (search operator + index opclass)
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    IVFFLAT_LISTS: int = 0                     # 0 = rows / 1000 (sqrt(rows) above 1M rows)
+    VECTOR_INDEX_MAINTENANCE_WORK_MEM: str = "1GB"
+    HNSW_EF_SEARCH: int = 40                   # per query, must be >= LIMIT
+    VECTOR_QUANTIZATION: str = "none"          # none | halfvec | binary (indexed form; full vectors kept for rerank)
+    VECTOR_INDEX_DIMENSIONS: int = 0           # leading dims indexed (text-embedding-3 is Matryoshka), 0 = all
+    RAG_RERANK_CANDIDATES: int = 100           # compact-index hits reranked at full precision
+    IVFFLAT_PROBES: int = 10                   # per query
+    NAMESPACE_INDEX_MIN_CHUNKS: int = 5000     # build an assistant's own partial ANN index from this size (0 = never)
+
+    # ===== IN-MEMORY VECTOR INDEX (vector mode, exact top-k) =====
+    MEMORY_INDEX_NAMESPACES: str = ""          # comma separated assistant ids, "global", or "*" for all
+    MEMORY_INDEX_DIR: str = "vector_snapshots"  # mmap'd snapshots shared by all workers on the host
+    MEMORY_INDEX_DTYPE: str = "float16"        # float16 | float32 (snapshot storage)
+    MEMORY_INDEX_REFRESH_SECONDS: float = 1.0  # how often searches check for a newer snapshot
+
+    # ===== KNOWLEDGE LISTING =====
+    KNOWLEDGE_PAGE_DEFAULT_LIMIT: int = 100
+    KNOWLEDGE_PAGE_MAX_LIMIT: int = 1000
+    KNOWLEDGE_EXPORT_BATCH: int = 500          # rows fetched per keyset page in NDJSON export
+
     # ===== GOOGLE OAUTH =====
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
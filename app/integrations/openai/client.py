@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Dict
+
+import httpx
+from openai import AsyncOpenAI
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Max in-flight requests per provider (embeddings and chat have
+# separate rate limits on the OpenAI side)
+PROVIDER_CONCURRENCY = {
+    "openai_embeddings": settings.OPENAI_EMBEDDINGS_MAX_CONCURRENCY,
+    "openai_chat": settings.OPENAI_CHAT_MAX_CONCURRENCY,
+}
+
+_limiters: Dict[str, asyncio.Semaphore] = {}
+
+
+# One pooled HTTP connection pool shared by every async OpenAI call
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    ),
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+)
+
+async_openai_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=http_client,
+)
+
+
+def get_limiter(provider: str) -> asyncio.Semaphore:
+    """Concurrency limiter for a provider (created on first use)"""
+    limiter = _limiters.get(provider)
+
+    if limiter is None:
+        limiter = asyncio.Semaphore(PROVIDER_CONCURRENCY[provider])
+        _limiters[provider] = limiter
+
+    return limiter
+
+
+async def close_async_openai_client():
+    """Release pooled connections on app shutdown"""
+    await async_openai_client.close()
+    logger.info("🔌 OpenAI async client closed")
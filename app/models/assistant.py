@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, DateTime
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Float
 from datetime import datetime
 import uuid
 from app.models.base import Base
@@ -48,5 +48,9 @@ Help users clearly and politely. Do not sound robotic."""
     multilingual_support = Column(Boolean, default=False)
     voice_recording = Column(Boolean, default=False)
 
+    # Knowledge (RAG) - max retrieval distance before answering "not found";
+    # None = global RAG_MAX_DISTANCE
+    rag_max_distance = Column(Float, nullable=True)
+
     # Metadata
     timestamp = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
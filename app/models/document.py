@@ -0,0 +1,61 @@
+import uuid
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.assistant import Assistant
+
+
+class Document(Base):
+    """
+    One uploaded file in the knowledge base.
+    Its chunks live in `knowledge` (document_id, ON DELETE CASCADE).
+    Namespace = owning assistant; NULL = global knowledge base.
+    """
+    __tablename__ = "knowledge_documents"
+
+    id = Column(
+        String(36),
+        primary_key=True,
+        default=lambda: str(uuid.uuid4())
+    )
+
+    # knowledge namespace (deleting the assistant deletes its documents)
+    assistant_id = Column(
+        String(36),
+        ForeignKey(Assistant.id, ondelete="CASCADE"),
+        nullable=True,
+        index=True
+    )
+
+    file_name = Column(String(255), nullable=False)  # unique per namespace
+    file_type = Column(String(50), nullable=True)
+
+    file_hash = Column(String(64), nullable=True, index=True)  # sha256 of the uploaded bytes
+    byte_size = Column(BigInteger, default=0, nullable=False)
+    chunk_count = Column(Integer, default=0, nullable=False)
+
+    # values: pending, processing, processed, failed
+    status = Column(String(50), default="pending", nullable=False, index=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    __table_args__ = (
+        Index(
+            "ux_knowledge_documents_namespace_file",
+            func.coalesce(assistant_id, ""),
+            file_name,
+            unique=True,
+        ),
+        # keyset pagination of the documents listing, per namespace
+        Index("ix_knowledge_documents_namespace_created_at_id", "assistant_id", "created_at", "id"),
+    )
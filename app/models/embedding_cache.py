@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    """
+    Persistent embedding cache, content addressed:
+    key = sha256(model, dimensions, normalized chunk text)
+    """
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(64), primary_key=True)
+
+    model = Column(String(100), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+
+    # float32 little-endian bytes (4 * dimensions)
+    embedding = Column(LargeBinary, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
@@ -0,0 +1,78 @@
+import enum
+import uuid
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class MigrationStatus(str, enum.Enum):
+    BACKFILLING = "backfilling"  # re-embedding chunks into knowledge.embedding_next
+    BACKFILLED  = "backfilled"   # every chunk has a new vector, namespaces can switch
+    COMPLETED   = "completed"    # old vectors dropped, embedding_next is now embedding
+    CANCELLED   = "cancelled"
+    FAILED      = "failed"
+
+
+ACTIVE_STATUSES = (MigrationStatus.BACKFILLING.value, MigrationStatus.BACKFILLED.value)
+
+
+class EmbeddingMigration(Base):
+    """
+    Blue/green re-embedding of the knowledge base into a new model /
+    dimensions. New vectors go to the shadow column knowledge.embedding_next;
+    search keeps using knowledge.embedding for every namespace until that
+    namespace is switched. At most one migration is active at a time.
+    """
+    __tablename__ = "knowledge_embedding_migrations"
+
+    id = Column(
+        String(36),
+        primary_key=True,
+        default=lambda: str(uuid.uuid4())
+    )
+
+    source_model = Column(String(100), nullable=False)
+    source_dimensions = Column(Integer, nullable=False)
+    target_model = Column(String(100), nullable=False)
+    target_dimensions = Column(Integer, nullable=False)
+
+    # values: see MigrationStatus
+    status = Column(String(50), default=MigrationStatus.BACKFILLING.value, nullable=False)
+
+    # last knowledge.id backfilled (keyset resume point)
+    cursor = Column(String(36), nullable=True)
+    total_chunks = Column(BigInteger, default=0, nullable=False)
+    processed_chunks = Column(BigInteger, default=0, nullable=False)
+
+    # namespaces searching embedding_next ("global" = global knowledge base)
+    switched_namespaces = Column(
+        ARRAY(String(36)),
+        server_default=text("'{}'"),
+        nullable=False
+    )
+
+    error = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # only one active migration
+        Index(
+            "ux_knowledge_embedding_migrations_active",
+            text("(true)"),
+            unique=True,
+            postgresql_where=status.in_(ACTIVE_STATUSES),
+        ),
+    )
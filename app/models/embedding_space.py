@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class EmbeddingSpace(Base):
+    """
+    Single row (id = 1): the embedding model / dimensions whose vectors
+    knowledge.embedding holds. Seeded from settings on first startup,
+    changed only by finalizing an embedding migration.
+    """
+    __tablename__ = "knowledge_embedding_space"
+
+    id = Column(Integer, primary_key=True, default=1)
+
+    model = Column(String(100), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
@@ -0,0 +1,83 @@
+import enum
+import uuid
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.assistant import Assistant
+from app.models.document import Document
+
+
+class IngestionStatus(str, enum.Enum):
+    PENDING    = "pending"
+    PROCESSING = "processing"
+    PROCESSED  = "processed"
+    FAILED     = "failed"
+
+
+class IngestionJob(Base):
+    """
+    One background parse → chunk → embed → insert run for an uploaded file
+    """
+    __tablename__ = "knowledge_ingestion_jobs"
+
+    id = Column(
+        String(36),
+        primary_key=True,
+        default=lambda: str(uuid.uuid4())
+    )
+
+    document_id = Column(
+        String(36),
+        ForeignKey(Document.id, ondelete="SET NULL"),
+        nullable=True
+    )
+
+    # target namespace (NULL = global knowledge base)
+    assistant_id = Column(
+        String(36),
+        ForeignKey(Assistant.id, ondelete="CASCADE"),
+        nullable=True
+    )
+
+    file_name = Column(String(255), nullable=False)
+    file_type = Column(String(50), nullable=False)
+    file_path = Column(String(512), nullable=False)
+
+    # SHA-256 of the uploaded bytes (lets workers skip already-ingested files)
+    file_hash = Column(String(64), nullable=True, index=True)
+    byte_size = Column(BigInteger, default=0, nullable=False)
+    duplicate_of = Column(String(36), nullable=True)  # document that already holds this content
+
+    status = Column(
+        String(50),
+        default=IngestionStatus.PENDING.value,
+        nullable=False,
+        index=True
+    )
+    stage = Column(String(50), nullable=True)  # parsing, chunking, embedding, saving
+
+    total_chunks     = Column(Integer, default=0, nullable=False)
+    processed_chunks = Column(Integer, default=0, nullable=False)
+
+    error = Column(Text, nullable=True)
+
+    # lease of the worker running the job, refreshed while it runs;
+    # only jobs whose lease expired are taken over by recovery
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    __table_args__ = (
+        # keyset pagination of the jobs listing, per namespace
+        Index("ix_knowledge_ingestion_jobs_namespace_created_at_id", "assistant_id", "created_at", "id"),
+    )
@@ -1,8 +1,11 @@
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, Float
+from sqlalchemy import Column, String, Text, DateTime, Float, Index, ForeignKey, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 from app.models.base import Base
+from app.models.assistant import Assistant
+from app.models.document import Document
 
 
 class Knowledge(Base):
@@ -14,6 +17,23 @@ class Knowledge(Base):
         default=lambda: str(uuid.uuid4())
     )
 
+    # parent file (deleting the document deletes its chunks in the DB)
+    document_id = Column(
+        String(36),
+        ForeignKey(Document.id, ondelete="CASCADE"),
+        nullable=True,
+        index=True
+    )
+
+    # knowledge namespace, copied from the document so search can filter
+    # (and partial vector indexes can be built) without a join
+    assistant_id = Column(
+        String(36),
+        ForeignKey(Assistant.id, ondelete="CASCADE"),
+        nullable=True,
+        index=True
+    )
+
     file_name = Column(String(255), nullable=True)
     file_type = Column(String(50), nullable=True)
 
@@ -25,10 +45,28 @@ class Knowledge(Base):
 
     content = Column(Text, nullable=False)
 
-    embedding = Column(Vector(1536), nullable=True)
+    # sha256 of content, used to diff a re-uploaded document chunk by chunk
+    content_hash = Column(String(64), nullable=True)
+
+    # dimensionless here: the live column follows the stored embedding
+    # space (init_schema types a new table, migrations may change it)
+    embedding = Column(Vector(), nullable=True)
+
+    # full-text side of hybrid search ('simple': exact tokens, no stemming)
+    content_tsv = Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', content)", persisted=True)
+    )
 
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
         nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_knowledge_file_name_hash", "file_name", "content_hash"),
+        # keyset pagination of the listing endpoint
+        Index("ix_knowledge_created_at_id", "created_at", "id"),
+        Index("ix_knowledge_content_tsv", "content_tsv", postgresql_using="gin"),
     )
\ No newline at end of file
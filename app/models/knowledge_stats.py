@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class KnowledgeStats(Base):
+    """
+    Single counters row (id = 1) for the dashboard.
+    Kept current by a trigger on knowledge_documents (see models/schema.py),
+    so it changes in the same transaction as ingestion and deletes.
+    """
+    __tablename__ = "knowledge_stats"
+
+    id = Column(Integer, primary_key=True, default=1)
+
+    total_documents = Column(BigInteger, default=0, nullable=False)
+    processed_documents = Column(BigInteger, default=0, nullable=False)
+    pending_documents = Column(BigInteger, default=0, nullable=False)  # pending + processing
+    failed_documents = Column(BigInteger, default=0, nullable=False)
+    total_chunks = Column(BigInteger, default=0, nullable=False)
+    total_bytes = Column(BigInteger, default=0, nullable=False)
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    reconciled_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,211 @@
+from sqlalchemy import text, select, literal, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.base import Base
+from app.models.assistant import Assistant
+from app.models.knowledge import Knowledge
+from app.models.document import Document
+from app.models.ingestion_job import IngestionJob
+from app.models.knowledge_stats import KnowledgeStats
+from app.models.embedding_space import EmbeddingSpace
+from app.models.schema_backfill import SchemaBackfill
+from app.config.settings import settings
+from app.repository.knowledge_stats_repository import aggregate_query, STAT_COLUMNS
+
+KNOWLEDGE_TABLE = Knowledge.__table__.fullname
+DOCUMENT_TABLE = Document.__table__.fullname
+JOB_TABLE = IngestionJob.__table__.fullname
+STATS_TABLE = KnowledgeStats.__table__.fullname
+SPACE_TABLE = EmbeddingSpace.__table__.fullname
+ASSISTANT_TABLE = Assistant.__table__.fullname
+SCHEMA = Base.metadata.schema
+
+# create_all() only creates missing tables; columns / indexes added to
+# existing tables go here. Every statement must be idempotent.
+SCHEMA_PATCHES = [
+    f"ALTER TABLE {KNOWLEDGE_TABLE} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    f"CREATE INDEX IF NOT EXISTS ix_knowledge_file_name_hash ON {KNOWLEDGE_TABLE} (file_name, content_hash)",
+
+    # Document table: parent row per file, chunks cascade with it
+    f"""
+    ALTER TABLE {KNOWLEDGE_TABLE} ADD COLUMN IF NOT EXISTS document_id VARCHAR(36)
+    REFERENCES {DOCUMENT_TABLE} (id) ON DELETE CASCADE
+    """,
+    # same name create_all() generates for index=True (ix_<schema>_<table>_<column>)
+    f"CREATE INDEX IF NOT EXISTS ix_{SCHEMA}_{Knowledge.__tablename__}_document_id ON {KNOWLEDGE_TABLE} (document_id)",
+    f"""
+    ALTER TABLE {JOB_TABLE} ADD COLUMN IF NOT EXISTS document_id VARCHAR(36)
+    REFERENCES {DOCUMENT_TABLE} (id) ON DELETE SET NULL
+    """,
+    # knowledge namespaces: owning assistant on documents, chunks and jobs
+    # (NULL = global). File names are unique per namespace.
+    f"""
+    ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN IF NOT EXISTS assistant_id VARCHAR(36)
+    REFERENCES {ASSISTANT_TABLE} (id) ON DELETE CASCADE
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_{SCHEMA}_{Document.__tablename__}_assistant_id ON {DOCUMENT_TABLE} (assistant_id)",
+    f"ALTER TABLE {DOCUMENT_TABLE} DROP CONSTRAINT IF EXISTS {Document.__tablename__}_file_name_key",
+    f"""
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_knowledge_documents_namespace_file
+    ON {DOCUMENT_TABLE} (coalesce(assistant_id, ''), file_name)
+    """,
+    f"""
+    ALTER TABLE {KNOWLEDGE_TABLE} ADD COLUMN IF NOT EXISTS assistant_id VARCHAR(36)
+    REFERENCES {ASSISTANT_TABLE} (id) ON DELETE CASCADE
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_{SCHEMA}_{Knowledge.__tablename__}_assistant_id ON {KNOWLEDGE_TABLE} (assistant_id)",
+    f"ALTER TABLE {JOB_TABLE} ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE",
+    f"""
+    ALTER TABLE {JOB_TABLE} ADD COLUMN IF NOT EXISTS assistant_id VARCHAR(36)
+    REFERENCES {ASSISTANT_TABLE} (id) ON DELETE CASCADE
+    """,
+
+    f"CREATE INDEX IF NOT EXISTS ix_knowledge_created_at_id ON {KNOWLEDGE_TABLE} (created_at, id)",
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_knowledge_documents_namespace_created_at_id
+    ON {DOCUMENT_TABLE} (assistant_id, created_at, id)
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_knowledge_ingestion_jobs_namespace_created_at_id
+    ON {JOB_TABLE} (assistant_id, created_at, id)
+    """,
+
+    # per-assistant retrieval confidence threshold
+    f"ALTER TABLE {ASSISTANT_TABLE} ADD COLUMN IF NOT EXISTS rag_max_distance DOUBLE PRECISION",
+
+    # Dashboard counters: every document insert / delete / status, size or
+    # chunk count change applies its delta to the single stats row in the
+    # same transaction (chunk deletes reach it through chunk_count)
+    f"""
+    CREATE OR REPLACE FUNCTION {SCHEMA}.knowledge_stats_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE {STATS_TABLE} SET
+                total_documents = total_documents - 1,
+                processed_documents = processed_documents - (OLD.status = 'processed')::int,
+                pending_documents = pending_documents - (OLD.status IN ('pending', 'processing'))::int,
+                failed_documents = failed_documents - (OLD.status = 'failed')::int,
+                total_chunks = total_chunks - OLD.chunk_count,
+                total_bytes = total_bytes - OLD.byte_size,
+                updated_at = now()
+            WHERE id = 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE {STATS_TABLE} SET
+                total_documents = total_documents + 1,
+                processed_documents = processed_documents + (NEW.status = 'processed')::int,
+                pending_documents = pending_documents + (NEW.status IN ('pending', 'processing'))::int,
+                failed_documents = failed_documents + (NEW.status = 'failed')::int,
+                total_chunks = total_chunks + NEW.chunk_count,
+                total_bytes = total_bytes + NEW.byte_size,
+                updated_at = now()
+            WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS knowledge_stats_apply ON {DOCUMENT_TABLE}",
+    f"""
+    CREATE TRIGGER knowledge_stats_apply
+    AFTER INSERT OR DELETE OR UPDATE OF status, chunk_count, byte_size
+    ON {DOCUMENT_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.knowledge_stats_apply()
+    """,
+]
+
+# One-time backfills (full-table updates, table rewrites), applied in order
+# after SCHEMA_PATCHES and recorded by name in schema_backfills, so later
+# startups skip them. Never rename an entry; add a new one instead.
+SCHEMA_BACKFILLS = [
+    ("knowledge_content_hash", [
+        f"""
+        UPDATE {KNOWLEDGE_TABLE}
+        SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL
+        """,
+    ]),
+
+    # documents for chunks uploaded before the table existed
+    ("knowledge_documents", [
+        f"""
+        INSERT INTO {DOCUMENT_TABLE}
+            (id, file_name, file_type, byte_size, chunk_count, status, created_at, updated_at)
+        SELECT gen_random_uuid()::text, k.file_name, max(k.file_type), 0, count(*),
+               'processed', min(k.created_at), now()
+        FROM {KNOWLEDGE_TABLE} k
+        WHERE k.document_id IS NULL AND k.file_name IS NOT NULL
+        GROUP BY k.file_name
+        ON CONFLICT DO NOTHING
+        """,
+        f"""
+        UPDATE {KNOWLEDGE_TABLE} k
+        SET document_id = d.id
+        FROM {DOCUMENT_TABLE} d
+        WHERE k.document_id IS NULL AND k.file_name = d.file_name AND d.assistant_id IS NULL
+        """,
+    ]),
+
+    # hybrid search: generated tsvector (rewrites the table) + GIN index
+    ("knowledge_content_tsv", [
+        f"""
+        ALTER TABLE {KNOWLEDGE_TABLE} ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED
+        """,
+        f"CREATE INDEX IF NOT EXISTS ix_knowledge_content_tsv ON {KNOWLEDGE_TABLE} USING gin (content_tsv)",
+    ]),
+]
+
+
+async def init_schema(engine):
+    """Create tables, then bring existing ones up to date"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+        for statement in SCHEMA_PATCHES:
+            await conn.execute(text(statement))
+
+        # workers starting together: the first applies the backfills,
+        # the others wait here and then find them recorded
+        await conn.execute(select(func.pg_advisory_xact_lock(func.hashtext(SchemaBackfill.__tablename__))))
+        applied = set((await conn.execute(select(SchemaBackfill.name))).scalars())
+        for name, statements in SCHEMA_BACKFILLS:
+            if name in applied:
+                continue
+            for statement in statements:
+                await conn.execute(text(statement))
+            await conn.execute(pg_insert(SchemaBackfill).values(name=name))
+
+        # seed the counters row once from the existing documents
+        counts = aggregate_query().subquery()
+        await conn.execute(
+            pg_insert(KnowledgeStats)
+            .from_select(
+                ["id", *STAT_COLUMNS],
+                select(literal(1), *[counts.c[name] for name in STAT_COLUMNS]),
+            )
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+
+        # existing vectors were embedded with the configured model; from
+        # here on only a finalized embedding migration changes the row
+        await conn.execute(
+            pg_insert(EmbeddingSpace)
+            .values(id=1, model=settings.EMBEDDING_MODEL, dimensions=settings.EMBEDDING_DIMENSIONS)
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+
+        # Knowledge.embedding is dimensionless in the ORM: a table just
+        # created by create_all() gets the stored space's dimensions
+        # (ANN indexes need them); existing tables are left as they are
+        await conn.execute(text(f"""
+            DO $$
+            DECLARE dims integer;
+            BEGIN
+                IF (SELECT atttypmod FROM pg_attribute
+                    WHERE attrelid = '{KNOWLEDGE_TABLE}'::regclass AND attname = 'embedding') = -1 THEN
+                    SELECT dimensions INTO dims FROM {SPACE_TABLE} WHERE id = 1;
+                    EXECUTE format('ALTER TABLE {KNOWLEDGE_TABLE} ALTER COLUMN embedding TYPE vector(%s)', dims);
+                END IF;
+            END
+            $$
+        """))
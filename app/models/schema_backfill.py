@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class SchemaBackfill(Base):
+    """
+    One row per one-time schema backfill init_schema has applied, so
+    table rewrites / full-table updates run once instead of every startup.
+    """
+    __tablename__ = "schema_backfills"
+
+    name = Column(String(100), primary_key=True)
+
+    applied_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
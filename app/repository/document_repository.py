@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.models.document import Document
+from app.models.knowledge import Knowledge
+from app.services.answer_cache import answer_cache
+from app.services.memory_vector_index import memory_vector_index
+
+
+def in_namespace(column, assistant_id: Optional[str]):
+    """Filter on a knowledge namespace column (None = global knowledge base)"""
+    return column.is_(None) if assistant_id is None else column == assistant_id
+
+
+class DocumentRepository:
+
+    @staticmethod
+    async def get_or_create(
+        db: AsyncSession,
+        file_name: str,
+        file_type: str,
+        assistant_id: Optional[str] = None,
+    ):
+        """Document row for a file name in a namespace (safe against concurrent uploads)"""
+        await db.execute(
+            insert(Document)
+            .values(
+                file_name=file_name,
+                file_type=file_type,
+                assistant_id=assistant_id,
+                status="pending",
+            )
+            .on_conflict_do_nothing(
+                index_elements=[func.coalesce(Document.assistant_id, ""), Document.file_name]
+            )
+        )
+        result = await db.execute(
+            select(Document).where(
+                Document.file_name == file_name,
+                in_namespace(Document.assistant_id, assistant_id),
+            )
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_by_id(
+        db: AsyncSession,
+        document_id: str,
+        assistant_id: Optional[str] = None,
+    ):
+        result = await db.execute(
+            select(Document).where(
+                Document.id == document_id,
+                in_namespace(Document.assistant_id, assistant_id),
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_processed_by_hash(
+        db: AsyncSession,
+        file_hash: str,
+        assistant_id: Optional[str] = None,
+    ):
+        """Processed document in the namespace whose uploaded bytes had this sha256"""
+        result = await db.execute(
+            select(Document)
+            .where(
+                Document.file_hash == file_hash,
+                in_namespace(Document.assistant_id, assistant_id),
+                Document.status == "processed",
+                Document.chunk_count > 0,
+            )
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        assistant_id: Optional[str] = None,
+    ):
+        """One keyset page of a namespace's documents, newest first"""
+        query = select(Document).where(in_namespace(Document.assistant_id, assistant_id))
+        if after is not None:
+            query = query.where(tuple_(Document.created_at, Document.id) < tuple_(*after))
+
+        result = await db.execute(
+            query.order_by(Document.created_at.desc(), Document.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def update(db: AsyncSession, document_id: str, data: dict):
+        """Runs in the caller's transaction (caller commits)"""
+        await db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(**data)
+        )
+
+    @staticmethod
+    async def delete_by_id(
+        db: AsyncSession,
+        document_id: str,
+        assistant_id: Optional[str] = None,
+    ):
+        # chunks are removed by ON DELETE CASCADE in the database
+        result = await db.execute(
+            delete(Document).where(
+                Document.id == document_id,
+                in_namespace(Document.assistant_id, assistant_id),
+            )
+        )
+        await db.commit()
+        answer_cache.invalidate_documents([document_id])
+        if result.rowcount:
+            await memory_vector_index.apply(assistant_id, deleted_documents=[document_id])
+        return result.rowcount > 0
+
+    @staticmethod
+    async def delete_all(db: AsyncSession, assistant_id: Optional[str] = None):
+        # documents cascade to their chunks; then any orphan chunks
+        documents = await db.execute(
+            delete(Document).where(in_namespace(Document.assistant_id, assistant_id))
+        )
+        chunks = await db.execute(
+            delete(Knowledge).where(in_namespace(Knowledge.assistant_id, assistant_id))
+        )
+        await db.commit()
+        answer_cache.clear()
+        await memory_vector_index.clear(assistant_id)
+        return documents.rowcount + chunks.rowcount > 0
@@ -0,0 +1,42 @@
+from typing import Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+# keep IN (...) lists and multi-row inserts to a sane size
+LOOKUP_BATCH = 1000
+
+
+class EmbeddingCacheRepository:
+
+    @staticmethod
+    async def get_many(db: AsyncSession, keys: List[str]) -> Dict[str, bytes]:
+        found = {}
+
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            result = await db.execute(
+                select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding)
+                .where(EmbeddingCacheEntry.key.in_(keys[start:start + LOOKUP_BATCH]))
+            )
+            found.update({row.key: row.embedding for row in result})
+
+        return found
+
+    @staticmethod
+    async def put_many(db: AsyncSession, rows: List[dict]):
+        """Insert cache rows; concurrent writers of the same key are fine"""
+        for start in range(0, len(rows), LOOKUP_BATCH):
+            await db.execute(
+                insert(EmbeddingCacheEntry)
+                .values(rows[start:start + LOOKUP_BATCH])
+                .on_conflict_do_nothing(index_elements=["key"])
+            )
+
+        await db.commit()
+
+    @staticmethod
+    async def delete_all(db: AsyncSession):
+        result = await db.execute(delete(EmbeddingCacheEntry))
+        await db.commit()
+        return result.rowcount
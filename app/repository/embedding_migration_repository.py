@@ -0,0 +1,215 @@
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, text, bindparam
+from app.models.embedding_migration import EmbeddingMigration, ACTIVE_STATUSES
+from app.models.embedding_space import EmbeddingSpace
+from app.models.knowledge import Knowledge
+from app.utils.vector_codec import bind_vector
+
+SPACE_ROW_ID = 1
+
+KNOWLEDGE_TABLE = Knowledge.__table__.fullname
+
+# shadow column the migration writes; not mapped on Knowledge because it
+# only exists (with the target dimensions) while a migration is active
+SHADOW_COLUMN = "embedding_next"
+
+# chunks still waiting for a shadow vector (empty chunks are never embedded)
+PENDING = f"{SHADOW_COLUMN} IS NULL AND coalesce(content, '') <> ''"
+
+
+def namespace_sql(assistant_id: Optional[str]) -> str:
+    return "assistant_id IS NULL" if assistant_id is None else "assistant_id = :assistant_id"
+
+
+class EmbeddingMigrationRepository:
+
+    @staticmethod
+    async def get_space(db: AsyncSession):
+        return await db.get(EmbeddingSpace, SPACE_ROW_ID)
+
+    @staticmethod
+    async def lock_space(db: AsyncSession, exclusive: bool = False):
+        """
+        The space row, locked until commit. Writers of vectors take it
+        FOR SHARE and check it; switch / finalize take it FOR UPDATE
+        before locking the table, so neither side can deadlock the other.
+        """
+        result = await db.execute(
+            select(EmbeddingSpace)
+            .where(EmbeddingSpace.id == SPACE_ROW_ID)
+            .with_for_update(read=not exclusive)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def set_space(db: AsyncSession, model: str, dimensions: int):
+        await db.execute(
+            update(EmbeddingSpace)
+            .where(EmbeddingSpace.id == SPACE_ROW_ID)
+            .values(model=model, dimensions=dimensions)
+        )
+
+    @staticmethod
+    async def get_active(db: AsyncSession):
+        result = await db.execute(
+            select(EmbeddingMigration)
+            .where(EmbeddingMigration.status.in_(ACTIVE_STATUSES))
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, migration_id: str):
+        return await db.get(EmbeddingMigration, migration_id)
+
+    @staticmethod
+    async def get_recent(db: AsyncSession, limit: int = 10):
+        result = await db.execute(
+            select(EmbeddingMigration)
+            .order_by(EmbeddingMigration.created_at.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def create(db: AsyncSession, data: dict):
+        """Runs in the caller's transaction (caller commits)"""
+        migration = EmbeddingMigration(**data)
+        db.add(migration)
+        await db.flush()
+        return migration
+
+    @staticmethod
+    async def update(db: AsyncSession, migration_id: str, data: dict):
+        """Runs in the caller's transaction (caller commits)"""
+        await db.execute(
+            update(EmbeddingMigration)
+            .where(EmbeddingMigration.id == migration_id)
+            .values(**data)
+        )
+
+    @staticmethod
+    async def add_switched(db: AsyncSession, migration_id: str, namespace: str):
+        await db.execute(
+            update(EmbeddingMigration)
+            .where(
+                EmbeddingMigration.id == migration_id,
+                ~EmbeddingMigration.switched_namespaces.any(namespace),
+            )
+            .values(
+                switched_namespaces=func.array_append(
+                    EmbeddingMigration.switched_namespaces, namespace
+                )
+            )
+        )
+
+    @staticmethod
+    async def add_shadow_column(db: AsyncSession, dimensions: int):
+        # a cancelled migration may have left one with other dimensions
+        await db.execute(text(f"ALTER TABLE {KNOWLEDGE_TABLE} DROP COLUMN IF EXISTS {SHADOW_COLUMN}"))
+        await db.execute(text(
+            f"ALTER TABLE {KNOWLEDGE_TABLE} ADD COLUMN {SHADOW_COLUMN} vector({int(dimensions)})"
+        ))
+
+    @staticmethod
+    async def drop_shadow_column(db: AsyncSession):
+        await db.execute(text(f"ALTER TABLE {KNOWLEDGE_TABLE} DROP COLUMN IF EXISTS {SHADOW_COLUMN}"))
+
+    @staticmethod
+    async def promote_shadow_column(db: AsyncSession):
+        """Old vectors (and their indexes) dropped; shadow column takes the name"""
+        await db.execute(text(f"ALTER TABLE {KNOWLEDGE_TABLE} DROP COLUMN embedding"))
+        await db.execute(text(
+            f"ALTER TABLE {KNOWLEDGE_TABLE} RENAME COLUMN {SHADOW_COLUMN} TO embedding"
+        ))
+
+    @staticmethod
+    async def rename_shadow_indexes(db: AsyncSession):
+        """ix_knowledge_embedding_next_* → ix_knowledge_embedding_* (after promote)"""
+        table = Knowledge.__table__
+        prefix = f"ix_{table.name}_{SHADOW_COLUMN}_"
+        result = await db.execute(
+            text("""
+                SELECT indexname FROM pg_indexes
+                WHERE schemaname = :schema AND tablename = :table
+                  AND starts_with(indexname, :prefix)
+            """),
+            {"schema": table.schema, "table": table.name, "prefix": prefix},
+        )
+        for (name,) in result.all():
+            renamed = f"ix_{table.name}_embedding_" + name[len(prefix):]
+            await db.execute(text(f"ALTER INDEX {table.schema}.{name} RENAME TO {renamed}"))
+
+    @staticmethod
+    async def get_namespaces(db: AsyncSession) -> List[Optional[str]]:
+        """Namespaces holding chunks (None = global knowledge base)"""
+        result = await db.execute(select(Knowledge.assistant_id).distinct())
+        return [row.assistant_id for row in result]
+
+    @staticmethod
+    async def count_chunks(db: AsyncSession) -> int:
+        return await db.scalar(select(func.count()).select_from(Knowledge))
+
+    @staticmethod
+    async def count_pending(db: AsyncSession, assistant_id: Optional[str] = None, scoped: bool = False) -> int:
+        """Chunks without a shadow vector (whole table, or one namespace)"""
+        where = PENDING
+        params = {}
+        if scoped:
+            where += f" AND {namespace_sql(assistant_id)}"
+            if assistant_id is not None:
+                params["assistant_id"] = assistant_id
+        return await db.scalar(text(f"SELECT count(*) FROM {KNOWLEDGE_TABLE} WHERE {where}"), params)
+
+    @staticmethod
+    async def next_batch(db: AsyncSession, after: Optional[str], limit: int) -> List[Tuple[str, str]]:
+        """(id, content) of the next chunks without a shadow vector, by id"""
+        result = await db.execute(
+            text(f"""
+                SELECT id, content
+                FROM {KNOWLEDGE_TABLE}
+                WHERE {PENDING} AND id > :after
+                ORDER BY id
+                LIMIT :limit
+            """),
+            {"after": after or "", "limit": limit},
+        )
+        return [(row.id, row.content) for row in result]
+
+    @staticmethod
+    async def get_pending(
+        db: AsyncSession,
+        ids: Optional[Sequence[str]] = None,
+        assistant_id: Optional[str] = None,
+        scoped: bool = False,
+    ) -> List[Tuple[str, str]]:
+        """(id, content) without a shadow vector, among ids and / or in one namespace"""
+        where = [PENDING]
+        params = {}
+        if ids is not None:
+            where.append("id = ANY(:ids)")
+            params["ids"] = list(ids)
+        if scoped:
+            where.append(namespace_sql(assistant_id))
+            if assistant_id is not None:
+                params["assistant_id"] = assistant_id
+
+        result = await db.execute(
+            text(f"SELECT id, content FROM {KNOWLEDGE_TABLE} WHERE {' AND '.join(where)}"),
+            params,
+        )
+        return [(row.id, row.content) for row in result]
+
+    @staticmethod
+    async def write_vectors(db: AsyncSession, vectors: Sequence[Tuple[str, list]]):
+        """Shadow vectors for chunk ids, in the caller's transaction"""
+        if not vectors:
+            return
+        await db.execute(
+            text(f"""
+                UPDATE {KNOWLEDGE_TABLE}
+                SET {SHADOW_COLUMN} = CAST(:embedding AS vector)
+                WHERE id = :id
+            """).bindparams(bindparam("embedding"), bindparam("id")),
+            [{"id": chunk_id, "embedding": bind_vector(db, vector)} for chunk_id, vector in vectors],
+        )
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, or_, func, tuple_
+from app.models.ingestion_job import IngestionJob, IngestionStatus
+from app.repository.document_repository import in_namespace
+
+
+class IngestionJobRepository:
+
+    @staticmethod
+    async def create(db: AsyncSession, data: dict):
+        job = IngestionJob(**data)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def get_by_id(
+        db: AsyncSession,
+        job_id: str,
+        assistant_id: Optional[str] = None,
+        scoped: bool = False,
+    ):
+        """scoped: only a job of that namespace (None = global knowledge base)"""
+        query = select(IngestionJob).where(IngestionJob.id == job_id)
+        if scoped:
+            query = query.where(in_namespace(IngestionJob.assistant_id, assistant_id))
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        assistant_id: Optional[str] = None,
+    ):
+        """One keyset page of a namespace's jobs, newest first"""
+        query = select(IngestionJob).where(in_namespace(IngestionJob.assistant_id, assistant_id))
+        if after is not None:
+            query = query.where(tuple_(IngestionJob.created_at, IngestionJob.id) < tuple_(*after))
+
+        result = await db.execute(
+            query.order_by(IngestionJob.created_at.desc(), IngestionJob.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def claim(db: AsyncSession, job_id: str) -> bool:
+        """
+        Atomically move a pending job to processing.
+        Returns False if another worker already took it.
+        """
+        result = await db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == job_id,
+                IngestionJob.status == IngestionStatus.PENDING.value
+            )
+            .values(
+                status=IngestionStatus.PROCESSING.value,
+                processed_chunks=0,
+                error=None,
+                heartbeat_at=func.now(),
+            )
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    @staticmethod
+    async def update(db: AsyncSession, job_id: str, data: dict):
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(**data)
+        )
+        await db.commit()
+
+    @staticmethod
+    async def heartbeat(db: AsyncSession, job_id: str):
+        """Extend the lease of a job this worker is running"""
+        await db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == job_id,
+                IngestionJob.status == IngestionStatus.PROCESSING.value,
+            )
+            .values(heartbeat_at=func.now())
+        )
+        await db.commit()
+
+    @staticmethod
+    async def reset_interrupted(db: AsyncSession, lease_seconds: float):
+        """
+        Processing jobs whose worker stopped heartbeating (crash, restart)
+        go back to pending; jobs other live workers run are left alone.
+        Returns ids of every job that still needs to run (claim() keeps a
+        job enqueued by several processes from running twice).
+        """
+        await db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.status == IngestionStatus.PROCESSING.value,
+                or_(
+                    IngestionJob.heartbeat_at.is_(None),
+                    IngestionJob.heartbeat_at < func.now() - timedelta(seconds=lease_seconds),
+                ),
+            )
+            .values(status=IngestionStatus.PENDING.value, stage=None)
+        )
+        await db.commit()
+
+        result = await db.execute(
+            select(IngestionJob.id)
+            .where(IngestionJob.status == IngestionStatus.PENDING.value)
+            .order_by(IngestionJob.created_at)
+        )
+        return result.scalars().all()
@@ -1,57 +1,262 @@
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func, insert, tuple_
 from app.models.knowledge import Knowledge
-from app.services.embedding_service import EmbeddingService
-from app.services.chunking_service import ChunkingService
+from app.models.document import Document
+from app.repository.document_repository import DocumentRepository, in_namespace
+from app.repository.embedding_migration_repository import EmbeddingMigrationRepository
+from app.utils.helpers import sha256_hex
+from app.services.embedding_service import AsyncEmbeddingService
+from app.services.embedding_space import embedding_spaces
+from app.services.answer_cache import answer_cache
+from app.services.memory_vector_index import memory_vector_index
+
+COPY_COLUMNS = [
+    "id", "document_id", "assistant_id", "file_name", "file_type", "status", "file_size",
+    "content", "content_hash", "embedding",
+]
+
+# Fields the listing endpoint may project (embedding only on request)
+LISTABLE_FIELDS = (
+    "id", "document_id", "assistant_id", "file_name", "file_type", "status",
+    "file_size", "content", "content_hash", "embedding", "created_at",
+)
+DEFAULT_LIST_FIELDS = (
+    "id", "document_id", "file_name", "file_type", "content", "created_at",
+)
 
 
 class KnowledgeRepository:
 
     @staticmethod
-    async def create(db, data: dict):
-        content = data.get("content")
-        file_name = data.get("file_name")
-        file_type = data.get("file_type")
+    async def check_space(db: AsyncSession, model: str, dimensions: int):
+        """
+        Vectors about to be stored must come from the model knowledge is
+        embedded with; an embedding migration finalized since they were
+        computed makes them unusable. Holds the space row until commit.
+        """
+        space = await EmbeddingMigrationRepository.lock_space(db)
+        if space is not None and (space.model, space.dimensions) != (model, dimensions):
+            raise RuntimeError(
+                f"Knowledge is now embedded with {space.model} ({space.dimensions} dims), "
+                f"not {model}; upload the file again"
+            )
+
+    @staticmethod
+    async def insert_chunks(
+        db: AsyncSession,
+        document: Document,
+        chunks: list,
+        embeddings: list,
+    ):
+        """
+        Bulk insert chunk rows in the caller's transaction (caller commits).
+        Returns the inserted rows as dicts.
+        """
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "document_id": document.id,
+                "assistant_id": document.assistant_id,
+                "file_name": document.file_name,
+                "file_type": document.file_type,
+                "status": "processed",
+                "file_size": 0.0,
+                "content": chunk,  # store chunk instead of full document
+                "content_hash": sha256_hex(chunk),
+                "embedding": embedding,
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+
+        if not rows:
+            return rows
+
+        if db.bind.dialect.driver == "asyncpg":
+            await KnowledgeRepository._copy_rows(db, rows)
+        else:
+            # multi-row executemany fallback for other drivers
+            await db.execute(insert(Knowledge), rows)
+
+        return rows
+
+    @staticmethod
+    async def _copy_rows(db: AsyncSession, rows: list):
+        """
+        COPY ... FROM STDIN (binary) on the session's own connection, so it
+        stays inside the current transaction. Vectors use the binary
+        pgvector codec registered in app.config.database.
+        """
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
 
-        # 🔥 STEP 1: Split file into chunks (REAL RAG FIX)
-        chunks = ChunkingService.chunk_text(content)
+        table = Knowledge.__table__
+        await raw.driver_connection.copy_records_to_table(
+            table.name,
+            schema_name=table.schema,
+            columns=COPY_COLUMNS,
+            records=[tuple(row[column] for column in COPY_COLUMNS) for row in rows],
+        )
+
+    @staticmethod
+    async def get_chunk_hashes(db: AsyncSession, document_id: str):
+        """(id, content_hash) of every stored chunk of a document"""
+        result = await db.execute(
+            select(Knowledge.id, Knowledge.content_hash)
+            .where(Knowledge.document_id == document_id)
+        )
+        return result.all()
 
-        saved_records = []
+    @staticmethod
+    def plan_sync(existing, new_hashes: List[str]) -> dict:
+        """
+        Diff stored chunks against a new chunk set by content hash.
+        Duplicated chunks are matched one-for-one (multiset diff).
+        """
+        wanted = Counter(new_hashes)
+        delete_ids = []
+
+        for chunk_id, content_hash in existing:
+            if wanted[content_hash] > 0:
+                wanted[content_hash] -= 1
+            else:
+                delete_ids.append(chunk_id)
+
+        insert_indices = []
+        for index, content_hash in enumerate(new_hashes):
+            if wanted[content_hash] > 0:
+                wanted[content_hash] -= 1
+                insert_indices.append(index)
 
-        for chunk in chunks:
-            # 🔥 STEP 2: Create embedding per chunk
-            embedding = EmbeddingService.get_embedding(chunk)
+        return {
+            "insert": insert_indices,
+            "delete": delete_ids,
+            "unchanged": len(existing) - len(delete_ids),
+        }
+
+    @staticmethod
+    async def sync_document(
+        db: AsyncSession,
+        document: Document,
+        chunks: List[str],
+        embeddings_by_hash: Dict[str, list],
+        space: Optional[Tuple[str, int]] = None,
+    ) -> dict:
+        """
+        Make the stored chunks of `document` equal to `chunks`:
+        insert new ones, delete removed ones, leave unchanged rows alone.
+        Runs in the caller's transaction (caller commits).
 
-            knowledge = Knowledge(
-                file_name=file_name,
-                file_type=file_type,
-                content=chunk,  # store chunk instead of full document
-                embedding=embedding
+        The diff is recomputed under a per-document lock, so a plan
+        made earlier can never double-insert; chunks it did not cover
+        (concurrent upload of the same file) are embedded here.
+
+        space: (model, dimensions) embeddings_by_hash was computed with
+        (default: the current embedding space).
+        """
+        await db.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(document.id)))
+        )
+        model, dimensions = space or (embedding_spaces.model, embedding_spaces.dimensions)
+        await KnowledgeRepository.check_space(db, model, dimensions)
+
+        hashes = [sha256_hex(chunk) for chunk in chunks]
+        existing = await KnowledgeRepository.get_chunk_hashes(db, document.id)
+        plan = KnowledgeRepository.plan_sync(existing, hashes)
+
+        missing = [chunks[i] for i in plan["insert"] if hashes[i] not in embeddings_by_hash]
+        if missing:
+            fresh = await AsyncEmbeddingService.get_embeddings(
+                missing, model=model, dimensions=dimensions
             )
+            embeddings_by_hash = {
+                **embeddings_by_hash,
+                **{sha256_hex(chunk): vector for chunk, vector in zip(missing, fresh)},
+            }
 
-            db.add(knowledge)
-            saved_records.append(knowledge)
+        if plan["delete"]:
+            await db.execute(
+                delete(Knowledge).where(Knowledge.id.in_(plan["delete"]))
+            )
 
-        await db.commit()
+        # deleted ids and inserted rows are kept for the post-commit
+        # hooks (answer cache, memory index)
+        plan["rows"] = await KnowledgeRepository.insert_chunks(
+            db,
+            document,
+            [chunks[i] for i in plan["insert"]],
+            [embeddings_by_hash[hashes[i]] for i in plan["insert"]],
+        )
 
-        # return first record (for API response)
-        return saved_records[0] if saved_records else None
+        return plan
 
     @staticmethod
-    async def get_all(db: AsyncSession):
-        result = await db.execute(select(Knowledge))
-        return result.scalars().all()
+    async def get_page(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS,
+        content_chars: Optional[int] = None,
+        assistant_id: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        One keyset page of a namespace, newest first, ordered by (created_at, id).
+        Only the requested columns are selected; content can be cut
+        to content_chars in SQL so long chunks never leave the DB.
+        """
+        columns = []
+        for field in fields:
+            column = getattr(Knowledge, field)
+            if field == "content" and content_chars:
+                column = func.left(Knowledge.content, content_chars)
+            columns.append(column.label(field))
+
+        # cursor fields are always needed to build the next cursor
+        columns.append(Knowledge.created_at.label("_cursor_created_at"))
+        columns.append(Knowledge.id.label("_cursor_id"))
+
+        query = select(*columns).where(in_namespace(Knowledge.assistant_id, assistant_id))
+
+        if after is not None:
+            query = query.where(
+                tuple_(Knowledge.created_at, Knowledge.id) < tuple_(*after)
+            )
+
+        query = query.order_by(
+            Knowledge.created_at.desc(), Knowledge.id.desc()
+        ).limit(limit)
+
+        result = await db.execute(query)
+        return [dict(row) for row in result.mappings()]
 
     @staticmethod
-    async def delete_by_id(db: AsyncSession, knowledge_id: str):
+    async def delete_by_id(
+        db: AsyncSession,
+        knowledge_id: str,
+        assistant_id: Optional[str] = None,
+    ):
         result = await db.execute(
-            delete(Knowledge).where(Knowledge.id == knowledge_id)
+            delete(Knowledge)
+            .where(
+                Knowledge.id == knowledge_id,
+                in_namespace(Knowledge.assistant_id, assistant_id),
+            )
+            .returning(Knowledge.document_id)
         )
-        await db.commit()
-        return result.rowcount > 0
+        deleted = result.first()
+
+        if deleted and deleted.document_id:
+            await DocumentRepository.update(db, deleted.document_id, {
+                "chunk_count": Document.chunk_count - 1,
+            })
 
-    @staticmethod
-    async def delete_all(db: AsyncSession):
-        result = await db.execute(delete(Knowledge))
         await db.commit()
-        return result.rowcount > 0
\ No newline at end of file
+
+        if deleted:
+            answer_cache.invalidate_chunks([knowledge_id])
+            await memory_vector_index.apply(assistant_id, deleted_ids=[knowledge_id])
+
+        return deleted is not None
@@ -0,0 +1,60 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert
+from app.models.document import Document
+from app.models.knowledge_stats import KnowledgeStats
+
+STATS_ROW_ID = 1
+
+STAT_COLUMNS = (
+    "total_documents", "processed_documents", "pending_documents",
+    "failed_documents", "total_chunks", "total_bytes",
+)
+
+
+def aggregate_query():
+    """All dashboard counters in one pass over knowledge_documents"""
+    return select(
+        func.count().label("total_documents"),
+        func.count().filter(Document.status == "processed").label("processed_documents"),
+        func.count().filter(
+            Document.status.in_(["pending", "processing"])
+        ).label("pending_documents"),
+        func.count().filter(Document.status == "failed").label("failed_documents"),
+        func.coalesce(func.sum(Document.chunk_count), 0).label("total_chunks"),
+        func.coalesce(func.sum(Document.byte_size), 0).label("total_bytes"),
+    ).select_from(Document)
+
+
+class KnowledgeStatsRepository:
+
+    @staticmethod
+    async def get(db: AsyncSession):
+        """The counters row (primary key lookup)"""
+        return await db.get(KnowledgeStats, STATS_ROW_ID)
+
+    @staticmethod
+    async def aggregate(db: AsyncSession) -> dict:
+        result = await db.execute(aggregate_query())
+        return dict(result.mappings().one())
+
+    @staticmethod
+    async def reconcile(db: AsyncSession) -> dict:
+        """
+        Rebuild the counters row from the documents table.
+        SHARE lock keeps document writes (and their trigger deltas)
+        out until the rebuilt row is committed.
+        """
+        await db.execute(
+            text(f"LOCK TABLE {Document.__table__.fullname} IN SHARE MODE")
+        )
+        counts = await KnowledgeStatsRepository.aggregate(db)
+
+        values = {**counts, "updated_at": func.now(), "reconciled_at": func.now()}
+        await db.execute(
+            insert(KnowledgeStats)
+            .values(id=STATS_ROW_ID, **values)
+            .on_conflict_do_update(index_elements=["id"], set_=values)
+        )
+        await db.commit()
+        return counts
@@ -38,6 +38,7 @@ class AssistantData(BaseModel):
     detect_caller_number: Optional[bool] = None
     multilingual_support: Optional[bool] = None
     voice_recording: Optional[bool] = None
+    rag_max_distance: Optional[float] = None
 
     created_at: Optional[datetime] = None
 
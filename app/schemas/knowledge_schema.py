@@ -26,3 +26,58 @@ class KnowledgeResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DocumentResponse(BaseModel):
+    """
+    One uploaded file (file-level view, no chunk content)
+    """
+    id: str
+    assistant_id: Optional[str] = None
+    file_name: str
+    file_type: Optional[str] = None
+    file_hash: Optional[str] = None
+    byte_size: int = 0
+    chunk_count: int = 0
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class IngestionJobResponse(BaseModel):
+    """
+    Background ingestion job (returned by upload + job status endpoints)
+    """
+    id: str
+    document_id: Optional[str] = None
+    assistant_id: Optional[str] = None
+    file_name: str
+    file_type: str
+    status: str
+    stage: Optional[str] = None
+    file_hash: Optional[str] = None
+    byte_size: int = 0
+    duplicate_of: Optional[str] = None
+    total_chunks: int = 0
+    processed_chunks: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class IngestionJobProgress(BaseModel):
+    """
+    Lightweight progress view for polling
+    """
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    total_chunks: int = 0
+    processed_chunks: int = 0
+    percent: float = 0.0
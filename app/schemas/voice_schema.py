@@ -18,6 +18,9 @@ class AssistantConfigureUpdate(BaseModel):
     multilingual_support: Optional[bool] = False
     voice_recording: Optional[bool] = False
 
+    # Knowledge base answers: max retrieval distance (None = global default)
+    rag_max_distance: Optional[float] = None
+
 
 class AssistantConfigureResponse(BaseModel):
     assistant_id: str
@@ -32,6 +35,7 @@ class AssistantConfigureResponse(BaseModel):
     detect_caller_number: Optional[bool] = None
     multilingual_support: Optional[bool] = None
     voice_recording: Optional[bool] = None
+    rag_max_distance: Optional[float] = None
 
     model_config = {
         "from_attributes": True
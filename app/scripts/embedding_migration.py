@@ -0,0 +1,86 @@
+"""
+Online re-embedding of the knowledge base with another embedding model
+
+    python -m app.scripts.embedding_migration status
+    python -m app.scripts.embedding_migration start --model text-embedding-3-large [--dimensions 1024]
+    python -m app.scripts.embedding_migration run
+    python -m app.scripts.embedding_migration switch [--namespace ASSISTANT_ID | --all]
+    python -m app.scripts.embedding_migration finalize
+    python -m app.scripts.embedding_migration cancel
+
+start adds the shadow column knowledge.embedding_next; the backfill then
+runs in the API workers (or here with run, resumable from its cursor).
+Once backfilled, switch moves namespaces to the new vectors one by one
+(without --namespace: the global knowledge base) and finalize makes
+them knowledge.embedding for good. Until finalize, cancel drops them.
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.config.database import engine
+from app.config.settings import settings
+from app.services.embedding_migration_service import EmbeddingMigrationService
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.scripts.embedding_migration")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="stored embedding model and migration progress")
+
+    start = commands.add_parser("start", help="start re-embedding with another model")
+    start.add_argument("--model", required=True)
+    start.add_argument("--dimensions", type=int, default=settings.EMBEDDING_DIMENSIONS)
+
+    commands.add_parser("run", help="backfill in this process until done")
+
+    switch = commands.add_parser("switch", help="search a namespace with the new vectors")
+    switch.add_argument("--namespace", help="assistant id (default: global knowledge base)")
+    switch.add_argument("--all", action="store_true", help="every namespace")
+
+    commands.add_parser("finalize", help="replace knowledge.embedding with the new vectors")
+    commands.add_parser("cancel", help="drop the new vectors")
+
+    return parser
+
+
+async def run(args):
+    try:
+        if args.command == "start":
+            migration = await EmbeddingMigrationService.start(args.model, args.dimensions)
+            return EmbeddingMigrationService.describe(migration)
+
+        if args.command == "run":
+            result = await EmbeddingMigrationService.backfill()
+            if result is None:
+                raise SystemExit("Nothing to backfill, or another process is backfilling")
+            return result
+
+        if args.command == "switch":
+            if args.all:
+                return await EmbeddingMigrationService.switch_all()
+            return await EmbeddingMigrationService.switch(args.namespace)
+
+        if args.command == "finalize":
+            return await EmbeddingMigrationService.finalize()
+
+        if args.command == "cancel":
+            return await EmbeddingMigrationService.cancel()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    return await EmbeddingMigrationService.status()
+
+
+async def main():
+    args = build_parser().parse_args()
+    try:
+        print(json.dumps(await run(args), indent=2, default=str))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
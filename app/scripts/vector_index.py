@@ -0,0 +1,146 @@
+"""
+Vector index management for the knowledge base
+
+    python -m app.scripts.vector_index status
+    python -m app.scripts.vector_index create [--type hnsw|ivfflat] [--metric cosine|ip|l2]
+                                              [--m 16] [--ef-construction 64] [--lists N]
+                                              [--quantization none|halfvec|binary] [--dimensions N]
+                                              [--namespace ASSISTANT_ID]
+    python -m app.scripts.vector_index drop NAME
+    python -m app.scripts.vector_index recall [--sample 50] [--k 10] [--ef-search 40] [--probes 10]
+                                              [--quantization none|halfvec|binary] [--dimensions N]
+                                              [--namespace ASSISTANT_ID]
+    python -m app.scripts.vector_index bench [--quantization none,halfvec,binary] [--dimensions 1536,512]
+                                             [--sample 50] [--k 10] [--keep] [--namespace ASSISTANT_ID]
+
+bench builds one index per quantization x dimensions and reports recall@k
+(candidate pool reranked at full precision) and index / vector size saved
+against float32. Compact indexes need pgvector >= 0.7.
+
+Indexes are partial per knowledge namespace; without --namespace the
+global knowledge base is targeted. Defaults come from the VECTOR INDEX
+section of settings.
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.config.database import AsyncSessionLocal, engine
+from app.services.embedding_space import embedding_spaces
+from app.services.vector_index_service import (
+    VectorIndexService,
+    INDEX_TYPES,
+    METRICS,
+    QUANTIZATIONS,
+)
+
+
+def csv(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.scripts.vector_index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="list ANN indexes on knowledge.embedding")
+
+    create = commands.add_parser("create", help="build (or rebuild) the ANN index")
+    create.add_argument("--type", choices=INDEX_TYPES)
+    create.add_argument("--metric", choices=list(METRICS))
+    create.add_argument("--m", type=int)
+    create.add_argument("--ef-construction", type=int)
+    create.add_argument("--lists", type=int)
+    create.add_argument("--keep-others", action="store_true", help="do not drop other ANN indexes")
+    create.add_argument("--quantization", choices=QUANTIZATIONS)
+    create.add_argument("--dimensions", type=int, help="index the leading N dimensions")
+    create.add_argument("--namespace", help="assistant id (default: global knowledge base)")
+
+    drop = commands.add_parser("drop", help="drop an index by name")
+    drop.add_argument("name")
+
+    recall = commands.add_parser("recall", help="recall@k of the index vs exact search")
+    recall.add_argument("--sample", type=int, default=50)
+    recall.add_argument("--k", type=int, default=10)
+    recall.add_argument("--ef-search", type=int)
+    recall.add_argument("--probes", type=int)
+    recall.add_argument("--quantization", choices=QUANTIZATIONS)
+    recall.add_argument("--dimensions", type=int)
+    recall.add_argument("--namespace", help="assistant id (default: global knowledge base)")
+
+    bench = commands.add_parser("bench", help="recall@k and storage per quantization / dimensions")
+    bench.add_argument("--quantization", type=csv(str), default=list(QUANTIZATIONS))
+    bench.add_argument("--dimensions", type=csv(int), default=[])
+    bench.add_argument("--type", choices=INDEX_TYPES)
+    bench.add_argument("--sample", type=int, default=50)
+    bench.add_argument("--k", type=int, default=10)
+    bench.add_argument("--keep", action="store_true", help="keep the benchmark indexes")
+    bench.add_argument("--namespace", help="assistant id (default: global knowledge base)")
+
+    return parser
+
+
+async def run(args):
+    # index / compact dimensions follow the stored embedding space
+    await embedding_spaces.refresh(force=True)
+
+    if args.command == "status":
+        return await VectorIndexService.list_indexes()
+
+    if args.command == "create":
+        name = await VectorIndexService.create_index(
+            index_type=args.type,
+            metric=args.metric,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+            replace=not args.keep_others,
+            namespace=args.namespace,
+            quantization=args.quantization,
+            dimensions=args.dimensions,
+        )
+        return {"created": name}
+
+    if args.command == "drop":
+        await VectorIndexService.drop_index(args.name)
+        return {"dropped": args.name}
+
+    async with AsyncSessionLocal() as db:
+        if args.command == "bench":
+            unknown = set(args.quantization) - set(QUANTIZATIONS)
+            if unknown:
+                raise SystemExit(f"Unknown quantization: {', '.join(sorted(unknown))}")
+            return await VectorIndexService.benchmark(
+                db,
+                quantizations=args.quantization,
+                dimensions=args.dimensions,
+                sample_size=args.sample,
+                k=args.k,
+                index_type=args.type,
+                namespace=args.namespace,
+                keep=args.keep,
+            )
+
+        return await VectorIndexService.measure_recall(
+            db,
+            sample_size=args.sample,
+            k=args.k,
+            ef_search=args.ef_search,
+            probes=args.probes,
+            namespace=args.namespace,
+            quantization=args.quantization,
+            dimensions=args.dimensions,
+        )
+
+
+async def main():
+    args = build_parser().parse_args()
+    try:
+        print(json.dumps(await run(args), indent=2, default=str))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,198 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+
+# near-duplicate phrasings kept per retrieved chunk set
+MAX_ENTRIES_PER_GROUP = 8
+
+
+@dataclass
+class _Entry:
+    embedding: Optional[np.ndarray]  # None: stored without a query vector (lexical search)
+    query: str                       # normalized query text
+    answer: str
+    expires_at: float
+
+
+@dataclass
+class _Group:
+    """Cached answers produced from one exact set of retrieved chunks"""
+    chunk_ids: Tuple[str, ...]
+    document_ids: Set[str]
+    entries: List[_Entry] = field(default_factory=list)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of RAG answers keyed by (query embedding, retrieved chunks).
+
+    A lookup hits when the new query retrieved exactly the same chunks and
+    its embedding is within `threshold` cosine similarity of a cached query
+    (without an embedding, e.g. lexical search: the same normalized text).
+    Retrieval still runs on every request; the LLM call is what is skipped.
+    Entries are dropped when any chunk / document they used is deleted.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+
+        self._groups: "OrderedDict[Tuple[str, ...], _Group]" = OrderedDict()
+        self._by_chunk: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._by_document: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._entries = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def group_key(chunk_ids: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(sorted(chunk_ids))
+
+    def lookup(
+        self,
+        embedding: Optional[np.ndarray],
+        chunk_ids: Iterable[str],
+        query: str = "",
+    ) -> Optional[str]:
+        key = self.group_key(chunk_ids)
+        group = self._groups.get(key)
+
+        if group is not None:
+            now = time.monotonic()
+            live = [entry for entry in group.entries if entry.expires_at > now]
+            self._entries -= len(group.entries) - len(live)
+            group.entries = live
+
+            answer = self._match(live, embedding, query)
+            if answer is not None:
+                self._groups.move_to_end(key)
+                self.hits += 1
+                return answer
+            if not live:
+                self._drop(key)
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        embedding: Optional[np.ndarray],
+        chunk_ids: Iterable[str],
+        document_ids: Iterable[str],
+        answer: str,
+        query: str = "",
+    ):
+        key = self.group_key(chunk_ids)
+        if not key:
+            return
+
+        group = self._groups.get(key)
+        if group is None:
+            group = _Group(chunk_ids=key, document_ids={d for d in document_ids if d})
+            self._groups[key] = group
+            for chunk_id in key:
+                self._by_chunk.setdefault(chunk_id, set()).add(key)
+            for document_id in group.document_ids:
+                self._by_document.setdefault(document_id, set()).add(key)
+        else:
+            self._groups.move_to_end(key)
+
+        group.entries.append(
+            _Entry(embedding, query, answer, time.monotonic() + self.ttl_seconds)
+        )
+        self._entries += 1
+
+        if len(group.entries) > MAX_ENTRIES_PER_GROUP:
+            group.entries.pop(0)
+            self._entries -= 1
+
+        while self._entries > self.max_entries and self._groups:
+            self._drop(next(iter(self._groups)))
+            self.evictions += 1
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]):
+        for chunk_id in chunk_ids:
+            for key in self._by_chunk.pop(chunk_id, set()):
+                if self._drop(key):
+                    self.invalidations += 1
+
+    def invalidate_documents(self, document_ids: Iterable[str]):
+        for document_id in document_ids:
+            for key in self._by_document.pop(document_id, set()):
+                if self._drop(key):
+                    self.invalidations += 1
+
+    def clear(self):
+        self._groups.clear()
+        self._by_chunk.clear()
+        self._by_document.clear()
+        self._entries = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "groups": len(self._groups),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _match(self, entries: List[_Entry], embedding: Optional[np.ndarray], query: str) -> Optional[str]:
+        same_text = [e for e in entries if query and e.query == query]
+        if same_text:
+            return same_text[-1].answer
+        if embedding is None:
+            return None
+
+        # entries from another embedding model (mid migration) never match
+        comparable = [
+            e for e in entries if e.embedding is not None and e.embedding.shape == embedding.shape
+        ]
+        if not comparable:
+            return None
+
+        # OpenAI embeddings are unit length: dot product = cosine
+        similarities = np.stack([e.embedding for e in comparable]) @ embedding
+        best = int(np.argmax(similarities))
+        return comparable[best].answer if similarities[best] >= self.threshold else None
+
+    def _drop(self, key: Tuple[str, ...]) -> bool:
+        group = self._groups.pop(key, None)
+        if group is None:
+            return False
+
+        self._entries -= len(group.entries)
+        for chunk_id in group.chunk_ids:
+            keys = self._by_chunk.get(chunk_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_chunk[chunk_id]
+        for document_id in group.document_ids:
+            keys = self._by_document.get(document_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_document[document_id]
+        return True
+
+
+answer_cache = SemanticAnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
@@ -1,11 +1,118 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Union
+
+from app.config.settings import settings
+from app.utils.tokens import count_tokens
+
+# Paragraph break: blank line (separator stays with the paragraph before it)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+
+# Sentence end: . ! ? (plus closing quotes / brackets) followed by whitespace
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+LINE_BREAK = re.compile(r"\n\s*")
+
+WORD_BREAK = re.compile(r"\s+")
+
+# Finer split used when a unit is still larger than a chunk
+NEXT_SPLIT = {
+    SENTENCE_BREAK: LINE_BREAK,
+    LINE_BREAK: WORD_BREAK,
+}
+
+# A document without blank lines never completes a paragraph; past this
+# many buffered chars we fall back to sentence units to keep memory flat
+MAX_BUFFERED_CHARS = 20_000
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int        # char offset in the full document
+    end: int          # exclusive
+    token_count: int
+
+
+@dataclass
+class _Unit:
+    text: str         # includes trailing separator, so units tile the document
+    start: int
+    tokens: int
+
+
 class ChunkingService:
     """
     Split large file content into smaller chunks
     So RAG can find exact answers instead of full document
     """
 
+    @staticmethod
+    def chunk(source: Union[str, Iterable[str]]) -> Iterator[Chunk]:
+        """
+        Chunk with the configured strategy (CHUNKING_MODE):
+        "tokens" = token-aware, boundary-respecting (default)
+        "chars"  = legacy fixed 800 / 100 char windows
+        """
+        if settings.CHUNKING_MODE == "chars":
+            text = source if isinstance(source, str) else "".join(source)
+            return ChunkingService._legacy_chunks(text)
+
+        return ChunkingService.iter_chunks(source)
+
+    @staticmethod
+    def iter_chunks(
+        source: Union[str, Iterable[str]],
+        max_tokens: int = None,
+        overlap_tokens: int = None,
+    ) -> Iterator[Chunk]:
+        """
+        Lazily chunk a text stream (e.g. one string per PDF page).
+        Whole paragraphs are packed while they fit; oversized ones are
+        split at sentences, then lines, then words. Trailing units of
+        each chunk (up to overlap_tokens) are repeated in the next one.
+        """
+        max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+        if overlap_tokens is None:
+            overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+
+        if isinstance(source, str):
+            source = [source]
+
+        pending: List[_Unit] = []
+        pending_tokens = 0
+
+        for unit in ChunkingService._iter_units(source, max_tokens):
+            if pending and pending_tokens + unit.tokens > max_tokens:
+                chunk = ChunkingService._make_chunk(pending)
+                if chunk:
+                    yield chunk
+
+                # carry the tail over as overlap
+                kept = []
+                kept_tokens = 0
+                for previous in reversed(pending):
+                    if kept_tokens + previous.tokens > overlap_tokens:
+                        break
+                    kept.insert(0, previous)
+                    kept_tokens += previous.tokens
+
+                while kept and kept_tokens + unit.tokens > max_tokens:
+                    kept_tokens -= kept.pop(0).tokens
+
+                pending, pending_tokens = kept, kept_tokens
+
+            pending.append(unit)
+            pending_tokens += unit.tokens
+
+        if pending:
+            chunk = ChunkingService._make_chunk(pending)
+            if chunk:
+                yield chunk
+
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100):
+        """Legacy fixed-size char windows (CHUNKING_MODE=chars)"""
         chunks = []
         start = 0
         text_length = len(text)
@@ -16,4 +123,124 @@ class ChunkingService:
             chunks.append(chunk)
             start += chunk_size - overlap
 
-        return chunks
\ No newline at end of file
+        return chunks
+
+    # ------------------------------------------------------------------
+    # internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _legacy_chunks(text: str) -> Iterator[Chunk]:
+        step = 800 - 100
+        for index, chunk in enumerate(ChunkingService.chunk_text(text)):
+            start = index * step
+            yield Chunk(chunk, start, start + len(chunk), count_tokens(chunk))
+
+    @staticmethod
+    def _iter_units(stream: Iterable[str], max_tokens: int) -> Iterator[_Unit]:
+        """
+        Contiguous units covering the whole document: paragraphs,
+        or sentences / lines / words when a paragraph is too large.
+        """
+        buffer = ""
+        buffer_start = 0
+
+        for piece in stream:
+            if not piece:
+                continue
+            buffer += piece
+
+            # emit every complete paragraph, keep the open tail buffered
+            last_break = None
+            for match in PARAGRAPH_BREAK.finditer(buffer):
+                last_break = match
+            if last_break is not None and last_break.end() < len(buffer):
+                cut = last_break.end()
+                yield from ChunkingService._split_block(
+                    buffer[:cut], buffer_start, max_tokens
+                )
+                buffer_start += cut
+                buffer = buffer[cut:]
+
+            if len(buffer) > MAX_BUFFERED_CHARS:
+                for pattern in (SENTENCE_BREAK, LINE_BREAK):
+                    cut = ChunkingService._last_break(buffer, pattern)
+                    if cut:
+                        yield from ChunkingService._split_units(
+                            buffer[:cut], buffer_start, pattern, max_tokens
+                        )
+                        buffer_start += cut
+                        buffer = buffer[cut:]
+                        break
+
+        if buffer:
+            yield from ChunkingService._split_block(buffer, buffer_start, max_tokens)
+
+    @staticmethod
+    def _split_block(block: str, start: int, max_tokens: int) -> Iterator[_Unit]:
+        offset = start
+        for paragraph in ChunkingService._split_keep(block, PARAGRAPH_BREAK):
+            tokens = count_tokens(paragraph)
+            if tokens <= max_tokens:
+                yield _Unit(paragraph, offset, tokens)
+            else:
+                yield from ChunkingService._split_units(
+                    paragraph, offset, SENTENCE_BREAK, max_tokens
+                )
+            offset += len(paragraph)
+
+    @staticmethod
+    def _split_units(text: str, start: int, pattern, max_tokens: int) -> Iterator[_Unit]:
+        offset = start
+        for part in ChunkingService._split_keep(text, pattern):
+            tokens = count_tokens(part)
+            if tokens <= max_tokens:
+                yield _Unit(part, offset, tokens)
+            elif pattern in NEXT_SPLIT:
+                yield from ChunkingService._split_units(
+                    part, offset, NEXT_SPLIT[pattern], max_tokens
+                )
+            else:
+                # a single "word" longer than a chunk: hard split
+                pieces = -(-tokens // max_tokens)
+                size = -(-len(part) // pieces)
+                for index in range(0, len(part), size):
+                    piece = part[index:index + size]
+                    yield _Unit(piece, offset + index, count_tokens(piece))
+            offset += len(part)
+
+    @staticmethod
+    def _split_keep(text: str, pattern) -> List[str]:
+        """Split after each separator match, keeping the separator"""
+        parts = []
+        previous = 0
+        for match in pattern.finditer(text):
+            if match.end() > previous:
+                parts.append(text[previous:match.end()])
+                previous = match.end()
+        if previous < len(text):
+            parts.append(text[previous:])
+        return parts
+
+    @staticmethod
+    def _last_break(text: str, pattern) -> int:
+        last = 0
+        for match in pattern.finditer(text):
+            if match.end() < len(text):
+                last = match.end()
+        return last
+
+    @staticmethod
+    def _make_chunk(units: List[_Unit]):
+        raw = "".join(unit.text for unit in units)
+        text = raw.strip()
+        if not text:
+            return None
+
+        start = units[0].start + (len(raw) - len(raw.lstrip()))
+        return Chunk(
+            text=text,
+            start=start,
+            end=start + len(text),
+            token_count=sum(unit.tokens for unit in units),
+        )
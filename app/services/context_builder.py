@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.utils.tokens import count_tokens
+from app.utils.vector_codec import to_array
+
+# shortest shared text treated as chunk overlap (shorter = coincidence)
+MIN_OVERLAP_CHARS = 20
+
+
+@dataclass
+class Passage:
+    """One or more merged chunks of the same document"""
+    document_id: Optional[str]
+    text: str
+    tokens: int
+    results: List[dict] = field(default_factory=list)
+
+
+def merge_overlapping(first: str, second: str) -> Optional[str]:
+    """
+    Merge two chunks of one document if they overlap: either contains
+    the other, or the end of one is the start of the other. None otherwise.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+
+    for head, tail in ((first, second), (second, first)):
+        probe = tail[:MIN_OVERLAP_CHARS]
+        position = head.find(probe, max(0, len(head) - len(tail)))
+        while position != -1:
+            if tail.startswith(head[position:]):
+                return head + tail[len(head) - position:]
+            position = head.find(probe, position + 1)
+
+    return None
+
+
+def mmr_order(query: np.ndarray, embeddings: np.ndarray, lambda_: float) -> List[int]:
+    """
+    Maximal marginal relevance ranking of all rows:
+    argmax lambda * sim(query, d) - (1 - lambda) * max sim(d, selected)
+    """
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = embeddings @ query
+    similarity = embeddings @ embeddings.T
+
+    count = len(relevance)
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    order = []
+
+    for _ in range(count):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+
+        order.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return order
+
+
+class ContextBuilder:
+    """
+    Turns retrieved chunks into the LLM context: MMR for diversity,
+    overlapping chunks of one file merged, packed to a token budget
+    """
+
+    @staticmethod
+    def build(
+        results: List[dict],
+        query_embedding: Optional[np.ndarray] = None,
+        max_tokens: int = None,
+        lambda_: float = None,
+    ) -> Tuple[str, List[dict]]:
+        """Returns (context text, chunks that made it into the context)"""
+        max_tokens = max_tokens or settings.RAG_CONTEXT_MAX_TOKENS
+        lambda_ = settings.RAG_MMR_LAMBDA if lambda_ is None else lambda_
+
+        order = list(range(len(results)))
+        if (
+            query_embedding is not None
+            and len(results) > 1
+            and all(r.get("embedding") is not None for r in results)
+        ):
+            embeddings = np.stack([to_array(r["embedding"]) for r in results])
+            order = mmr_order(query_embedding, embeddings, lambda_)
+
+        passages: List[Passage] = []
+        used = 0
+
+        for index in order:
+            result = results[index]
+
+            # overlapping neighbour already in the context: extend it
+            merged = False
+            for passage in passages:
+                if not result["document_id"] or passage.document_id != result["document_id"]:
+                    continue
+
+                text = merge_overlapping(passage.text, result["content"])
+                if text is None:
+                    continue
+
+                merged = True
+                tokens = count_tokens(text)
+                if used - passage.tokens + tokens <= max_tokens:
+                    used += tokens - passage.tokens
+                    passage.text, passage.tokens = text, tokens
+                    passage.results.append(result)
+                break
+
+            if merged:
+                continue
+
+            tokens = count_tokens(result["content"])
+            if passages and used + tokens > max_tokens:
+                continue  # a later, shorter chunk may still fit
+
+            passages.append(Passage(result["document_id"], result["content"], tokens, [result]))
+            used += tokens
+
+        context = "\n\n".join(passage.text for passage in passages)
+        return context, [r for passage in passages for r in passage.results]
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.config.database import AsyncSessionLocal
+from app.config.settings import settings
+from app.repository.embedding_cache_repository import EmbeddingCacheRepository
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# per-entry bookkeeping on top of the raw vector bytes
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFKC + collapsed whitespace, so re-extracted text still hits"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def to_bytes(embedding) -> bytes:
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    """Read-only float32 view of the stored bytes (no copy)"""
+    return np.frombuffer(data, dtype="<f4")
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache in front of the embeddings API:
+    in-process LRU (size bounded) → embedding_cache table → OpenAI
+    """
+
+    def __init__(self, max_memory_bytes: int):
+        self.memory = LRUCache(
+            max_memory_bytes,
+            sizeof=lambda value: len(value) + ENTRY_OVERHEAD_BYTES
+        )
+        self.store_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @staticmethod
+    def make_key(text: str, model: str = None, dimensions: int = None) -> str:
+        model = model or settings.EMBEDDING_MODEL
+        dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+        raw = f"{model}\x00{dimensions}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        missing = []
+
+        for key in dict.fromkeys(keys):
+            cached = self.memory.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                found[key] = from_bytes(cached)
+
+        if missing:
+            async with AsyncSessionLocal() as db:
+                stored = await EmbeddingCacheRepository.get_many(db, missing)
+
+            for key, data in stored.items():
+                self.memory.put(key, data)
+                found[key] = from_bytes(data)
+
+            self.store_hits += len(stored)
+            self.misses += len(missing) - len(stored)
+
+        return found
+
+    async def put_many(self, items: Dict[str, np.ndarray], model: str = None):
+        if not items:
+            return
+
+        rows = []
+        for key, embedding in items.items():
+            data = to_bytes(embedding)
+            self.memory.put(key, data)
+            rows.append({
+                "key": key,
+                "model": model or settings.EMBEDDING_MODEL,
+                "dimensions": len(embedding),
+                "embedding": data,
+            })
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await EmbeddingCacheRepository.put_many(db, rows)
+            self.writes += len(rows)
+        except Exception:
+            # cache write failures must never fail ingestion
+            logger.exception("⚠️ Could not persist embedding cache entries")
+
+    async def clear(self):
+        self.memory.clear()
+        async with AsyncSessionLocal() as db:
+            return await EmbeddingCacheRepository.delete_all(db)
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        total = memory["hits"] + self.store_hits + self.misses
+        return {
+            "memory_hits": memory["hits"],
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round((total - self.misses) / total, 4) if total else 0.0,
+            "memory": memory,
+        }
+
+
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_MEMORY_BYTES)
@@ -0,0 +1,453 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, func, text
+
+from app.config.database import AsyncSessionLocal, engine
+from app.config.settings import settings
+from app.models.embedding_migration import MigrationStatus
+from app.repository.embedding_migration_repository import (
+    EmbeddingMigrationRepository,
+    KNOWLEDGE_TABLE,
+    SHADOW_COLUMN,
+)
+from app.services.answer_cache import answer_cache
+from app.services.embedding_service import AsyncEmbeddingService
+from app.services.embedding_space import embedding_spaces
+from app.services.memory_vector_index import memory_vector_index
+from app.services.vector_index_service import (
+    VectorIndexService,
+    index_column,
+    indexdef_namespace,
+    is_compact,
+)
+from app.utils.namespaces import namespace_key
+
+logger = logging.getLogger(__name__)
+
+# one backfill worker across processes (session lock), and switch /
+# finalize / cancel serialized against each other (transaction lock)
+BACKFILL_LOCK = "knowledge_embedding_migration_backfill"
+SWITCH_LOCK = "knowledge_embedding_migration_switch"
+
+# catch-up rounds before switch / finalize give up on ingestion outpacing them
+CUTOVER_ATTEMPTS = 3
+
+
+class EmbeddingMigrationService:
+    """
+    Online re-embedding of the knowledge base (blue / green):
+
+    start     → shadow column knowledge.embedding_next (target dimensions)
+    backfill  → re-embed every chunk into it, resumable and rate limited;
+                chunks ingested meanwhile are embedded on insert
+    switch    → per namespace, searches move to the shadow vectors and
+                the target model (query + stored vectors always agree)
+    finalize  → shadow column becomes knowledge.embedding, the stored
+                embedding space becomes the target model
+    cancel    → shadow column dropped, nothing else changed
+    """
+
+    @staticmethod
+    async def start(model: str, dimensions: int):
+        async with AsyncSessionLocal() as db:
+            if await EmbeddingMigrationRepository.get_active(db):
+                raise ValueError("An embedding migration is already in progress")
+
+            space = await EmbeddingMigrationRepository.get_space(db)
+            if space and (space.model, space.dimensions) == (model, dimensions):
+                raise ValueError(f"Knowledge is already embedded with {model} ({dimensions} dims)")
+
+            await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(SWITCH_LOCK))))
+            await EmbeddingMigrationRepository.add_shadow_column(db, dimensions)
+            migration = await EmbeddingMigrationRepository.create(db, {
+                "source_model": space.model if space else settings.EMBEDDING_MODEL,
+                "source_dimensions": space.dimensions if space else settings.EMBEDDING_DIMENSIONS,
+                "target_model": model,
+                "target_dimensions": dimensions,
+                "status": MigrationStatus.BACKFILLING.value,
+                "total_chunks": await EmbeddingMigrationRepository.count_chunks(db),
+            })
+            await db.commit()
+
+        await embedding_spaces.refresh(force=True)
+        logger.info(f"🔁 Embedding migration {migration.id} started: → {model} ({dimensions} dims)")
+        return migration
+
+    @staticmethod
+    async def backfill() -> Optional[dict]:
+        """
+        Re-embed the chunks that have no shadow vector yet, in id order,
+        from the saved cursor. Returns None when another process holds
+        the backfill lock or nothing is backfilling.
+        """
+        async with engine.connect() as lock_conn:
+            locked = await lock_conn.scalar(
+                select(func.pg_try_advisory_lock(func.hashtext(BACKFILL_LOCK)))
+            )
+            await lock_conn.commit()
+            if not locked:
+                return None
+            try:
+                return await EmbeddingMigrationService._backfill_locked()
+            finally:
+                await lock_conn.execute(
+                    select(func.pg_advisory_unlock(func.hashtext(BACKFILL_LOCK)))
+                )
+                await lock_conn.commit()
+
+    @staticmethod
+    async def _backfill_locked() -> Optional[dict]:
+        async with AsyncSessionLocal() as db:
+            migration = await EmbeddingMigrationRepository.get_active(db)
+            if migration is None or migration.status != MigrationStatus.BACKFILLING.value:
+                return None
+
+            cursor = migration.cursor
+            processed = migration.processed_chunks
+            rate = settings.EMBEDDING_MIGRATION_CHUNKS_PER_MINUTE
+            started = time.monotonic()
+            done = 0
+
+            try:
+                while True:
+                    batch = await EmbeddingMigrationRepository.next_batch(
+                        db, cursor, settings.EMBEDDING_MIGRATION_BATCH_SIZE
+                    )
+                    if not batch:
+                        break
+
+                    await EmbeddingMigrationService._embed_rows(db, migration, batch)
+                    cursor = batch[-1][0]
+                    processed += len(batch)
+                    done += len(batch)
+                    await EmbeddingMigrationRepository.update(db, migration.id, {
+                        "cursor": cursor,
+                        "processed_chunks": processed,
+                        "error": None,
+                    })
+                    await db.commit()
+
+                    # cancelled (or failed over) from elsewhere → stop here
+                    await db.refresh(migration)
+                    if migration.status != MigrationStatus.BACKFILLING.value:
+                        return EmbeddingMigrationService.describe(migration)
+
+                    # stay under the embedding API budget shared with ingestion
+                    if rate > 0:
+                        ahead = done * 60.0 / rate - (time.monotonic() - started)
+                        if ahead > 0:
+                            await asyncio.sleep(ahead)
+
+                await EmbeddingMigrationService._build_shadow_indexes()
+            except Exception as exc:
+                # left backfilling: the runner resumes from the cursor
+                await db.rollback()
+                await EmbeddingMigrationRepository.update(db, migration.id, {"error": str(exc)[:2000]})
+                await db.commit()
+                raise
+
+            await EmbeddingMigrationRepository.update(db, migration.id, {
+                "status": MigrationStatus.BACKFILLED.value,
+            })
+            await db.commit()
+            await db.refresh(migration)
+
+        logger.info(f"✅ Embedding migration {migration.id} backfilled ({processed} chunks)")
+        return EmbeddingMigrationService.describe(migration)
+
+    @staticmethod
+    async def backfill_chunks(chunk_ids: List[str]):
+        """
+        Shadow vectors for freshly ingested chunks (post-commit hook).
+        Failures only log: switch / finalize embed whatever is left.
+        """
+        if not chunk_ids:
+            return
+        try:
+            state = await embedding_spaces.refresh()
+            if not state.migration_id:
+                return
+
+            async with AsyncSessionLocal() as db:
+                migration = await EmbeddingMigrationRepository.get_active(db)
+                if migration is None:
+                    return
+                rows = await EmbeddingMigrationRepository.get_pending(db, ids=chunk_ids)
+                await EmbeddingMigrationService._embed_rows(db, migration, rows)
+                await db.commit()
+        except Exception:
+            logger.exception(f"⚠️ Shadow vectors for {len(chunk_ids)} chunks left to the migration")
+
+    @staticmethod
+    async def switch(assistant_id: Optional[str] = None) -> dict:
+        """
+        Move one namespace's searches to the shadow vectors. Writes are
+        blocked only for the switch itself, with every chunk of the
+        namespace already embedded (_cutover), so none is left without
+        a vector.
+        """
+        async with EmbeddingMigrationService._cutover(assistant_id, scoped=True) as (db, migration):
+            await EmbeddingMigrationRepository.add_switched(db, migration.id, namespace_key(assistant_id))
+            await db.commit()
+            await db.refresh(migration)
+
+        await embedding_spaces.refresh(force=True)
+        # cached answers were matched on query vectors of the old model
+        answer_cache.clear()
+        logger.info(f"🔀 Namespace {namespace_key(assistant_id)} switched to {migration.target_model}")
+        return EmbeddingMigrationService.describe(migration)
+
+    @staticmethod
+    async def switch_all() -> dict:
+        async with AsyncSessionLocal() as db:
+            namespaces = await EmbeddingMigrationRepository.get_namespaces(db)
+        result = None
+        for assistant_id in namespaces:
+            result = await EmbeddingMigrationService.switch(assistant_id)
+        return result or await EmbeddingMigrationService.status()
+
+    @staticmethod
+    async def finalize() -> dict:
+        """
+        Promote the shadow vectors in one transaction: old column and its
+        indexes dropped, embedding_next (and its indexes) renamed, stored
+        embedding space set to the target model.
+        """
+        async with EmbeddingMigrationService._cutover() as (db, migration):
+            await EmbeddingMigrationRepository.promote_shadow_column(db)
+            await EmbeddingMigrationRepository.rename_shadow_indexes(db)
+            await EmbeddingMigrationRepository.set_space(
+                db, migration.target_model, migration.target_dimensions
+            )
+            await EmbeddingMigrationRepository.update(db, migration.id, {
+                "status": MigrationStatus.COMPLETED.value,
+                "completed_at": datetime.utcnow(),
+            })
+            await db.commit()
+            await db.refresh(migration)
+
+        await embedding_spaces.refresh(force=True)
+        answer_cache.clear()
+        memory_vector_index.discard()
+        logger.info(f"✅ Embedding migration {migration.id} finalized: {migration.target_model}")
+
+        # compact indexes are expressions over knowledge.embedding: rebuild them
+        if is_compact():
+            for namespace in await EmbeddingMigrationService._indexed_namespaces("embedding"):
+                try:
+                    await VectorIndexService.create_index(namespace=namespace)
+                except Exception:
+                    logger.exception(f"⚠️ Compact index for {namespace or 'global'} not rebuilt")
+
+        return EmbeddingMigrationService.describe(migration)
+
+    @staticmethod
+    async def cancel() -> dict:
+        async with AsyncSessionLocal() as db:
+            await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(SWITCH_LOCK))))
+            migration = await EmbeddingMigrationRepository.get_active(db)
+            if migration is None:
+                raise ValueError("No embedding migration in progress")
+
+            await EmbeddingMigrationRepository.drop_shadow_column(db)
+            await EmbeddingMigrationRepository.update(db, migration.id, {
+                "status": MigrationStatus.CANCELLED.value,
+                "completed_at": datetime.utcnow(),
+            })
+            await db.commit()
+            await db.refresh(migration)
+
+        await embedding_spaces.refresh(force=True)
+        answer_cache.clear()
+        logger.info(f"🛑 Embedding migration {migration.id} cancelled")
+        return EmbeddingMigrationService.describe(migration)
+
+    @staticmethod
+    async def status() -> dict:
+        async with AsyncSessionLocal() as db:
+            space = await EmbeddingMigrationRepository.get_space(db)
+            migration = await EmbeddingMigrationRepository.get_active(db)
+            pending = await EmbeddingMigrationRepository.count_pending(db) if migration else None
+            if migration is None:
+                recent = await EmbeddingMigrationRepository.get_recent(db, limit=1)
+                migration = recent[0] if recent else None
+
+        return {
+            "model": space.model if space else settings.EMBEDDING_MODEL,
+            "dimensions": space.dimensions if space else settings.EMBEDDING_DIMENSIONS,
+            "migration": EmbeddingMigrationService.describe(migration) if migration else None,
+            "pending_chunks": pending,
+        }
+
+    @staticmethod
+    def describe(migration) -> dict:
+        total = migration.total_chunks or 0
+        return {
+            "id": migration.id,
+            "status": migration.status,
+            "source_model": migration.source_model,
+            "source_dimensions": migration.source_dimensions,
+            "target_model": migration.target_model,
+            "target_dimensions": migration.target_dimensions,
+            "total_chunks": total,
+            "processed_chunks": migration.processed_chunks,
+            "progress": round(min(migration.processed_chunks / total, 1.0), 4) if total else 1.0,
+            "switched_namespaces": list(migration.switched_namespaces or []),
+            "error": migration.error,
+            "created_at": migration.created_at,
+            "completed_at": migration.completed_at,
+        }
+
+    @staticmethod
+    async def _lock_backfilled(db):
+        """Active, fully backfilled migration; knowledge writes blocked until commit"""
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(SWITCH_LOCK))))
+        migration = await EmbeddingMigrationRepository.get_active(db)
+        if migration is None:
+            raise ValueError("No embedding migration in progress")
+        if migration.status != MigrationStatus.BACKFILLED.value:
+            raise ValueError(
+                f"Backfill still running ({migration.processed_chunks}/{migration.total_chunks} chunks)"
+            )
+        # SHARE: readers continue, inserts / deletes wait for our commit
+        await EmbeddingMigrationRepository.lock_space(db, exclusive=True)
+        await db.execute(text(f"LOCK TABLE {KNOWLEDGE_TABLE} IN SHARE MODE"))
+        return migration
+
+    @staticmethod
+    @asynccontextmanager
+    async def _cutover(assistant_id: Optional[str] = None, scoped: bool = False):
+        """
+        (db, migration) under the _lock_backfilled locks, with every chunk
+        in scope embedded. The bulk is embedded before the locks are taken
+        (_catch_up); under them only the chunks ingested since, when there
+        are at most EMBEDDING_MIGRATION_LOCKED_CHUNKS. Otherwise the locks
+        are released and it catches up again, so ingestion never waits on
+        more than a small embeddings call.
+        """
+        for _ in range(CUTOVER_ATTEMPTS):
+            await EmbeddingMigrationService._catch_up(assistant_id, scoped)
+
+            async with AsyncSessionLocal() as db:
+                migration = await EmbeddingMigrationService._lock_backfilled(db)
+                rows = await EmbeddingMigrationRepository.get_pending(
+                    db, assistant_id=assistant_id, scoped=scoped
+                )
+                if len(rows) <= settings.EMBEDDING_MIGRATION_LOCKED_CHUNKS:
+                    await EmbeddingMigrationService._embed_rows(db, migration, rows)
+                    yield db, migration
+                    return
+                await db.rollback()
+
+        raise ValueError("Chunks are being ingested faster than they can be re-embedded, try again later")
+
+    @staticmethod
+    async def _catch_up(assistant_id: Optional[str] = None, scoped: bool = False):
+        """
+        Embed the pending chunks in scope without holding any lock,
+        round after round while ingestion keeps adding some
+        """
+        async with AsyncSessionLocal() as db:
+            migration = await EmbeddingMigrationRepository.get_active(db)
+            if migration is None or migration.status != MigrationStatus.BACKFILLED.value:
+                return  # _lock_backfilled reports why
+
+            remaining = None
+            while True:
+                rows = await EmbeddingMigrationRepository.get_pending(
+                    db, assistant_id=assistant_id, scoped=scoped
+                )
+                await db.commit()
+                # stop once a round makes no progress (ingestion as fast as we embed)
+                if not rows or (remaining is not None and len(rows) >= remaining):
+                    return
+                remaining = len(rows)
+
+                size = settings.EMBEDDING_MIGRATION_BATCH_SIZE
+                for start in range(0, len(rows), size):
+                    await EmbeddingMigrationService._embed_rows(db, migration, rows[start:start + size])
+                    await db.commit()
+
+    @staticmethod
+    async def _embed_rows(db, migration, rows):
+        """Embed (id, content) rows with the target model into the shadow column"""
+        if not rows:
+            return
+        vectors = await AsyncEmbeddingService.get_embeddings(
+            [content for _, content in rows],
+            model=migration.target_model,
+            dimensions=migration.target_dimensions,
+        )
+        await EmbeddingMigrationRepository.write_vectors(
+            db, [(chunk_id, vector) for (chunk_id, _), vector in zip(rows, vectors) if len(vector)]
+        )
+
+    @staticmethod
+    async def _indexed_namespaces(column: str) -> List[Optional[str]]:
+        """Namespaces with an ANN index on a vector column"""
+        namespaces = []
+        for index in await VectorIndexService.list_indexes():
+            if index_column(index["indexname"]) != column:
+                continue
+            namespace = indexdef_namespace(index["indexdef"])
+            if namespace not in namespaces:
+                namespaces.append(namespace)
+        return namespaces
+
+    @staticmethod
+    async def _build_shadow_indexes():
+        """Same ANN index coverage for embedding_next as embedding has"""
+        for namespace in await EmbeddingMigrationService._indexed_namespaces("embedding"):
+            await VectorIndexService.create_index(
+                namespace=namespace, column=SHADOW_COLUMN, replace=True
+            )
+
+
+class EmbeddingMigrationRunner:
+    """
+    Background backfill: polls for a backfilling migration every
+    EMBEDDING_MIGRATION_POLL_SECONDS and resumes it from its cursor
+    (after a restart too). Only the process holding the backfill lock
+    works on it.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Check for work now instead of at the next poll"""
+        self._wake.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await EmbeddingMigrationService.backfill()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("❌ Embedding migration backfill failed, retrying at the next poll")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.EMBEDDING_MIGRATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+embedding_migration_runner = EmbeddingMigrationRunner()
@@ -1,23 +1,346 @@
-from openai import OpenAI
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import openai
 from app.config.settings import settings
+from app.integrations.openai.client import async_openai_client, get_limiter
+from app.services.embedding_cache import EmbeddingCache, embedding_cache
+from app.services.embedding_space import embedding_spaces
+from app.utils.vector_codec import from_base64
+
+logger = logging.getLogger(__name__)
+
+# Errors where a smaller batch has a real chance of succeeding
+# (oversized request, transient server / network failure).
+# Rate limits are retried by the SDK itself and are NOT split.
+SPLITTABLE_ERRORS = (
+    openai.BadRequestError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+# Errors caused by one of the inputs themselves: the only ones worth
+# isolating per input when callers share a batch
+INPUT_ERRORS = (openai.BadRequestError,)
+
+
+def embedding_options(model: Optional[str] = None, dimensions: Optional[int] = None) -> dict:
+    """
+    model / dimensions for embeddings.create. Defaults to the stored
+    embedding space (what knowledge.embedding holds). `dimensions` is
+    only sent to models that accept it (text-embedding-3-*).
+
+    Vectors come back base64 encoded: raw float32 bytes, decoded
+    with np.frombuffer instead of parsing a JSON float list.
+    """
+    if model is None:
+        model, dimensions = embedding_spaces.model, dimensions or embedding_spaces.dimensions
+
+    options = {"model": model, "encoding_format": "base64"}
+    if dimensions and model.startswith("text-embedding-3"):
+        options["dimensions"] = dimensions
+    return options
+
+
+def decode_embeddings(response) -> List[np.ndarray]:
+    """float32 vectors of a base64 embeddings response, in input order"""
+    data = sorted(response.data, key=lambda item: item.index)
+    return [from_base64(item.embedding) for item in data]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for cl100k_base)"""
+    return len(text) // 4 + 1
+
+
+def plan_batches(
+    texts: Sequence[str],
+    max_items: int = None,
+    max_tokens: int = None,
+) -> List[List[int]]:
+    """
+    Group text indices into batches that respect the per-request
+    item and token budget. Input order is preserved.
+    """
+    max_items = max_items or settings.EMBEDDING_BATCH_MAX_ITEMS
+    max_tokens = max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS
+
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+
+        if current and (
+            len(current) >= max_items
+            or current_tokens + tokens > max_tokens
+        ):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(index)
+        current_tokens += tokens
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    if current:
+        batches.append(current)
 
+    return batches
 
-class EmbeddingService:
+
+class AsyncEmbeddingService:
     """
-    Lightweight embeddings for RAG (Cloud Safe)
-    No torch, no sentence-transformers
+    Embeddings for RAG (OpenAI API, no local models).
+    Uses the shared pooled AsyncOpenAI client; batches run
+    concurrently up to OPENAI_EMBEDDINGS_MAX_CONCURRENCY.
     """
 
     @staticmethod
-    def get_embedding(text: str) -> list:
+    async def get_embedding(
+        text: str,
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        One query embedding. Concurrent calls are coalesced by
+        query_embedding_batcher into a single embeddings.create.
+        """
         if not text:
             return []
 
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
+        return await query_embedding_batcher.embed(text, embedding_options(model, dimensions))
+
+    @staticmethod
+    async def get_embeddings(
+        texts: Sequence[str],
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> List[np.ndarray]:
+        """
+        Chunk embeddings go through the content-addressed cache;
+        only texts never seen before are sent to OpenAI.
+        model / dimensions default to the stored embedding space.
+        """
+        options = embedding_options(model, dimensions)
+
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return await AsyncEmbeddingService._embed_many(texts, options)
+
+        cache_dimensions = options.get("dimensions") or dimensions
+        keys = [
+            EmbeddingCache.make_key(text, options["model"], cache_dimensions) if text else None
+            for text in texts
+        ]
+        found = await embedding_cache.get_many([key for key in keys if key])
+
+        # identical chunks inside one document are embedded once
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key and key not in found:
+                to_embed.setdefault(key, text)
+
+        if to_embed:
+            fresh = await AsyncEmbeddingService._embed_many(list(to_embed.values()), options)
+            fresh_by_key = dict(zip(to_embed.keys(), fresh))
+            await embedding_cache.put_many(fresh_by_key, options["model"])
+            found.update(fresh_by_key)
+
+        return [found[key] if key else [] for key in keys]
+
+    @staticmethod
+    async def _embed_many(texts: Sequence[str], options: dict) -> List[np.ndarray]:
+        embeddings = [[] for _ in texts]
+
+        indices = [i for i, text in enumerate(texts) if text]
+        non_empty = [texts[i] for i in indices]
+        batches = plan_batches(non_empty)
+
+        results = await asyncio.gather(*[
+            AsyncEmbeddingService._embed_batch([non_empty[i] for i in batch], options)
+            for batch in batches
+        ])
+
+        for batch, vectors in zip(batches, results):
+            for position, vector in zip(batch, vectors):
+                embeddings[indices[position]] = vector
+
+        return embeddings
+
+    @staticmethod
+    async def _embed_batch(
+        batch: List[str],
+        options: dict,
+        settle: bool = False,
+    ) -> List[Union[np.ndarray, Exception]]:
+        """
+        One embeddings.create call. A failed batch is split in half
+        and each half retried, down to single inputs.
+
+        settle=True (batches shared by several callers) splits only on
+        INPUT_ERRORS and puts a failing input's exception in its slot
+        instead of raising; anything else is raised for the whole batch.
+        """
+        try:
+            async with get_limiter("openai_embeddings"):
+                response = await async_openai_client.embeddings.create(
+                    **options,
+                    input=batch
+                )
+        except SPLITTABLE_ERRORS as exc:
+            if settle and not isinstance(exc, INPUT_ERRORS):
+                raise
+            if len(batch) == 1:
+                if settle:
+                    return [exc]
+                raise
+
+            logger.warning(
+                f"⚠️ Embedding batch of {len(batch)} failed "
+                f"({exc.__class__.__name__}), splitting and retrying"
+            )
+            middle = len(batch) // 2
+            return (
+                await AsyncEmbeddingService._embed_batch(batch[:middle], options, settle)
+                + await AsyncEmbeddingService._embed_batch(batch[middle:], options, settle)
+            )
+
+        # API returns one item per input, tagged with its index
+        return decode_embeddings(response)
+
+
+def size_bucket(size: int) -> str:
+    """Power-of-two histogram bucket: 1, 2, 3-4, 5-8, 9-16, ..."""
+    if size <= 2:
+        return str(size)
+    upper = 1 << (size - 1).bit_length()
+    return f"{upper // 2 + 1}-{upper}"
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching of single query embeddings across requests.
+
+    The first query waiting for a given model opens a window of
+    `window_ms`; every query arriving within it (up to `max_batch_size`,
+    which flushes early) rides along in the same embeddings.create
+    call, and each caller gets its own vector back. Identical texts
+    in a batch are sent once. window_ms = 0 sends every query alone.
+    """
+
+    def __init__(self, window_ms: float, max_batch_size: int, recent_waits: int = 1024):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: Dict[tuple, List[Tuple[str, asyncio.Future, float]]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._sending = set()
+
+        self.queries = 0
+        self.batches = 0
+        self.deduplicated = 0
+        self.batch_sizes = Counter()
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waits = deque(maxlen=recent_waits)
+
+    async def embed(self, text: str, options: dict) -> np.ndarray:
+        if self.window <= 0:
+            self._record([text], [0.0])
+            return (await AsyncEmbeddingService._embed_batch([text], options))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = tuple(sorted(options.items()))
+
+        batch = self._pending.setdefault(key, [])
+        batch.append((text, future, time.monotonic()))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        return await future
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def percentile(q: float) -> float:
+            return round(waits[int(q * (len(waits) - 1))] * 1000, 3) if waits else 0.0
+
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queries": self.queries,
+            "batches": self.batches,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "deduplicated": self.deduplicated,
+            "batch_sizes": {
+                bucket: self.batch_sizes[bucket]
+                for bucket in sorted(self.batch_sizes, key=lambda b: int(b.split("-")[0]))
+            },
+            "wait_ms": {
+                "avg": round(self.total_wait / self.queries * 1000, 3) if self.queries else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(self.max_wait * 1000, 3),
+            },
+        }
+
+    def _flush(self, key: tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+
+        # keep a reference: the loop only holds tasks weakly
+        task = asyncio.create_task(self._send(dict(key), batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, options: dict, batch: List[Tuple[str, asyncio.Future, float]]):
+        sent_at = time.monotonic()
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self._record(texts, [sent_at - queued_at for _, _, queued_at in batch])
+
+        # a bad query only fails its own caller (the batch is bisected
+        # down to it); rate limits, auth, timeouts... fail every caller
+        # as they are, without extra requests
+        try:
+            results = await AsyncEmbeddingService._embed_batch(texts, options, settle=True)
+        except Exception as exc:
+            results = [exc] * len(texts)
+
+        by_text = dict(zip(texts, results))
+        for text, future, _ in batch:
+            # a caller that gave up (cancelled request) is simply skipped
+            if future.done():
+                continue
+            result = by_text[text]
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _record(self, texts: List[str], waits: List[float]):
+        self.queries += len(waits)
+        self.batches += 1
+        self.deduplicated += len(waits) - len(texts)
+        self.batch_sizes[size_bucket(len(waits))] += 1
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, *waits)
+        self._waits.extend(waits)
+
 
-        return response.data[0].embedding
\ No newline at end of file
+query_embedding_batcher = EmbeddingBatcher(
+    window_ms=settings.QUERY_EMBEDDING_BATCH_WINDOW_MS,
+    max_batch_size=settings.QUERY_EMBEDDING_BATCH_MAX_SIZE,
+)
@@ -0,0 +1,93 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional, Tuple
+
+from app.config.database import AsyncSessionLocal
+from app.config.settings import settings
+from app.repository.embedding_migration_repository import (
+    EmbeddingMigrationRepository,
+    SHADOW_COLUMN,
+)
+from app.utils.namespaces import namespace_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SpaceState:
+    """Which vectors each namespace searches, as last read from the database"""
+    model: str
+    dimensions: int
+    migration_id: Optional[str] = None
+    target_model: Optional[str] = None
+    target_dimensions: Optional[int] = None
+    switched: FrozenSet[str] = field(default_factory=frozenset)
+
+    def for_namespace(self, assistant_id: Optional[str]) -> Tuple[str, str, int]:
+        """(column, model, dimensions) a search in this namespace must use"""
+        if self.migration_id and namespace_key(assistant_id) in self.switched:
+            return SHADOW_COLUMN, self.target_model, self.target_dimensions
+        return "embedding", self.model, self.dimensions
+
+
+class EmbeddingSpaces:
+    """
+    Process-wide view of the knowledge_embedding_space row and the active
+    embedding migration, re-read at most every EMBEDDING_SPACE_REFRESH_SECONDS.
+    Ingestion embeds with `model` / `dimensions`; searches pick their
+    column and query model per namespace with for_namespace().
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.state = SpaceState(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS)
+        self._refreshed_at = float("-inf")
+
+    @property
+    def model(self) -> str:
+        return self.state.model
+
+    @property
+    def dimensions(self) -> int:
+        return self.state.dimensions
+
+    async def refresh(self, force: bool = False) -> SpaceState:
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return self.state
+
+        async with AsyncSessionLocal() as db:
+            space = await EmbeddingMigrationRepository.get_space(db)
+            migration = await EmbeddingMigrationRepository.get_active(db)
+
+        state = SpaceState(
+            model=space.model if space else settings.EMBEDDING_MODEL,
+            dimensions=space.dimensions if space else settings.EMBEDDING_DIMENSIONS,
+        )
+        if migration is not None:
+            state = SpaceState(
+                model=state.model,
+                dimensions=state.dimensions,
+                migration_id=migration.id,
+                target_model=migration.target_model,
+                target_dimensions=migration.target_dimensions,
+                switched=frozenset(migration.switched_namespaces or ()),
+            )
+
+        if (state.model, state.dimensions) != (settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS):
+            if (state.model, state.dimensions) != (self.state.model, self.state.dimensions):
+                logger.warning(
+                    f"⚠️ Knowledge vectors are {state.model} ({state.dimensions} dims), "
+                    f"settings say {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_DIMENSIONS}); "
+                    f"using the stored embedding space"
+                )
+
+        self.state = state
+        self._refreshed_at = time.monotonic()
+        return state
+
+    def for_namespace(self, assistant_id: Optional[str]) -> Tuple[str, str, int]:
+        return self.state.for_namespace(assistant_id)
+
+
+embedding_spaces = EmbeddingSpaces(settings.EMBEDDING_SPACE_REFRESH_SECONDS)
@@ -1,6 +1,52 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
 from pypdf import PdfReader
 import docx
 
+from app.config.settings import settings
+
+SUPPORTED_FILE_TYPES = ("pdf", "docx", "txt")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Shared parser pool, created on first use"""
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PARSER_WORKERS or os.cpu_count(),
+            # spawn: never fork a process that is running an event loop + threads
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    return _executor
+
+
+# ----------------------------------------------------------------------
+# Worker functions (module level so they can be pickled to the pool)
+# ----------------------------------------------------------------------
+
+def _pdf_page_count(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    reader = PdfReader(file_path)
+    pages = []
+
+    for page in reader.pages[start:end]:
+        extracted = page.extract_text()
+        if extracted:
+            pages.append(extracted)
+
+    return pages
+
 
 class FileParserService:
     """
@@ -10,15 +56,8 @@ class FileParserService:
 
     @staticmethod
     def parse_pdf(file_path: str) -> str:
-        text = ""
-        reader = PdfReader(file_path)
-
-        for page in reader.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
-
-        return text.strip()
+        pages = _extract_pdf_pages(file_path, 0, None)
+        return "\n".join(pages).strip()
 
     @staticmethod
     def parse_docx(file_path: str) -> str:
@@ -29,4 +68,53 @@ class FileParserService:
     @staticmethod
     def parse_txt(file_path: str) -> str:
         with open(file_path, "r", encoding="utf-8") as f:
-            return f.read().strip()
\ No newline at end of file
+            return f.read().strip()
+
+    @staticmethod
+    def parse(file_path: str, file_type: str) -> str:
+        """Dispatch on file extension (see SUPPORTED_FILE_TYPES)"""
+        if file_type == "pdf":
+            return FileParserService.parse_pdf(file_path)
+        if file_type == "docx":
+            return FileParserService.parse_docx(file_path)
+        if file_type == "txt":
+            return FileParserService.parse_txt(file_path)
+
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    @staticmethod
+    async def parse_async(file_path: str, file_type: str) -> str:
+        """
+        Parse in the process pool so the API worker never blocks.
+        PDFs are split into page ranges extracted in parallel.
+        """
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+
+        if file_type != "pdf":
+            return await loop.run_in_executor(
+                executor, FileParserService.parse, file_path, file_type
+            )
+
+        page_count = await loop.run_in_executor(
+            executor, _pdf_page_count, file_path
+        )
+        step = settings.PDF_PAGES_PER_TASK
+
+        ranges = await asyncio.gather(*[
+            loop.run_in_executor(
+                executor, _extract_pdf_pages, file_path, start, start + step
+            )
+            for start in range(0, page_count, step)
+        ])
+
+        # single linear join, page order preserved by gather
+        return "\n".join(page for pages in ranges for page in pages).strip()
+
+    @staticmethod
+    def shutdown():
+        global _executor
+
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+from typing import List, Optional, Set
+
+from app.config.database import AsyncSessionLocal
+from app.config.settings import settings
+from app.models.ingestion_job import IngestionStatus
+from app.repository.ingestion_job_repository import IngestionJobRepository
+from app.repository.knowledge_repository import KnowledgeRepository
+from app.repository.document_repository import DocumentRepository
+from app.services.chunking_service import ChunkingService
+from app.services.embedding_service import AsyncEmbeddingService
+from app.services.embedding_space import embedding_spaces
+from app.services.embedding_migration_service import EmbeddingMigrationService
+from app.services.file_parser_service import FileParserService
+from app.services.upload_service import UploadService
+from app.services.memory_vector_index import memory_vector_index
+from app.services.answer_cache import answer_cache
+from app.services.vector_index_service import VectorIndexService
+from app.utils.helpers import sha256_hex
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionService:
+    """
+    Runs one ingestion job end to end:
+    parse → chunk → embed → insert (status + progress saved on the job)
+    """
+
+    @staticmethod
+    async def process_job(job_id: str):
+        async with AsyncSessionLocal() as db:
+            if not await IngestionJobRepository.claim(db, job_id):
+                return
+
+            job = await IngestionJobRepository.get_by_id(db, job_id)
+            heartbeat = asyncio.create_task(IngestionService._heartbeat(job_id))
+
+            try:
+                await IngestionService._run(db, job)
+            except Exception as exc:
+                await db.rollback()
+                logger.exception(f"❌ Ingestion job {job_id} failed")
+
+                await db.refresh(job)  # rollback expired it
+                document = (
+                    await DocumentRepository.get_by_id(db, job.document_id, job.assistant_id)
+                    if job.document_id else None
+                )
+                if document is not None:
+                    # a failed re-ingest rolled back: the previous version's
+                    # chunks are still stored and searchable
+                    status = IngestionStatus.PROCESSED if document.chunk_count else IngestionStatus.FAILED
+                    await DocumentRepository.update(db, document.id, {"status": status.value})
+                await IngestionJobRepository.update(db, job_id, {
+                    "status": IngestionStatus.FAILED.value,
+                    "error": str(exc)[:2000],
+                })
+            finally:
+                heartbeat.cancel()
+
+            # processed or failed: the upload is not needed any more
+            # (an interrupted job keeps it for recovery)
+            await asyncio.to_thread(UploadService.discard, job.file_path)
+
+    @staticmethod
+    async def _heartbeat(job_id: str):
+        """Keeps the job's lease alive (own session: the job's is busy)"""
+        while True:
+            await asyncio.sleep(settings.INGESTION_HEARTBEAT_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await IngestionJobRepository.heartbeat(db, job_id)
+            except Exception:
+                logger.exception(f"⚠️ Heartbeat of ingestion job {job_id} failed")
+
+    @staticmethod
+    async def _run(db, job):
+        # 0️⃣ Same bytes already ingested → nothing to do
+        if job.file_hash:
+            previous = await DocumentRepository.get_processed_by_hash(
+                db, job.file_hash, job.assistant_id
+            )
+            if previous:
+                await IngestionJobRepository.update(db, job.id, {
+                    "status": IngestionStatus.PROCESSED.value,
+                    "stage": None,
+                    "document_id": previous.id,
+                    "duplicate_of": previous.id,
+                    "total_chunks": previous.chunk_count,
+                    "processed_chunks": previous.chunk_count,
+                })
+                logger.info(f"⏭️ {job.file_name} already ingested as {previous.file_name}")
+                return
+
+        # Parent document row (one per file name in the job's namespace)
+        document = await DocumentRepository.get_or_create(
+            db, job.file_name, job.file_type, job.assistant_id
+        )
+        await DocumentRepository.update(db, document.id, {
+            "status": IngestionStatus.PROCESSING.value,
+        })
+        job.document_id = document.id
+        await db.commit()
+
+        # 1️⃣ Parse (process pool, PDFs split into parallel page ranges)
+        await IngestionJobRepository.update(db, job.id, {"stage": "parsing"})
+        content = await FileParserService.parse_async(job.file_path, job.file_type)
+
+        # 2️⃣ Chunk
+        await IngestionJobRepository.update(db, job.id, {"stage": "chunking"})
+        chunks = [chunk.text for chunk in ChunkingService.chunk(content)] if content else []
+
+        # 3️⃣ Diff against what is already stored for this file:
+        #    only new chunks are embedded, unchanged rows stay untouched
+        hashes = [sha256_hex(chunk) for chunk in chunks]
+        existing = await KnowledgeRepository.get_chunk_hashes(db, document.id)
+        plan = KnowledgeRepository.plan_sync(existing, hashes)
+        await db.commit()
+
+        to_embed = [chunks[i] for i in plan["insert"]]
+        unchanged = len(chunks) - len(to_embed)
+
+        await IngestionJobRepository.update(db, job.id, {
+            "stage": "embedding",
+            "total_chunks": len(chunks),
+            "processed_chunks": unchanged,
+        })
+
+        # Embed in steps so progress is visible while it runs, all with the
+        # model knowledge is embedded with right now (checked again on save)
+        space = await embedding_spaces.refresh()
+        embeddings_by_hash = {}
+        step = settings.INGESTION_PROGRESS_STEP
+
+        for start in range(0, len(to_embed), step):
+            batch = to_embed[start:start + step]
+            vectors = await AsyncEmbeddingService.get_embeddings(
+                batch, model=space.model, dimensions=space.dimensions
+            )
+            embeddings_by_hash.update(
+                {sha256_hex(chunk): vector for chunk, vector in zip(batch, vectors)}
+            )
+            await IngestionJobRepository.update(db, job.id, {
+                "processed_chunks": unchanged + start + len(batch),
+            })
+
+        # 4️⃣ Apply the diff + mark job done in ONE transaction
+        await IngestionJobRepository.update(db, job.id, {"stage": "saving"})
+        result = await KnowledgeRepository.sync_document(
+            db, document, chunks, embeddings_by_hash, (space.model, space.dimensions)
+        )
+        await DocumentRepository.update(db, document.id, {
+            "file_type": job.file_type,
+            "file_hash": job.file_hash,
+            "byte_size": job.byte_size,
+            "chunk_count": len(chunks),
+            "status": IngestionStatus.PROCESSED.value,
+        })
+        job.status = IngestionStatus.PROCESSED.value
+        job.stage = None
+        await db.commit()
+
+        logger.info(
+            f"✅ Ingested {job.file_name}: {len(result['insert'])} new, "
+            f"{len(result['delete'])} removed, {result['unchanged']} unchanged chunks"
+        )
+
+        # answers built on removed chunks are stale (only now: before the
+        # commit a concurrent request could still cache one of them)
+        answer_cache.invalidate_chunks(result["delete"])
+
+        # Namespaces served from memory get only the changed rows
+        await memory_vector_index.apply(
+            job.assistant_id, rows=result["rows"], deleted_ids=result["delete"]
+        )
+
+        # Embedding migration running → shadow vectors for the new rows
+        await EmbeddingMigrationService.backfill_chunks([row["id"] for row in result["rows"]])
+
+        # 5️⃣ Large assistant namespace → its own partial ANN index
+        if job.assistant_id:
+            try:
+                await VectorIndexService.ensure_namespace_index(job.assistant_id)
+            except Exception:
+                logger.exception(f"⚠️ Namespace index for {job.assistant_id} not built")
+
+
+class IngestionQueue:
+    """
+    In-process worker pool fed by an asyncio queue of job ids.
+    Started / stopped from the FastAPI lifecycle hooks.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+        self._queued: Set[str] = set()  # ids waiting in this process's queue
+
+    async def start(self, workers: int = None):
+        self._queue = asyncio.Queue()
+        workers = workers or settings.INGESTION_WORKERS
+
+        self._workers = [
+            asyncio.create_task(self._worker(n)) for n in range(workers)
+        ]
+
+        if settings.INGESTION_RECOVER_ON_STARTUP:
+            self._recovery = asyncio.create_task(self._recover_loop())
+
+    async def stop(self):
+        tasks = self._workers + ([self._recovery] if self._recovery else [])
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._recovery = None
+
+    async def _recover_loop(self):
+        """
+        Re-queue jobs whose lease expired, at startup and then once per
+        lease period: a worker restarted sooner than the lease picks its
+        old jobs up on a later pass, never while another worker runs them.
+        """
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    job_ids = await IngestionJobRepository.reset_interrupted(
+                        db, settings.INGESTION_LEASE_SECONDS
+                    )
+
+                queued = [job_id for job_id in job_ids if job_id not in self._queued]
+                for job_id in queued:
+                    await self.enqueue(job_id)
+
+                if queued:
+                    logger.info(f"🔁 Re-queued {len(queued)} pending / interrupted ingestion jobs")
+            except Exception:
+                logger.exception("❌ Ingestion job recovery failed")
+
+            await asyncio.sleep(settings.INGESTION_LEASE_SECONDS)
+
+    async def enqueue(self, job_id: str):
+        self._queued.add(job_id)
+        await self._queue.put(job_id)
+
+    def pending_count(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, worker_number: int):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await IngestionService.process_job(job_id)
+            except Exception:
+                logger.exception(f"❌ Ingestion worker {worker_number} crashed on {job_id}")
+            finally:
+                self._queue.task_done()
+
+
+ingestion_queue = IngestionQueue()
@@ -1,38 +1,133 @@
-from sqlalchemy import select, func
+import json
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.knowledge import Knowledge
+from app.config.database import AsyncSessionLocal
+from app.config.settings import settings
+from app.repository.knowledge_repository import (
+    KnowledgeRepository,
+    LISTABLE_FIELDS,
+    DEFAULT_LIST_FIELDS,
+)
+from app.repository.knowledge_stats_repository import (
+    KnowledgeStatsRepository,
+    STAT_COLUMNS,
+)
+from app.utils.pagination import encode_cursor, decode_cursor
 
 
 class KnowledgeService:
 
     @staticmethod
     async def get_knowledge_stats(db: AsyncSession):
+        """Dashboard stats from the trigger-maintained counters row (O(1))"""
+        stats = await KnowledgeStatsRepository.get(db)
 
-        # Total documents
-        total_docs = await db.scalar(
-            select(func.count()).select_from(Knowledge)
-        )
+        if stats is None:
+            # not seeded yet: one aggregate pass over the documents
+            counts = await KnowledgeStatsRepository.aggregate(db)
+        else:
+            counts = {name: getattr(stats, name) for name in STAT_COLUMNS}
+
+        return KnowledgeService._format_stats(counts)
+
+    @staticmethod
+    async def reconcile_knowledge_stats(db: AsyncSession):
+        """Recompute the counters row from scratch (fixes any drift)"""
+        counts = await KnowledgeStatsRepository.reconcile(db)
+        return KnowledgeService._format_stats(counts)
+
+    @staticmethod
+    def _format_stats(counts: dict) -> dict:
+        return {
+            "total_documents": counts["total_documents"],
+            "processed": counts["processed_documents"],
+            "pending": counts["pending_documents"],
+            "failed": counts["failed_documents"],
+            "total_chunks": counts["total_chunks"],
+            "storage_mb": round(counts["total_bytes"] / (1024 * 1024), 2)
+        }
+
+    @staticmethod
+    def resolve_fields(fields: Optional[str]) -> Tuple[str, ...]:
+        """Comma separated field list → validated tuple (ValueError if unknown)"""
+        if not fields:
+            return DEFAULT_LIST_FIELDS
 
-        # Processed = embedding generated
-        processed_docs = await db.scalar(
-            select(func.count()).where(Knowledge.embedding.is_not(None))
+        requested = tuple(
+            dict.fromkeys(f.strip() for f in fields.split(",") if f.strip())
         )
+        unknown = [f for f in requested if f not in LISTABLE_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Allowed: {', '.join(LISTABLE_FIELDS)}"
+            )
 
-        # Pending = embedding not generated
-        pending_docs = await db.scalar(
-            select(func.count()).where(Knowledge.embedding.is_(None))
+        return requested or DEFAULT_LIST_FIELDS
+
+    @staticmethod
+    async def list_page(
+        db: AsyncSession,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS,
+        content_chars: Optional[int] = None,
+        assistant_id: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """One page of chunks plus the cursor of the next page (None at the end)"""
+        rows = await KnowledgeRepository.get_page(
+            db, limit, decode_cursor(cursor), fields, content_chars, assistant_id
         )
 
-        # Storage (calculate from content length)
-        total_bytes = await db.scalar(
-            select(func.sum(func.length(Knowledge.content)))
-        ) or 0
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor(last["_cursor_created_at"], last["_cursor_id"])
 
-        total_mb = round(total_bytes / (1024 * 1024), 2)
+        return [KnowledgeService._to_json(row) for row in rows], next_cursor
 
-        return {
-            "total_documents": total_docs or 0,
-            "processed": processed_docs or 0,
-            "pending": pending_docs or 0,
-            "storage_mb": total_mb
-        }
\ No newline at end of file
+    @staticmethod
+    async def export_ndjson(
+        cursor: Optional[str] = None,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS,
+        content_chars: Optional[int] = None,
+        assistant_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream every chunk as one JSON line, walking keyset pages of
+        KNOWLEDGE_EXPORT_BATCH rows. Uses its own session because the
+        response outlives the request dependency.
+        """
+        after = decode_cursor(cursor)
+        batch = settings.KNOWLEDGE_EXPORT_BATCH
+
+        async with AsyncSessionLocal() as db:
+            while True:
+                rows = await KnowledgeRepository.get_page(
+                    db, batch, after, fields, content_chars, assistant_id
+                )
+
+                for row in rows:
+                    yield json.dumps(KnowledgeService._to_json(row)) + "\n"
+
+                if len(rows) < batch:
+                    break
+
+                after = (rows[-1]["_cursor_created_at"], rows[-1]["_cursor_id"])
+                # end the read transaction between pages
+                await db.rollback()
+
+    @staticmethod
+    def _to_json(row: dict) -> dict:
+        item = {}
+        for key, value in row.items():
+            if key.startswith("_cursor_"):
+                continue
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            item[key] = value
+        return item
@@ -1,19 +1,17 @@
-from openai import OpenAI
-from app.config.settings import settings
+from typing import AsyncIterator
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from app.integrations.openai.client import async_openai_client, get_limiter
 
+LLM_MODEL = "gpt-4o-mini"  # fast + cheap + best for RAG
 
-class LLMService:
 
-    @staticmethod
-    def generate_answer(query: str, context: str) -> str:
-        """
-        Generate final answer using retrieved context (TRUE RAG)
-        Works for any domain and any file type
-        """
+def build_messages(query: str, context: str) -> list:
+    """
+    Prompt for the final answer using retrieved context (TRUE RAG)
+    Works for any domain and any file type
+    """
 
-        prompt = f"""
+    prompt = f"""
 You are a helpful AI assistant.
 Answer the user's question ONLY from the provided context.
 If the answer is not in context, say: "Answer not found in uploaded documents."
@@ -27,13 +25,29 @@ Question:
 Give a clear, short, and accurate answer.
 """
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # fast + cheap + best for RAG
-            messages=[
-                {"role": "system", "content": "You are a document Q&A assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
+    return [
+        {"role": "system", "content": "You are a document Q&A assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+class AsyncLLMService:
+    """
+    Answers for RAG over the shared pooled AsyncOpenAI client
+    (bounded concurrency)
+    """
+
+    @staticmethod
+    async def stream_answer(query: str, context: str) -> AsyncIterator[str]:
+        """Answer from the retrieved context, yielding text deltas as they arrive"""
+        async with get_limiter("openai_chat"):
+            stream = await async_openai_client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=build_messages(query, context),
+                temperature=0.2,
+                stream=True
+            )
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
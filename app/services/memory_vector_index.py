@@ -0,0 +1,495 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models.knowledge import Knowledge
+from app.services.embedding_space import embedding_spaces
+from app.utils.namespaces import GLOBAL_NAMESPACE, namespace_key
+from app.utils.vector_codec import to_array
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "current.json"
+LOCK_FILE = ".lock"
+
+# float16 rows widened to float32 per matmul (bounds the temporary copy)
+BLOCK_ROWS = 16384
+
+
+@dataclass
+class Snapshot:
+    """One immutable generation of a namespace, arrays memory-mapped from disk"""
+    generation: str
+    ids: np.ndarray           # S36
+    document_ids: np.ndarray  # S36, b"" when the chunk has no document
+    file_index: np.ndarray    # int32 → file_names
+    file_names: List[str]
+    offsets: np.ndarray       # int64, n + 1 offsets into content
+    content: np.ndarray       # uint8, utf-8 chunk texts back to back
+    embeddings: np.ndarray    # (n, dim) float16 / float32
+    norms: np.ndarray         # float32 row norms, computed on load
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def content_bytes(self, i: int) -> bytes:
+        return self.content[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def row(self, i: int, distance: float) -> dict:
+        """Same shape as a RAGService.semantic_search row"""
+        return {
+            "id": self.ids[i].decode(),
+            "document_id": self.document_ids[i].decode() or None,
+            "content": self.content_bytes(i).decode("utf-8"),
+            "file_name": self.file_names[self.file_index[i]],
+            "distance": distance,
+            "lexical_match": False,
+            "embedding": np.asarray(self.embeddings[i], dtype=np.float32),
+        }
+
+
+def _blocks(matrix: np.ndarray):
+    if matrix.dtype == np.float32:
+        yield matrix
+        return
+    for start in range(0, len(matrix), BLOCK_ROWS):
+        yield matrix[start:start + BLOCK_ROWS].astype(np.float32)
+
+
+def _dot(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    return np.concatenate([block @ query for block in _blocks(matrix)] or [np.empty(0, np.float32)])
+
+
+def _row_norms(matrix: np.ndarray) -> np.ndarray:
+    return np.concatenate(
+        [np.sqrt(np.einsum("ij,ij->i", block, block)) for block in _blocks(matrix)]
+        or [np.empty(0, np.float32)]
+    )
+
+
+def _load_array(path: str) -> np.ndarray:
+    array = np.load(path, mmap_mode="r")
+    return array if array.size else np.load(path)  # nothing to share in an empty array
+
+
+def _current_generation(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return json.load(f)["generation"]
+    except FileNotFoundError:
+        return None
+
+
+def _load(directory: str, generation: str) -> Snapshot:
+    path = os.path.join(directory, generation)
+
+    def array(name):
+        return _load_array(os.path.join(path, f"{name}.npy"))
+
+    with open(os.path.join(path, "files.json")) as f:
+        file_names = json.load(f)
+
+    embeddings = array("embeddings")
+    return Snapshot(
+        generation=generation,
+        ids=array("ids"),
+        document_ids=array("document_ids"),
+        file_index=array("file_index"),
+        file_names=file_names,
+        offsets=array("offsets"),
+        content=array("content"),
+        embeddings=embeddings,
+        norms=_row_norms(embeddings),
+    )
+
+
+def _write(
+    directory: str,
+    ids: np.ndarray,
+    document_ids: np.ndarray,
+    file_index: np.ndarray,
+    file_names: List[str],
+    offsets: np.ndarray,
+    content: np.ndarray,
+    embeddings: np.ndarray,
+) -> Snapshot:
+    """Write a new generation, then switch current.json to it atomically"""
+    previous = _current_generation(directory)
+    generation = f"{time.time_ns():x}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+
+    arrays = {
+        "ids": ids,
+        "document_ids": document_ids,
+        "file_index": file_index,
+        "offsets": offsets,
+        "content": content,
+        "embeddings": embeddings,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "files.json"), "w") as f:
+        json.dump(file_names, f)
+
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        json.dump({"generation": generation, "rows": len(ids), "dtype": str(embeddings.dtype)}, f)
+    os.replace(pointer + ".tmp", pointer)
+
+    # keep the previous generation: other workers may be about to map it
+    for name in os.listdir(directory):
+        if name not in (generation, previous) and os.path.isdir(os.path.join(directory, name)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    return _load(directory, generation)
+
+
+def _compose(
+    directory: str,
+    old: Optional[Snapshot],
+    rows: Sequence[dict],
+    deleted_ids: Iterable[str],
+    deleted_documents: Iterable[str],
+    dtype: np.dtype,
+) -> Optional[Snapshot]:
+    """
+    old snapshot minus deleted / replaced rows, plus the new rows.
+    Kept rows are carried over with array masks (content as byte
+    ranges), never decoded one by one. None when old is unchanged.
+    """
+    new_ids = np.array([row["id"] for row in rows], dtype="S36")
+    new_content = [(row.get("content") or "").encode("utf-8") for row in rows]
+    new_embeddings = (
+        np.stack([to_array(row["embedding"]) for row in rows]).astype(dtype)
+        if rows else np.empty((0, embedding_spaces.dimensions), dtype=dtype)
+    )
+
+    if old is not None:
+        drop = np.concatenate([np.array([str(i) for i in deleted_ids], dtype="S36"), new_ids])
+        keep = ~np.isin(old.ids, drop)
+        documents = np.array([str(d) for d in deleted_documents], dtype="S36")
+        if len(documents):
+            keep &= ~np.isin(old.document_ids, documents)
+        if not rows and keep.all():
+            return None
+
+        lengths = np.diff(old.offsets)
+        kept_content = old.content[np.repeat(keep, lengths)]
+        kept = (old.ids[keep], old.document_ids[keep], old.file_index[keep], lengths[keep])
+        kept_embeddings = np.asarray(old.embeddings[keep], dtype=dtype)
+        names = list(old.file_names)
+    else:
+        kept_content = np.empty(0, dtype=np.uint8)
+        kept = (np.empty(0, "S36"), np.empty(0, "S36"), np.empty(0, np.int32), np.empty(0, np.int64))
+        kept_embeddings = np.empty((0, new_embeddings.shape[1]), dtype=dtype)
+        names = []
+
+    kept_ids, kept_documents, kept_files, kept_lengths = kept
+
+    positions = {name: i for i, name in enumerate(names)}
+    new_files = [positions.setdefault(row.get("file_name") or "", len(positions)) for row in rows]
+
+    # drop file names no row refers to any more
+    used, file_index = np.unique(
+        np.concatenate([kept_files, np.array(new_files, dtype=np.int32)]), return_inverse=True
+    )
+    names = list(positions)
+
+    lengths = np.concatenate([kept_lengths, np.array([len(c) for c in new_content], dtype=np.int64)])
+
+    return _write(
+        directory,
+        ids=np.concatenate([kept_ids, new_ids]),
+        document_ids=np.concatenate([
+            kept_documents,
+            np.array([row.get("document_id") or "" for row in rows], dtype="S36"),
+        ]),
+        file_index=file_index.astype(np.int32),
+        file_names=[names[i] for i in used],
+        offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        content=np.concatenate([kept_content, np.frombuffer(b"".join(new_content), dtype=np.uint8)]),
+        embeddings=np.concatenate([kept_embeddings, new_embeddings]) if rows else kept_embeddings,
+    )
+
+
+def _acquire(directory: str) -> int:
+    """Cross-process writer lock for one namespace directory (blocking)"""
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def _release(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+class MemoryVectorIndex:
+    """
+    In-process exact vector search over a memory-mapped snapshot of a
+    namespace's chunks (embeddings, ids, content).
+
+    Snapshots live under MEMORY_INDEX_DIR, one directory per namespace,
+    written as immutable generations with an atomically swapped
+    current.json. Every uvicorn worker maps the same files, so the
+    page cache holds one copy. Ingestion / deletes push only the
+    changed rows (apply); other workers pick the new generation up
+    within MEMORY_INDEX_REFRESH_SECONDS. A namespace without a snapshot
+    is loaded from Postgres on its first search.
+    """
+
+    def __init__(self, root: str, namespaces: str, dtype: str, refresh_seconds: float):
+        names = {name.strip() for name in namespaces.split(",") if name.strip()}
+        self.root = root
+        self.all_namespaces = "*" in names
+        self.namespaces = names - {"*"}
+        self.dtype = np.dtype(dtype)
+        self.refresh_seconds = refresh_seconds
+
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+        self.searches = 0
+        self.builds = 0
+        self.reloads = 0
+        self.updates = 0
+
+    def serves(self, assistant_id: Optional[str]) -> bool:
+        if self.all_namespaces:
+            return True
+        return (assistant_id or GLOBAL_NAMESPACE) in self.namespaces
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query_embedding: np.ndarray,
+        limit: int,
+        assistant_id: Optional[str] = None,
+    ) -> List[dict]:
+        """Exact top-k by VECTOR_METRIC: one matmul + argpartition"""
+        snapshot = await self._snapshot(db, assistant_id)
+        if len(snapshot) and snapshot.embeddings.shape[1] != len(query_embedding):
+            # vectors re-embedded with another model since this generation
+            snapshot = await self.rebuild(db, assistant_id)
+        self.searches += 1
+        return await asyncio.to_thread(self._top_k, snapshot, query_embedding, limit)
+
+    async def apply(
+        self,
+        assistant_id: Optional[str],
+        rows: Sequence[dict] = (),
+        deleted_ids: Iterable[str] = (),
+        deleted_documents: Iterable[str] = (),
+    ):
+        """
+        Incremental update after a committed change. No-op for namespaces
+        not served from memory or not snapshotted yet. On failure the
+        snapshot is discarded, so the next search reloads from Postgres.
+        """
+        if not self.serves(assistant_id):
+            return
+        await self._update(assistant_id, rows, list(deleted_ids), list(deleted_documents))
+
+    async def clear(self, assistant_id: Optional[str]):
+        """Namespace emptied in the database → empty snapshot"""
+        if not self.serves(assistant_id):
+            return
+        await self._update(assistant_id, reset=True)
+
+    async def rebuild(
+        self,
+        db: AsyncSession,
+        assistant_id: Optional[str] = None,
+        force: bool = True,
+    ) -> Snapshot:
+        """
+        Snapshot from Postgres. The writer lock is held while reading,
+        so a concurrent apply() lands after the snapshot, never before it.
+        """
+        key = namespace_key(assistant_id)
+        directory = self._directory(key)
+
+        async with self._lock(key):
+            fd = await asyncio.to_thread(_acquire, directory)
+            try:
+                generation = _current_generation(directory)
+                if generation is not None and not force:
+                    # another worker built it while we waited
+                    snapshot = await asyncio.to_thread(_load, directory, generation)
+                else:
+                    rows = await self._fetch_rows(db, assistant_id)
+                    snapshot = await asyncio.to_thread(
+                        _compose, directory, None, rows, (), (), self.dtype
+                    )
+                    self.builds += 1
+                    logger.info(f"🧠 Memory index {key}: {len(snapshot)} chunks snapshotted")
+            finally:
+                _release(fd)
+
+        self._install(key, snapshot)
+        return snapshot
+
+    def discard(self):
+        """
+        Drop every snapshot (the stored vectors were replaced wholesale);
+        each namespace reloads from Postgres on its next search.
+        """
+        self._snapshots.clear()
+        self._checked_at.clear()
+        if not os.path.isdir(self.root):
+            return
+        for key in os.listdir(self.root):
+            try:
+                os.remove(os.path.join(self.root, key, CURRENT_FILE))
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "namespaces": ["*"] if self.all_namespaces else sorted(self.namespaces),
+            "dtype": str(self.dtype),
+            "loaded": {key: len(snapshot) for key, snapshot in self._snapshots.items()},
+            "searches": self.searches,
+            "builds": self.builds,
+            "reloads": self.reloads,
+            "updates": self.updates,
+        }
+
+    async def _snapshot(self, db: AsyncSession, assistant_id: Optional[str]) -> Snapshot:
+        key = namespace_key(assistant_id)
+        snapshot = self._snapshots.get(key)
+
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at.get(key, 0.0) < self.refresh_seconds:
+            return snapshot
+        self._checked_at[key] = now
+
+        directory = self._directory(key)
+        generation = _current_generation(directory)
+
+        if generation is None:
+            return await self.rebuild(db, assistant_id, force=False)
+
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = await asyncio.to_thread(_load, directory, generation)
+            self._snapshots[key] = snapshot
+            self.reloads += 1
+
+        return snapshot
+
+    async def _update(
+        self,
+        assistant_id: Optional[str],
+        rows: Sequence[dict] = (),
+        deleted_ids: Sequence[str] = (),
+        deleted_documents: Sequence[str] = (),
+        reset: bool = False,
+    ):
+        key = namespace_key(assistant_id)
+        directory = self._directory(key)
+
+        try:
+            async with self._lock(key):
+                fd = await asyncio.to_thread(_acquire, directory)
+                try:
+                    snapshot = await asyncio.to_thread(
+                        self._update_locked, directory, rows, deleted_ids, deleted_documents, reset
+                    )
+                finally:
+                    _release(fd)
+        except Exception:
+            logger.exception(f"❌ Memory index {key} update failed, snapshot discarded")
+            self._snapshots.pop(key, None)
+            try:
+                os.remove(os.path.join(directory, CURRENT_FILE))
+            except FileNotFoundError:
+                pass
+            return
+
+        if snapshot is not None:
+            self.updates += 1
+            self._install(key, snapshot)
+
+    def _update_locked(self, directory, rows, deleted_ids, deleted_documents, reset):
+        generation = _current_generation(directory)
+        if generation is None and not reset:
+            return None  # first search will load the committed rows
+
+        old = None if reset else _load(directory, generation)
+        return _compose(directory, old, rows, deleted_ids, deleted_documents, self.dtype)
+
+    @staticmethod
+    async def _fetch_rows(db: AsyncSession, assistant_id: Optional[str]) -> List[dict]:
+        namespace = (
+            Knowledge.assistant_id.is_(None)
+            if assistant_id is None
+            else Knowledge.assistant_id == assistant_id
+        )
+        result = await db.execute(
+            select(
+                Knowledge.id,
+                Knowledge.document_id,
+                Knowledge.file_name,
+                Knowledge.content,
+                Knowledge.embedding,
+            ).where(Knowledge.embedding.isnot(None), namespace)
+        )
+        return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    def _top_k(snapshot: Snapshot, query_embedding, limit: int) -> List[dict]:
+        if not len(snapshot) or limit <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = _dot(snapshot.embeddings, query)
+
+        # same distances as the pgvector operators for VECTOR_METRIC
+        metric = settings.VECTOR_METRIC
+        if metric == "cosine":
+            distances = 1.0 - scores / (snapshot.norms * np.linalg.norm(query))
+        elif metric == "ip":
+            distances = -scores
+        else:
+            distances = np.sqrt(np.maximum(snapshot.norms ** 2 + query @ query - 2.0 * scores, 0.0))
+
+        k = min(limit, len(distances))
+        top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(k)
+        top = top[np.argsort(distances[top], kind="stable")]
+
+        return [snapshot.row(int(i), float(distances[i])) for i in top]
+
+    def _directory(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def _install(self, key: str, snapshot: Snapshot):
+        self._snapshots[key] = snapshot
+        self._checked_at[key] = time.monotonic()
+
+
+memory_vector_index = MemoryVectorIndex(
+    root=settings.MEMORY_INDEX_DIR,
+    namespaces=settings.MEMORY_INDEX_NAMESPACES,
+    dtype=settings.MEMORY_INDEX_DTYPE,
+    refresh_seconds=settings.MEMORY_INDEX_REFRESH_SECONDS,
+)
@@ -1,41 +1,439 @@
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.services.embedding_service import EmbeddingService
+from app.config.settings import settings
+from app.services.answer_cache import answer_cache
+from app.services.context_builder import ContextBuilder
+from app.services.embedding_cache import EmbeddingCache, normalize_text
+from app.services.embedding_service import AsyncEmbeddingService
+from app.services.embedding_space import embedding_spaces
+from app.repository.embedding_migration_repository import SHADOW_COLUMN
+from app.services.llm_service import AsyncLLMService
+from app.services.memory_vector_index import memory_vector_index
+from app.repository.assistant_repository import AssistantRepository
+from app.services.vector_index_service import (
+    KNOWLEDGE_TABLE,
+    VectorIndexService,
+    distance_operator,
+    is_compact,
+    vector_rows_sql,
+)
+from app.utils.cache import LRUCache
+from app.utils.vector_codec import bind_vector
+
+# query text → float32 embedding; repeated questions skip the API call
+query_embedding_cache = LRUCache(
+    max_bytes=settings.QUERY_EMBEDDING_CACHE_SIZE * (4 * settings.EMBEDDING_DIMENSIONS + 200),
+    sizeof=lambda value: value.nbytes + 200,
+    max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Operator must match the index opclass (VECTOR_METRIC, cosine default).
+# {vector_rows}: the namespace's chunks, or with a compact (halfvec / binary /
+# reduced dims) index the nearest candidates by it, reranked here in float32.
+# {embedding}: the vector column the namespace searches (embedding_next once
+# switched by an embedding migration). {knowledge}: schema-qualified table.
+VECTOR_SEARCH_SQL = """
+    SELECT k.id, k.document_id, k.content, k.file_name, k.embedding,
+           k.embedding {operator} CAST(:embedding AS vector) AS distance,
+           false AS lexical_match
+    FROM {vector_rows} k
+    ORDER BY distance
+    LIMIT :limit
+"""
+
+# 'simple' config: no stemming / stop words, so IDs, prices and keywords match exactly
+LEXICAL_SEARCH_SQL = """
+    SELECT k.id, k.document_id, k.content, k.file_name, {embedding} AS embedding,
+           NULL::float AS distance,
+           true AS lexical_match
+    FROM {knowledge} k, websearch_to_tsquery('simple', :query) q
+    WHERE k.content_tsv @@ q AND {namespace}
+    ORDER BY ts_rank_cd(k.content_tsv, q) DESC
+    LIMIT :limit
+"""
+
+# Both rankings in one round trip, merged with RRF: score = sum 1 / (rrf_k + rank)
+HYBRID_SEARCH_SQL = """
+    WITH vector_hits AS (
+        SELECT id, row_number() OVER (ORDER BY distance) AS rank
+        FROM (
+            SELECT k.id, k.embedding {operator} CAST(:embedding AS vector) AS distance
+            FROM {vector_rows} k
+            ORDER BY distance
+            LIMIT :candidates
+        ) v
+    ),
+    lexical_hits AS (
+        SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+        FROM (
+            SELECT k.id, ts_rank_cd(k.content_tsv, q) AS score
+            FROM {knowledge} k, websearch_to_tsquery('simple', :query) q
+            WHERE k.content_tsv @@ q AND {namespace}
+            ORDER BY score DESC
+            LIMIT :candidates
+        ) l
+    ),
+    fused AS (
+        SELECT coalesce(v.id, l.id) AS id,
+               coalesce(1.0 / (:rrf_k + v.rank), 0)
+             + coalesce(1.0 / (:rrf_k + l.rank), 0) AS score,
+               l.id IS NOT NULL AS lexical_match
+        FROM vector_hits v
+        FULL OUTER JOIN lexical_hits l ON l.id = v.id
+    )
+    SELECT k.id, k.document_id, k.content, k.file_name, {embedding} AS embedding,
+           {embedding} {operator} CAST(:embedding AS vector) AS distance,
+           f.lexical_match
+    FROM fused f
+    JOIN {knowledge} k ON k.id = f.id
+    ORDER BY f.score DESC
+    LIMIT :limit
+"""
+
+SEARCH_SQL = {
+    "vector": VECTOR_SEARCH_SQL,
+    "lexical": LEXICAL_SEARCH_SQL,
+    "hybrid": HYBRID_SEARCH_SQL,
+}
+
+
+@lru_cache(maxsize=None)
+def search_statement(mode: str, scoped: bool, column: str = "embedding"):
+    """
+    Search SQL for one mode, limited to a namespace: an assistant's
+    (:assistant_id) or the global knowledge base (assistant_id IS NULL)
+    """
+    namespace = "k.assistant_id = :assistant_id" if scoped else "k.assistant_id IS NULL"
+    return text(SEARCH_SQL[mode].format(
+        operator=distance_operator(),
+        namespace=namespace,
+        vector_rows=vector_rows_sql(namespace, column=column),
+        embedding=f"k.{column}",
+        knowledge=KNOWLEDGE_TABLE,
+    ))
+
+
+NO_ANSWER = "No relevant information found in uploaded documents."
+
+
+class RetrievalGate:
+    """
+    Counts how often retrieval confidence gating skipped the LLM:
+    a query is rejected when no retrieved chunk is within the distance
+    threshold and none matched lexically.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.rejected = 0
+
+    def passes(self, results: List[dict], max_distance: Optional[float]) -> bool:
+        if max_distance is None or not results:
+            return True
+
+        self.checked += 1
+        for r in results:
+            if r["lexical_match"] or (r["distance"] is not None and r["distance"] <= max_distance):
+                return True
+
+        self.rejected += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "rejection_rate": round(self.rejected / self.checked, 4) if self.checked else 0.0,
+        }
+
+
+retrieval_gate = RetrievalGate()
 
 
 class RAGService:
 
     @staticmethod
-    async def semantic_search(db: AsyncSession, query: str, limit: int = 3):
-        # 1️⃣ Generate query embedding
-        query_embedding = EmbeddingService.get_embedding(query)
-
-        if not query_embedding:
-            return []
-
-        # 2️⃣ Convert list → pgvector string (VERY IMPORTANT)
-        vector_str = "[" + ",".join(map(str, query_embedding)) + "]"
-
-        stmt = text("""
-            SELECT id, content, file_name
-            FROM knowledge
-            WHERE embedding IS NOT NULL
-            ORDER BY embedding <-> CAST(:embedding AS vector)
-            LIMIT :limit
-        """)
-
-        result = await db.execute(
-            stmt,
-            {"embedding": vector_str, "limit": limit}
+    async def get_query_embedding(
+        query: str,
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Embedding of a search query, served from the TTL + LRU cache when possible.
+        model / dimensions default to the stored embedding space.
+        """
+        if not settings.QUERY_EMBEDDING_CACHE_ENABLED:
+            embedding = await AsyncEmbeddingService.get_embedding(query, model, dimensions)
+            return np.asarray(embedding, dtype=np.float32) if len(embedding) else None
+
+        # case / spacing variants of the same question share one entry
+        key = EmbeddingCache.make_key(
+            normalize_text(query).casefold(),
+            model or embedding_spaces.model,
+            dimensions or embedding_spaces.dimensions,
         )
 
+        cached = query_embedding_cache.get(key)
+        if cached is not None:
+            return cached
+
+        embedding = await AsyncEmbeddingService.get_embedding(query, model, dimensions)
+        if not len(embedding):
+            return None
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)  # shared between requests
+        query_embedding_cache.put(key, vector)
+        return vector
+
+    @staticmethod
+    async def semantic_search(
+        db: AsyncSession,
+        query: str,
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: Optional[str] = None,
+        assistant_id: Optional[str] = None,
+    ):
+        """
+        Searches one knowledge namespace: the assistant's own documents,
+        or the global knowledge base when assistant_id is None.
+
+        Rows carry `distance` (VECTOR_METRIC, lower = closer) and
+        `lexical_match` (matched the full-text query).
+
+        mode (default RAG_SEARCH_MODE):
+        "vector"  = ANN over embeddings (exact, in process, for namespaces
+                    listed in MEMORY_INDEX_NAMESPACES)
+        "lexical" = full-text over content_tsv
+        "hybrid"  = both, fused with reciprocal rank fusion in one statement
+
+        During an embedding migration, switched namespaces search the
+        new vectors (embedding_next) with the new model's query embedding.
+        """
+        mode = mode or settings.RAG_SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        await embedding_spaces.refresh()
+        column, model, dimensions = embedding_spaces.for_namespace(assistant_id)
+
+        params = {"query": query, "limit": limit}
+        if assistant_id is not None:
+            params["assistant_id"] = assistant_id
+
+        if mode != "lexical":
+            # 1️⃣ Query embedding (cached per normalized query text)
+            if query_embedding is None:
+                query_embedding = await RAGService.get_query_embedding(query, model, dimensions)
+
+            if query_embedding is None:
+                if mode == "vector":
+                    return []
+                mode = "lexical"  # embeddings unavailable: keep keyword hits
+            else:
+                # 2️⃣ float32 array → binary vector parameter (no text literal)
+                params["embedding"] = bind_vector(db, query_embedding)
+
+        if mode == "vector" and column == "embedding" and memory_vector_index.serves(assistant_id):
+            # exact top-k from the mmap'd snapshot, no database round trip
+            return await memory_vector_index.search(db, query_embedding, limit, assistant_id)
+
+        if mode != "lexical":
+            ann_rows = None
+            if mode == "hybrid":
+                ann_rows = max(limit, settings.HYBRID_CANDIDATES)
+                params["candidates"] = ann_rows
+                params["rrf_k"] = settings.RRF_K
+            if column == "embedding" and is_compact():
+                # compact index → candidate pool, reranked at full precision
+                ann_rows = max(settings.RAG_RERANK_CANDIDATES, ann_rows or limit)
+                params["rerank_candidates"] = ann_rows
+
+            # ANN index recall knobs (HNSW ef_search / IVFFlat probes);
+            # the index scan can only return ef_search rows
+            if ann_rows:
+                ef_search = max(ef_search or settings.HNSW_EF_SEARCH, ann_rows)
+            await VectorIndexService.apply_search_settings(
+                db, ef_search, probes, scoped=assistant_id is not None
+            )
+
+        stmt = search_statement(mode, assistant_id is not None, column)
+        try:
+            result = await db.execute(stmt, params)
+        except ProgrammingError:
+            await db.rollback()
+            if column != SHADOW_COLUMN:
+                raise
+            # migration finalized since the last refresh: embedding_next is embedding now
+            await embedding_spaces.refresh(force=True)
+            if embedding_spaces.for_namespace(assistant_id)[0] == SHADOW_COLUMN:
+                raise
+            return await RAGService.semantic_search(
+                db, query, limit, ef_search, probes, query_embedding, mode, assistant_id
+            )
+
         rows = result.fetchall()
 
         return [
             {
                 "id": row.id,
+                "document_id": row.document_id,
                 "content": row.content,
-                "file_name": row.file_name
+                "file_name": row.file_name,
+                "distance": row.distance,            # None for lexical-only hits
+                "lexical_match": row.lexical_match,
+                "embedding": row.embedding,          # for MMR in ContextBuilder
             }
             for row in rows
-        ]
\ No newline at end of file
+        ]
+
+    @staticmethod
+    async def resolve_max_distance(
+        db: AsyncSession,
+        assistant_id: Optional[str] = None,
+        max_distance: Optional[float] = None,
+    ) -> Optional[float]:
+        """Gate threshold: request value → assistant override → RAG_MAX_DISTANCE"""
+        if max_distance is not None:
+            return max_distance
+
+        if assistant_id:
+            assistant = await AssistantRepository.get_by_id(db, assistant_id)
+            if assistant is not None and assistant.rag_max_distance is not None:
+                return assistant.rag_max_distance
+
+        return settings.RAG_MAX_DISTANCE
+
+    @staticmethod
+    async def answer(
+        db: AsyncSession,
+        query: str,
+        limit: Optional[int] = None,
+        mode: Optional[str] = None,
+        max_distance: Optional[float] = None,
+        assistant_id: Optional[str] = None,
+    ) -> dict:
+        """Non-streaming answer: collects stream_answer into one response"""
+        events = RAGService.stream_answer(
+            db, query, limit, mode, max_distance, assistant_id
+        )
+        async for event, data in events:
+            if event == "done":
+                return {"query": query, "answer": data["answer"], "cached": data["cached"]}
+
+    @staticmethod
+    async def stream_answer(
+        db: AsyncSession,
+        query: str,
+        limit: Optional[int] = None,
+        mode: Optional[str] = None,
+        max_distance: Optional[float] = None,
+        assistant_id: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Retrieve → answer as (event, data) pairs:
+        "metadata" (query, sources, cached) → "token"* → "done" (full answer).
+        All DB work happens before the first event, so callers can
+        release the session once it has been received.
+
+        When no chunk is within max_distance (and none matched lexically)
+        the not-found answer is returned without calling the LLM.
+        A cached answer is reused when a near-identical query
+        (ANSWER_CACHE_SIMILARITY) retrieved exactly the same chunks.
+        Lexical mode never embeds the query; its cache hits need the
+        same normalized query text.
+
+        Only the assistant's namespace is searched (global when None).
+        `limit` candidates (RAG_CANDIDATES) are retrieved; ContextBuilder
+        then keeps what fits RAG_CONTEXT_MAX_TOKENS.
+        """
+        mode = mode or settings.RAG_SEARCH_MODE
+        await embedding_spaces.refresh()
+
+        # lexical search needs no query vector (the answer cache then
+        # matches on the normalized query text)
+        query_embedding = None
+        if mode != "lexical":
+            _, model, dimensions = embedding_spaces.for_namespace(assistant_id)
+            query_embedding = await RAGService.get_query_embedding(query, model, dimensions)
+        query_key = normalize_text(query).casefold()
+
+        # 1️⃣ Retrieval (vector / lexical / hybrid)
+        results = await RAGService.semantic_search(
+            db,
+            query,
+            limit=limit or settings.RAG_CANDIDATES,
+            query_embedding=query_embedding,
+            mode=mode,
+            assistant_id=assistant_id,
+        )
+
+        chunk_ids = [r["id"] for r in results]
+
+        # confidence gate: nothing close enough → skip the LLM
+        gated = not retrieval_gate.passes(results, max_distance)
+
+        cached = None
+        if results and not gated and settings.ANSWER_CACHE_ENABLED:
+            cached = answer_cache.lookup(query_embedding, chunk_ids, query_key)
+
+        # 2️⃣ Build Context: MMR → merge overlapping chunks → token budget
+        context, used = "", []
+        if results and not gated:
+            context, used = ContextBuilder.build(results, query_embedding)
+
+        yield "metadata", {
+            "query": query,
+            "mode": mode,
+            "cached": cached is not None,
+            "gated": gated,
+            "sources": [
+                {
+                    "id": r["id"],
+                    "document_id": r["document_id"],
+                    "file_name": r["file_name"],
+                    "distance": r["distance"],
+                }
+                for r in (used if used else results)
+            ],
+        }
+
+        if not results or gated:
+            yield "token", {"text": NO_ANSWER}
+            yield "done", {"answer": NO_ANSWER, "cached": False}
+            return
+
+        if cached is not None:
+            yield "token", {"text": cached}
+            yield "done", {"answer": cached, "cached": True}
+            return
+
+        # 3️⃣ LLM Final Answer (TRUE RAG), streamed token by token
+        parts = []
+        async for delta in AsyncLLMService.stream_answer(query, context):
+            parts.append(delta)
+            yield "token", {"text": delta}
+
+        answer = "".join(parts).strip()
+
+        if settings.ANSWER_CACHE_ENABLED and answer:
+            answer_cache.store(
+                query_embedding,
+                chunk_ids,
+                [r["document_id"] for r in results],
+                answer,
+                query_key,
+            )
+
+        yield "done", {"answer": answer, "cached": False}
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import os
+import uuid
+
+from fastapi import HTTPException, UploadFile
+from app.config.settings import settings
+
+
+def _write_and_hash(buffer, digest, chunk: bytes):
+    # hashlib releases the GIL on large buffers, so this runs
+    # fully in the worker thread alongside the disk write
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+class UploadService:
+    """
+    Stream uploads to disk without blocking the event loop.
+    SHA-256 and byte count are computed in the same pass.
+    """
+
+    @staticmethod
+    async def save(file: UploadFile, directory: str) -> dict:
+        max_bytes = settings.KNOWLEDGE_MAX_UPLOAD_BYTES
+
+        # Reject early when the client told us the size up front
+        if file.size is not None and file.size > max_bytes:
+            UploadService._raise_too_large(max_bytes)
+
+        file_name = os.path.basename(file.filename)
+        # unique per upload: a queued job must parse exactly the bytes it
+        # hashed, even if the same name is uploaded again (any namespace)
+        file_path = os.path.join(directory, f"{uuid.uuid4().hex}_{file_name}")
+
+        # Write to a temp name so a failed upload never leaves a
+        # half-written file under the real name
+        temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+
+        digest = hashlib.sha256()
+        byte_size = 0
+
+        buffer = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+
+                byte_size += len(chunk)
+                if byte_size > max_bytes:
+                    UploadService._raise_too_large(max_bytes)
+
+                await asyncio.to_thread(_write_and_hash, buffer, digest, chunk)
+        except BaseException:
+            await asyncio.to_thread(buffer.close)
+            await asyncio.to_thread(os.remove, temp_path)
+            raise
+
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(os.replace, temp_path, file_path)
+
+        return {
+            "file_name": file_name,
+            "file_path": file_path,
+            "file_hash": digest.hexdigest(),
+            "byte_size": byte_size,
+        }
+
+    @staticmethod
+    def discard(file_path: str):
+        """Remove a stored upload once its job is done with it"""
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _raise_too_large(max_bytes: int):
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {max_bytes} bytes."
+        )
@@ -0,0 +1,519 @@
+import hashlib
+import logging
+import math
+import re
+import time
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.database import engine
+from app.config.settings import settings
+from app.models.knowledge import Knowledge
+from app.services.embedding_space import embedding_spaces
+from app.utils.namespaces import NAMESPACE_PATTERN
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_TABLE = Knowledge.__table__.fullname
+
+# namespace literal in a partial index definition (pg_indexes.indexdef)
+INDEXDEF_NAMESPACE = re.compile(r"assistant_id\)?(?:::text)? = '([0-9A-Za-z-]{1,36})'")
+
+# metric → (distance operator, opclass). OpenAI embeddings are unit length,
+# so cosine and inner product rank identically; l2 kept for old setups.
+METRICS = {
+    "cosine": ("<=>", "vector_cosine_ops"),
+    "ip": ("<#>", "vector_ip_ops"),
+    "l2": ("<->", "vector_l2_ops"),
+}
+
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+# indexed form of the embedding; "none" = the float32 vector itself
+QUANTIZATIONS = ("none", "halfvec", "binary")
+
+# index name tag per quantization
+QUANTIZATION_TAGS = {"none": "v", "halfvec": "h", "binary": "b"}
+
+# bytes per vector as stored by pgvector (8 byte header)
+VECTOR_BYTES = {
+    "none": lambda dims: 4 * dims + 8,
+    "halfvec": lambda dims: 2 * dims + 8,
+    "binary": lambda dims: (dims + 7) // 8 + 8,
+}
+
+
+def distance_operator(metric: str = None) -> str:
+    return METRICS[metric or settings.VECTOR_METRIC][0]
+
+
+def index_dimensions(dimensions: Optional[int] = None) -> int:
+    """Indexed dimensions, capped at what knowledge.embedding holds (stored embedding space)"""
+    full = embedding_spaces.dimensions
+    return min(dimensions or settings.VECTOR_INDEX_DIMENSIONS or full, full)
+
+
+def is_compact(quantization: Optional[str] = None, dimensions: Optional[int] = None) -> bool:
+    """True when the index holds a reduced form that needs a full-precision rerank"""
+    quantization = quantization or settings.VECTOR_QUANTIZATION
+    return quantization != "none" or index_dimensions(dimensions) < embedding_spaces.dimensions
+
+
+def compact_expression(
+    vector_sql: str,
+    quantization: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    metric: Optional[str] = None,
+) -> Tuple[str, str, str]:
+    """
+    (expression, operator, opclass) of the indexed form of a vector.
+    The same expression is used in CREATE INDEX and in the query,
+    which is what lets the planner match the expression index.
+    """
+    quantization = quantization or settings.VECTOR_QUANTIZATION
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    operator, opclass = METRICS[metric or settings.VECTOR_METRIC]
+    dimensions = index_dimensions(dimensions)
+
+    source = vector_sql
+    if dimensions < embedding_spaces.dimensions:
+        source = f"subvector({vector_sql}, 1, {dimensions})"
+
+    if quantization == "halfvec":
+        return f"({source})::halfvec({dimensions})", operator, opclass.replace("vector_", "halfvec_")
+    if quantization == "binary":
+        return f"binary_quantize({source})::bit({dimensions})", "<~>", "bit_hamming_ops"
+    if source != vector_sql:
+        return f"({source})::vector({dimensions})", operator, opclass
+    return vector_sql, operator, opclass
+
+
+def vector_rows_sql(
+    namespace: str,
+    quantization: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    column: str = "embedding",
+) -> str:
+    """
+    Subquery of the chunks a vector search ranks (alias as k).
+    Compact indexes: the RAG_RERANK_CANDIDATES nearest by the indexed
+    form, to be re-ordered by full-precision distance outside.
+    column: embedding_next while a migrated namespace searches the
+    shadow vectors (indexed as plain vectors, no compact form).
+    """
+    columns = f"k.id, k.document_id, k.content, k.file_name, k.{column} AS embedding"
+    where = f"k.{column} IS NOT NULL AND {namespace}"
+
+    if column != "embedding" or not is_compact(quantization, dimensions):
+        return f"(SELECT {columns} FROM {KNOWLEDGE_TABLE} k WHERE {where})"
+
+    column, operator, _ = compact_expression("k.embedding", quantization, dimensions)
+    query, _, _ = compact_expression("CAST(:embedding AS vector)", quantization, dimensions)
+    return (
+        f"(SELECT {columns} FROM {KNOWLEDGE_TABLE} k WHERE {where} "
+        f"ORDER BY {column} {operator} {query} LIMIT :rerank_candidates)"
+    )
+
+
+def namespace_suffix(namespace: str) -> str:
+    return "_ns_" + hashlib.sha1(namespace.encode()).hexdigest()[:12]
+
+
+def index_name(
+    index_type: str,
+    metric: str,
+    namespace: Optional[str] = None,
+    quantization: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    column: str = "embedding",
+) -> str:
+    name = f"ix_{Knowledge.__tablename__}_{column}_{index_type}_{metric}"
+    if column == "embedding" and is_compact(quantization, dimensions):
+        # e.g. _h512 (halfvec, 512 dims), _b1536 (binary), _v256 (float32 prefix)
+        tag = QUANTIZATION_TAGS[quantization or settings.VECTOR_QUANTIZATION]
+        name += f"_{tag}{index_dimensions(dimensions)}"
+    return name + namespace_suffix(namespace) if namespace else name
+
+
+def namespace_predicate(namespace: Optional[str]) -> str:
+    """Partial-index predicate matching the namespace filter of the RAG search"""
+    if namespace is None:
+        return "assistant_id IS NULL"
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(f"Invalid namespace: {namespace}")
+    return f"assistant_id = '{namespace}'"
+
+
+def in_index_namespace(name: str, namespace: Optional[str]) -> bool:
+    if namespace is None:
+        return "_ns_" not in name
+    return name.endswith(namespace_suffix(namespace))
+
+
+def index_column(name: str) -> str:
+    """Vector column an ANN index (named by index_name) is built on"""
+    if name.startswith(f"ix_{Knowledge.__tablename__}_embedding_next_"):
+        return "embedding_next"
+    return "embedding"
+
+
+def indexdef_namespace(indexdef: str) -> Optional[str]:
+    """Namespace of a partial ANN index (None = global / whole table)"""
+    match = INDEXDEF_NAMESPACE.search(indexdef)
+    return match.group(1) if match else None
+
+
+class VectorIndexService:
+    """
+    ANN index management for knowledge.embedding (pgvector HNSW / IVFFlat)
+    """
+
+    @staticmethod
+    async def apply_search_settings(
+        db: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        scoped: bool = False,
+    ):
+        """
+        Per-query recall / speed knobs. set_config(..., true) is
+        transaction local, so pooled connections never keep them.
+
+        scoped: namespace search. Forces a custom plan so the planner sees
+        the actual assistant_id and can pick that namespace's partial index
+        (a generic prepared-statement plan cannot match a partial predicate).
+        """
+        await db.execute(
+            text(
+                "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+                "set_config('ivfflat.probes', :probes, true), "
+                "set_config('plan_cache_mode', :plan_cache_mode, true)"
+            ),
+            {
+                "ef_search": str(ef_search or settings.HNSW_EF_SEARCH),
+                "probes": str(probes or settings.IVFFLAT_PROBES),
+                "plan_cache_mode": "force_custom_plan" if scoped else "auto",
+            },
+        )
+
+    @staticmethod
+    async def list_indexes():
+        """ANN indexes currently defined on knowledge.embedding"""
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT i.indexname, i.indexdef,
+                           pg_relation_size(c.oid) AS size_bytes
+                    FROM pg_indexes i
+                    JOIN pg_class c ON c.relname = i.indexname
+                    JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = i.schemaname
+                    WHERE i.schemaname = :schema
+                      AND i.tablename = :table
+                      AND (i.indexdef ILIKE '%USING hnsw%' OR i.indexdef ILIKE '%USING ivfflat%')
+                """),
+                {"schema": Knowledge.__table__.schema, "table": Knowledge.__tablename__},
+            )
+            return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    async def create_index(
+        index_type: str = None,
+        metric: str = None,
+        m: int = None,
+        ef_construction: int = None,
+        lists: int = None,
+        replace: bool = True,
+        namespace: Optional[str] = None,
+        quantization: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        column: str = "embedding",
+    ) -> str:
+        """
+        Build the ANN index CONCURRENTLY (writes keep flowing).
+
+        Indexes are partial per knowledge namespace: namespace=None covers
+        the global knowledge base (assistant_id IS NULL), an assistant id
+        covers only that assistant's chunks. With replace=True the other
+        ANN indexes of the same namespace are dropped afterwards, so the
+        planner only has the new one to pick.
+
+        quantization / dimensions (default VECTOR_QUANTIZATION /
+        VECTOR_INDEX_DIMENSIONS) index a compact expression of the
+        embedding (halfvec, binary_quantize, leading-dims subvector);
+        needs pgvector >= 0.7.
+
+        column="embedding_next" indexes the shadow vectors of an embedding
+        migration (plain vectors; renamed with the column on finalize).
+        """
+        index_type = index_type or settings.VECTOR_INDEX_TYPE
+        metric = metric or settings.VECTOR_METRIC
+
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        if column == "embedding":
+            expression, _, opclass = compact_expression("embedding", quantization, dimensions, metric)
+            if expression != "embedding":
+                expression = f"({expression})"
+        else:
+            expression, opclass = column, METRICS[metric][1]
+        predicate = namespace_predicate(namespace)
+        name = index_name(index_type, metric, namespace, quantization, dimensions, column)
+
+        if index_type == "hnsw":
+            params = (
+                f"m = {int(m or settings.HNSW_M)}, "
+                f"ef_construction = {int(ef_construction or settings.HNSW_EF_CONSTRUCTION)}"
+            )
+        else:
+            lists = lists or settings.IVFFLAT_LISTS or await VectorIndexService._auto_lists(namespace)
+            params = f"lists = {int(lists)}"
+
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(
+                text("SELECT set_config('maintenance_work_mem', :mem, false)"),
+                {"mem": settings.VECTOR_INDEX_MAINTENANCE_WORK_MEM},
+            )
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {Knowledge.__table__.schema}.{name}"))
+            await conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY {name}
+                ON {KNOWLEDGE_TABLE}
+                USING {index_type} ({expression} {opclass})
+                WITH ({params})
+                WHERE {predicate}
+            """))
+
+        if replace:
+            for index in await VectorIndexService.list_indexes():
+                other = index["indexname"]
+                if (
+                    other != name
+                    and index_column(other) == column
+                    and in_index_namespace(other, namespace)
+                ):
+                    await VectorIndexService.drop_index(other)
+
+        return name
+
+    @staticmethod
+    async def ensure_namespace_index(namespace: str) -> Optional[str]:
+        """
+        Give an assistant's namespace its own partial ANN index once it
+        holds NAMESPACE_INDEX_MIN_CHUNKS chunks. Smaller namespaces are
+        searched exactly via the assistant_id btree, which is fast and
+        has perfect recall.
+        """
+        threshold = settings.NAMESPACE_INDEX_MIN_CHUNKS
+        if not namespace or threshold <= 0:
+            return None
+
+        existing = await VectorIndexService.list_indexes()
+        if any(
+            index_column(index["indexname"]) == "embedding"
+            and in_index_namespace(index["indexname"], namespace)
+            for index in existing
+        ):
+            return None
+
+        if await VectorIndexService._count_rows(namespace) < threshold:
+            return None
+
+        name = await VectorIndexService.create_index(namespace=namespace)
+        logger.info(f"Built ANN index {name} for namespace {namespace}")
+        return name
+
+    @staticmethod
+    async def drop_index(name: str):
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(
+                text(f"DROP INDEX CONCURRENTLY IF EXISTS {Knowledge.__table__.schema}.{name}")
+            )
+
+    @staticmethod
+    async def measure_recall(
+        db: AsyncSession,
+        sample_size: int = 50,
+        k: int = 10,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        namespace: Optional[str] = None,
+        quantization: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> dict:
+        """
+        recall@k of the ANN index against exact (sequential) search,
+        using stored chunk embeddings of one namespace as queries.
+        Compact indexes are measured the way RAG searches them:
+        candidate pool from the index, reranked at full precision.
+        """
+        operator = distance_operator()
+        predicate = namespace_predicate(namespace)
+        compact = is_compact(quantization, dimensions)
+        rerank_candidates = max(settings.RAG_RERANK_CANDIDATES, k)
+        if compact:
+            ef_search = max(ef_search or settings.HNSW_EF_SEARCH, rerank_candidates)
+
+        result = await db.execute(
+            text(f"""
+                SELECT embedding::text AS embedding
+                FROM {KNOWLEDGE_TABLE}
+                WHERE embedding IS NOT NULL AND {predicate}
+                ORDER BY random()
+                LIMIT :sample
+            """),
+            {"sample": sample_size},
+        )
+        queries = [row.embedding for row in result]
+
+        exact_search = text(f"""
+            SELECT id
+            FROM {KNOWLEDGE_TABLE}
+            WHERE embedding IS NOT NULL AND {predicate}
+            ORDER BY embedding {operator} CAST(:embedding AS vector)
+            LIMIT :k
+        """)
+        search = text(f"""
+            SELECT k.id
+            FROM {vector_rows_sql(predicate, quantization, dimensions)} k
+            ORDER BY k.embedding {operator} CAST(:embedding AS vector)
+            LIMIT :k
+        """)
+
+        recalls = []
+        ann_seconds = 0.0
+        exact_seconds = 0.0
+
+        for embedding in queries:
+            params = {"embedding": embedding, "k": k, "rerank_candidates": rerank_candidates}
+
+            # exact: planner may not use any index in this transaction
+            await db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+            started = time.perf_counter()
+            exact = {row.id for row in await db.execute(exact_search, params)}
+            exact_seconds += time.perf_counter() - started
+            await db.rollback()
+
+            await VectorIndexService.apply_search_settings(
+                db, ef_search, probes, scoped=namespace is not None
+            )
+            started = time.perf_counter()
+            approximate = {row.id for row in await db.execute(search, params)}
+            ann_seconds += time.perf_counter() - started
+            await db.rollback()
+
+            if exact:
+                recalls.append(len(exact & approximate) / len(exact))
+
+        samples = len(recalls) or 1
+        return {
+            "metric": settings.VECTOR_METRIC,
+            "namespace": namespace,
+            "quantization": quantization or settings.VECTOR_QUANTIZATION,
+            "dimensions": index_dimensions(dimensions),
+            "rerank_candidates": rerank_candidates if compact else None,
+            "k": k,
+            "queries": len(recalls),
+            "ef_search": ef_search or settings.HNSW_EF_SEARCH,
+            "probes": probes or settings.IVFFLAT_PROBES,
+            "recall": round(sum(recalls) / samples, 4),
+            "ann_ms": round(1000 * ann_seconds / samples, 2),
+            "exact_ms": round(1000 * exact_seconds / samples, 2),
+        }
+
+    @staticmethod
+    async def benchmark(
+        db: AsyncSession,
+        quantizations: Sequence[str] = QUANTIZATIONS,
+        dimensions: Sequence[int] = (),
+        sample_size: int = 50,
+        k: int = 10,
+        index_type: str = None,
+        namespace: Optional[str] = None,
+        keep: bool = False,
+    ) -> list:
+        """
+        Build one index per (quantization, dimensions), report recall@k
+        (with rerank) and index size against the float32 index. Indexes
+        that did not exist before are dropped again unless keep=True.
+        """
+        index_type = index_type or settings.VECTOR_INDEX_TYPE
+        dimensions = dimensions or (embedding_spaces.dimensions,)
+        existing = {index["indexname"] for index in await VectorIndexService.list_indexes()}
+        rows = await VectorIndexService._count_rows(namespace)
+
+        report = []
+        for quantization in quantizations:
+            for dims in dimensions:
+                name = await VectorIndexService.create_index(
+                    index_type=index_type,
+                    replace=False,
+                    namespace=namespace,
+                    quantization=quantization,
+                    dimensions=dims,
+                )
+                try:
+                    recall = await VectorIndexService.measure_recall(
+                        db,
+                        sample_size=sample_size,
+                        k=k,
+                        namespace=namespace,
+                        quantization=quantization,
+                        dimensions=dims,
+                    )
+                    sizes = {
+                        index["indexname"]: index["size_bytes"]
+                        for index in await VectorIndexService.list_indexes()
+                    }
+                finally:
+                    if not keep and name not in existing:
+                        await VectorIndexService.drop_index(name)
+
+                report.append({
+                    "index": name,
+                    **recall,
+                    "index_mb": round(sizes.get(name, 0) / 1024 / 1024, 2),
+                    "vector_bytes": VECTOR_BYTES[quantization](index_dimensions(dims)),
+                })
+
+        full_bytes = VECTOR_BYTES["none"](embedding_spaces.dimensions)
+        baseline = next(
+            (entry["index_mb"] for entry in report
+             if entry["quantization"] == "none"
+             and entry["dimensions"] == embedding_spaces.dimensions),
+            None,
+        )
+        for entry in report:
+            entry["rows"] = rows
+            entry["vector_saved_pct"] = round(100 * (1 - entry["vector_bytes"] / full_bytes), 1)
+            if baseline:
+                entry["index_saved_pct"] = round(100 * (1 - entry["index_mb"] / baseline), 1)
+
+        return report
+
+    @staticmethod
+    async def _count_rows(namespace: Optional[str] = None) -> int:
+        async with engine.connect() as conn:
+            rows = await conn.scalar(
+                text(
+                    f"SELECT count(*) FROM {KNOWLEDGE_TABLE} "
+                    f"WHERE embedding IS NOT NULL AND {namespace_predicate(namespace)}"
+                )
+            )
+        return rows or 0
+
+    @staticmethod
+    async def _auto_lists(namespace: Optional[str] = None) -> int:
+        """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond"""
+        rows = await VectorIndexService._count_rows(namespace)
+        if rows > 1_000_000:
+            return max(1, int(math.sqrt(rows)))
+        return max(1, rows // 1000)
@@ -0,0 +1,12 @@
+import hashlib
+import json
+
+
+def sha256_hex(text: str) -> str:
+    """Hex SHA-256 of UTF-8 text (matches Postgres encode(sha256(convert_to(t, 'UTF8')), 'hex'))"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def format_sse(event: str, data) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
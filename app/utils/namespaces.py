@@ -0,0 +1,17 @@
+import re
+from typing import Optional
+
+# assistant ids are uuid strings; checked before being inlined into DDL
+NAMESPACE_PATTERN = re.compile(r"^[0-9A-Za-z-]{1,36}$")
+
+# key of the global knowledge base (assistant_id IS NULL)
+GLOBAL_NAMESPACE = "global"
+
+
+def namespace_key(assistant_id: Optional[str]) -> str:
+    """Name of a knowledge namespace outside SQL (snapshot dirs, switched list)"""
+    if assistant_id is None:
+        return GLOBAL_NAMESPACE
+    if not NAMESPACE_PATTERN.match(assistant_id):
+        raise ValueError(f"Invalid namespace: {assistant_id}")
+    return assistant_id
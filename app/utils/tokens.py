@@ -0,0 +1,36 @@
+import logging
+from functools import lru_cache
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a char based estimate
+    tiktoken = None
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+
+    try:
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception:
+        # BPE file is downloaded on first use; offline hosts fall back
+        logger.warning("⚠️ tiktoken encoding unavailable, estimating tokens from length")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` for the embedding / chat models (cl100k_base)"""
+    if not text:
+        return 0
+
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
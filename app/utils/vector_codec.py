@@ -0,0 +1,65 @@
+import base64
+import struct
+
+import numpy as np
+
+# pgvector binary wire format: uint16 dim, uint16 unused, dim * float32 (big endian)
+_HEADER = struct.Struct(">HH")
+
+
+def encode_vector(value) -> bytes:
+    """asyncpg encoder for the `vector` type (binary format)"""
+    if isinstance(value, str):
+        # text literal produced by pgvector's SQLAlchemy type ("[1,2,3]")
+        value = np.array(value.strip("[]").split(","), dtype=np.float32)
+    elif hasattr(value, "to_numpy"):
+        value = value.to_numpy()
+
+    array = np.asarray(value, dtype=">f4")
+    return _HEADER.pack(array.shape[0], 0) + array.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """asyncpg decoder for the `vector` type → float32 ndarray"""
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+async def register_vector_codec(conn, schema: str = "public"):
+    """Register the binary codec on one asyncpg connection"""
+    try:
+        await conn.set_type_codec(
+            "vector",
+            schema=schema,
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary",
+        )
+    except ValueError:
+        # pgvector extension not installed in this database (yet)
+        pass
+
+
+def from_base64(data: str) -> np.ndarray:
+    """Embedding sent with encoding_format="base64" (little-endian float32) → ndarray, no float parsing"""
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+def bind_vector(db, value):
+    """
+    Query parameter for CAST(:param AS vector): the float32 array itself
+    on asyncpg (sent through the binary codec), a text literal elsewhere.
+    """
+    array = to_array(value)
+    if db.bind.dialect.driver == "asyncpg":
+        return array
+    return "[" + ",".join(map(str, array.tolist())) + "]"
+
+
+def to_array(value) -> np.ndarray:
+    """float32 ndarray from a driver value (binary codec ndarray, text literal, list)"""
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    if hasattr(value, "to_numpy"):
+        value = value.to_numpy()
+    return np.asarray(value, dtype=np.float32)
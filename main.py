@@ -10,10 +10,22 @@ from app.api.auth_routes import router as auth_router
 
 from app.config.settings import settings
 from app.config.database import engine
+from app.integrations.openai.client import close_async_openai_client
+from app.services.ingestion_service import ingestion_queue
+from app.services.embedding_space import embedding_spaces
+from app.services.embedding_migration_service import embedding_migration_runner
+from app.services.file_parser_service import FileParserService
 from app.models.base import Base
+from app.models.schema import init_schema
 
 from app.models.assistant import Assistant
 from app.models.knowledge import Knowledge
+from app.models.document import Document
+from app.models.ingestion_job import IngestionJob
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.knowledge_stats import KnowledgeStats
+from app.models.embedding_space import EmbeddingSpace
+from app.models.embedding_migration import EmbeddingMigration
 from app.models.user import User
 
 app = FastAPI(title="NoaVoice Assistant API")
@@ -49,10 +61,21 @@ async def root():
 @app.on_event("startup")
 async def on_startup():
     print("🔥 Creating database tables...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await init_schema(engine)
     print("✅ Tables created successfully!")
 
+    await embedding_spaces.refresh(force=True)
+    await ingestion_queue.start()
+    await embedding_migration_runner.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await embedding_migration_runner.stop()
+    await ingestion_queue.stop()
+    FileParserService.shutdown()
+    await close_async_openai_client()
+
 
 # Routers
 app.include_router(auth_router)
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from app.services.chunking_service import ChunkingService
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda".split()
+
+
+def make_document(paragraphs=40, seed=3):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(paragraphs):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))).capitalize() + "."
+            for _ in range(rng.randint(1, 12))
+        ]
+        parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+def chunks_of(source, max_tokens=60, overlap_tokens=10):
+    return list(ChunkingService.iter_chunks(source, max_tokens, overlap_tokens))
+
+
+def test_offsets_point_at_the_chunk_text():
+    document = make_document()
+
+    for chunk in chunks_of(document):
+        assert document[chunk.start:chunk.end] == chunk.text
+
+
+def test_chunks_fit_the_budget_and_cover_the_document():
+    document = make_document()
+    chunks = chunks_of(document)
+
+    covered = [False] * len(document)
+    for chunk in chunks:
+        assert chunk.token_count <= 60
+        covered[chunk.start:chunk.end] = [True] * (chunk.end - chunk.start)
+
+    assert all(covered[i] for i, char in enumerate(document) if not char.isspace())
+
+
+def test_consecutive_chunks_overlap():
+    # short sentences: the trailing ones always fit the overlap budget
+    document = " ".join(f"{WORDS[i % len(WORDS)].capitalize()} number {i}." for i in range(300))
+    chunks = chunks_of(document, overlap_tokens=15)
+
+    assert len(chunks) > 2
+    assert all(current.start < previous.end for previous, current in zip(chunks, chunks[1:]))
+    assert all(c.start >= p.start for p, c in zip(chunks, chunks[1:]))
+
+
+def test_no_overlap_tiles_the_document():
+    chunks = chunks_of(make_document(), overlap_tokens=0)
+
+    assert all(current.start >= previous.end for previous, current in zip(chunks, chunks[1:]))
+
+
+@pytest.mark.parametrize("page_size", [1, 97, 1000])
+def test_streamed_pages_chunk_like_the_whole_text(page_size):
+    document = make_document()
+    pages = [document[i:i + page_size] for i in range(0, len(document), page_size)]
+
+    assert chunks_of(pages) == chunks_of(document)
+
+
+def test_oversized_word_is_split():
+    document = "x" * 5000
+
+    chunks = chunks_of(document, max_tokens=50, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == document
+    assert all(document[c.start:c.end] == c.text for c in chunks)
+
+
+def test_blank_input_has_no_chunks():
+    assert chunks_of("") == []
+    assert chunks_of(["  \n\n ", "\t"]) == []
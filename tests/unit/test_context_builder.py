@@ -0,0 +1,74 @@
+import numpy as np
+
+from app.services.context_builder import ContextBuilder, merge_overlapping, mmr_order
+from app.utils.tokens import count_tokens
+
+SHARED = "the clinic opens at eight on weekdays and "
+
+
+def test_merge_joins_tail_to_head():
+    first = "Opening hours: " + SHARED
+    second = SHARED + "closes at six."
+
+    assert merge_overlapping(first, second) == "Opening hours: " + SHARED + "closes at six."
+    assert merge_overlapping(second, first) == "Opening hours: " + SHARED + "closes at six."
+
+
+def test_merge_keeps_the_containing_chunk():
+    assert merge_overlapping("abc " + SHARED + "xyz", SHARED) == "abc " + SHARED + "xyz"
+    assert merge_overlapping(SHARED, "abc " + SHARED) == "abc " + SHARED
+
+
+def test_short_coincidental_overlap_is_not_merged():
+    assert merge_overlapping("ends with the end", "the end starts here") is None
+    assert merge_overlapping("completely different", "unrelated chunk text") is None
+
+
+def test_mmr_starts_with_the_most_relevant_and_skips_duplicates():
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    embeddings = np.array([
+        [0.9, 0.1, 0.0],    # relevant
+        [0.9, 0.1, 0.0],    # exact duplicate of 0
+        [0.7, 0.0, 0.7],    # less relevant, different
+    ], dtype=np.float32)
+
+    assert mmr_order(query, embeddings, lambda_=1.0) == [0, 1, 2]
+    assert mmr_order(query, embeddings, lambda_=0.3) == [0, 2, 1]
+
+
+def result(i, content, document_id="doc", embedding=None):
+    return {"id": f"c{i}", "document_id": document_id, "content": content, "embedding": embedding}
+
+
+def test_build_merges_overlapping_chunks_of_one_document():
+    results = [
+        result(0, "Opening hours: " + SHARED),
+        result(1, SHARED + "closes at six."),
+        result(2, SHARED + "closes at six.", document_id="other"),
+    ]
+
+    context, used = ContextBuilder.build(results, max_tokens=10_000)
+
+    assert context.split("\n\n") == [
+        "Opening hours: " + SHARED + "closes at six.",
+        SHARED + "closes at six.",
+    ]
+    assert [r["id"] for r in used] == ["c0", "c1", "c2"]
+
+
+def test_build_respects_the_token_budget():
+    long_text = "word " * 400
+    results = [result(0, "first chunk"), result(1, long_text, "b"), result(2, "short one", "c")]
+    budget = count_tokens("first chunk") + count_tokens("short one")
+
+    context, used = ContextBuilder.build(results, max_tokens=budget)
+
+    # the long chunk does not fit, a later shorter one still does
+    assert [r["id"] for r in used] == ["c0", "c2"]
+    assert context == "first chunk\n\nshort one"
+
+
+def test_build_always_keeps_the_first_chunk():
+    context, used = ContextBuilder.build([result(0, "word " * 400)], max_tokens=5)
+
+    assert [r["id"] for r in used] == ["c0"]
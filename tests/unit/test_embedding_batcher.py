@@ -0,0 +1,121 @@
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import openai
+import pytest
+
+from app.services import embedding_service
+from app.services.embedding_service import EmbeddingBatcher, plan_batches
+
+OPTIONS = {"model": "text-embedding-3-small", "encoding_format": "base64"}
+
+
+def vector_for(text: str) -> np.ndarray:
+    return np.array([len(text), ord(text[0])], dtype="<f4")
+
+
+def api_error(cls, status: int):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+class FakeEmbeddings:
+    """embeddings.create double: records every call, fails on demand"""
+
+    def __init__(self, bad_texts=(), error=None):
+        self.bad_texts = set(bad_texts)
+        self.error = error
+        self.calls = []
+
+    async def create(self, input, **options):
+        self.calls.append(list(input))
+        if self.error is not None:
+            raise self.error
+        if self.bad_texts.intersection(input):
+            raise api_error(openai.BadRequestError, 400)
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=base64.b64encode(vector_for(text).tobytes()).decode())
+            for i, text in enumerate(input)
+        ])
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    def install(**kwargs):
+        fake = FakeEmbeddings(**kwargs)
+        monkeypatch.setattr(embedding_service, "async_openai_client", SimpleNamespace(embeddings=fake))
+        return fake
+    return install
+
+
+def embed_all(texts, max_batch_size=None):
+    async def run():
+        batcher = EmbeddingBatcher(window_ms=50, max_batch_size=max_batch_size or len(texts))
+        return await asyncio.gather(
+            *[batcher.embed(text, OPTIONS) for text in texts],
+            return_exceptions=True,
+        )
+    return asyncio.run(run())
+
+
+def test_one_batch_for_concurrent_queries(fake_embeddings):
+    fake = fake_embeddings()
+    texts = ["alpha", "beta", "gamma", "beta"]
+
+    results = embed_all(texts)
+
+    # identical texts are sent once
+    assert fake.calls == [["alpha", "beta", "gamma"]]
+    for text, result in zip(texts, results):
+        np.testing.assert_array_equal(result, vector_for(text))
+
+
+def test_bad_input_fails_only_its_caller(fake_embeddings):
+    fake = fake_embeddings(bad_texts={"bad"})
+    texts = ["alpha", "bad", "gamma", "delta"]
+
+    results = embed_all(texts)
+
+    assert isinstance(results[1], openai.BadRequestError)
+    for i in (0, 2, 3):
+        np.testing.assert_array_equal(results[i], vector_for(texts[i]))
+
+    # bisected down to the bad input: 4 -> 2 + 2 -> 1 + 1
+    assert len(fake.calls) == 5
+    embedded = [text for call in fake.calls if "bad" not in call for text in call]
+    assert sorted(embedded) == ["alpha", "delta", "gamma"]
+
+
+@pytest.mark.parametrize("error", [
+    api_error(openai.RateLimitError, 429),
+    api_error(openai.AuthenticationError, 401),
+    api_error(openai.InternalServerError, 500),
+])
+def test_batch_wide_error_is_not_fanned_out(fake_embeddings, error):
+    fake = fake_embeddings(error=error)
+    texts = [f"query {i}" for i in range(6)]
+
+    results = embed_all(texts)
+
+    assert len(fake.calls) == 1
+    assert all(result is error for result in results)
+
+
+def test_max_batch_size_flushes_early(fake_embeddings):
+    fake = fake_embeddings()
+
+    embed_all([f"query {i}" for i in range(5)], max_batch_size=2)
+
+    assert sorted(len(call) for call in fake.calls) == [1, 2, 2]
+
+
+def test_plan_batches_respects_item_and_token_budget():
+    texts = ["x" * 40, "x" * 40, "x" * 40, "y", "z"]
+
+    # 11 tokens each for the long texts, 1 for the short ones
+    assert plan_batches(texts, max_items=10, max_tokens=25) == [[0, 1], [2, 3, 4]]
+    assert plan_batches(texts, max_items=2, max_tokens=1000) == [[0, 1], [2, 3], [4]]
+    assert plan_batches(["x" * 400], max_items=10, max_tokens=5) == [[0]]
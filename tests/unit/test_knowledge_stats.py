@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.repository.knowledge_stats_repository import STAT_COLUMNS, aggregate_query
+from app.services import knowledge_service
+from app.services.knowledge_service import KnowledgeService
+
+COUNTS = {
+    "total_documents": 7,
+    "processed_documents": 4,
+    "pending_documents": 2,
+    "failed_documents": 1,
+    "total_chunks": 120,
+    "total_bytes": 3 * 1024 * 1024 + 512 * 1024,
+}
+
+EXPECTED = {
+    "total_documents": 7,
+    "processed": 4,
+    "pending": 2,
+    "failed": 1,
+    "total_chunks": 120,
+    "storage_mb": 3.5,
+}
+
+
+def stats_with(monkeypatch, row):
+    calls = {"aggregate": 0}
+
+    async def get(db):
+        return row
+
+    async def aggregate(db):
+        calls["aggregate"] += 1
+        return dict(COUNTS)
+
+    monkeypatch.setattr(knowledge_service.KnowledgeStatsRepository, "get", staticmethod(get))
+    monkeypatch.setattr(knowledge_service.KnowledgeStatsRepository, "aggregate", staticmethod(aggregate))
+    return asyncio.run(KnowledgeService.get_knowledge_stats(None)), calls
+
+
+def test_stats_come_from_the_counters_row(monkeypatch):
+    stats, calls = stats_with(monkeypatch, SimpleNamespace(**COUNTS))
+
+    assert stats == EXPECTED
+    assert calls["aggregate"] == 0
+
+
+def test_stats_fall_back_to_one_aggregate_before_seeding(monkeypatch):
+    stats, calls = stats_with(monkeypatch, None)
+
+    assert stats == EXPECTED
+    assert calls["aggregate"] == 1
+
+
+def test_aggregate_query_counts_every_column_in_one_pass():
+    query = aggregate_query()
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert [column.name for column in query.selected_columns] == list(STAT_COLUMNS)
+    assert sql.count("FROM") == 1
+    assert "GROUP BY" not in sql
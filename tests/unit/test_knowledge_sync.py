@@ -0,0 +1,36 @@
+from app.repository.knowledge_repository import KnowledgeRepository
+
+
+def plan(existing_hashes, new_hashes):
+    existing = [(f"id-{i}", h) for i, h in enumerate(existing_hashes)]
+    return KnowledgeRepository.plan_sync(existing, new_hashes)
+
+
+def test_first_ingest_inserts_everything():
+    assert plan([], ["a", "b", "c"]) == {"insert": [0, 1, 2], "delete": [], "unchanged": 0}
+
+
+def test_identical_reingest_touches_nothing():
+    assert plan(["a", "b", "c"], ["a", "b", "c"]) == {"insert": [], "delete": [], "unchanged": 3}
+
+
+def test_edited_document_only_changes_the_diff():
+    result = plan(["a", "b", "c", "d"], ["a", "x", "c", "d", "y"])
+
+    assert result == {"insert": [1, 4], "delete": ["id-1"], "unchanged": 3}
+
+
+def test_reordering_is_not_a_change():
+    assert plan(["a", "b", "c"], ["c", "a", "b"]) == {"insert": [], "delete": [], "unchanged": 3}
+
+
+def test_duplicate_chunks_are_matched_one_for_one():
+    # two stored copies of "a", three wanted: one insert (the first spare copy)
+    assert plan(["a", "a", "b"], ["a", "b", "a", "a"]) == {"insert": [0], "delete": [], "unchanged": 3}
+
+    # three stored copies of "a", one wanted: two deletes
+    assert plan(["a", "a", "a"], ["a"]) == {"insert": [], "delete": ["id-1", "id-2"], "unchanged": 1}
+
+
+def test_emptied_document_deletes_everything():
+    assert plan(["a", "b"], []) == {"insert": [], "delete": ["id-0", "id-1"], "unchanged": 0}
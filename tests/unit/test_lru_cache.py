@@ -0,0 +1,68 @@
+import time
+
+from app.utils.cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # a is now the most recent
+
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.current_bytes == 8
+    assert cache.evictions == 1
+
+
+def test_replacing_a_key_updates_its_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"12345678")
+    cache.put("a", b"12")
+
+    assert cache.current_bytes == 2
+    assert len(cache) == 1
+
+
+def test_value_larger_than_the_cache_is_not_stored():
+    cache = LRUCache(max_bytes=4)
+    cache.put("a", b"12")
+    cache.put("big", b"123456")
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"12"
+
+
+def test_max_entries():
+    cache = LRUCache(max_bytes=1000, max_entries=2)
+    for key in "abc":
+        cache.put(key, b"x")
+
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_bytes=100, ttl_seconds=30)
+    cache.put("a", b"x")
+
+    now[0] += 29
+    assert cache.get("a") == b"x"
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert cache.current_bytes == 0
+
+
+def test_stats_hit_rate():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", b"x")
+    cache.get("a")
+    cache.get("missing")
+
+    assert cache.stats()["hit_rate"] == 0.5
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from app.config.settings import settings
+from app.services.memory_vector_index import MemoryVectorIndex, _compose, _load, _current_generation
+
+DIM = 8
+
+
+def make_rows(count, start=0, documents=("doc-a", "doc-b", None), seed=0):
+    rng = np.random.default_rng(seed + start)
+    return [
+        {
+            "id": f"chunk-{i}",
+            "document_id": documents[i % len(documents)],
+            "file_name": f"file-{i % 3}.txt",
+            "content": f"chunk {i} – ünïcode content " * (i % 4 + 1),
+            "embedding": rng.standard_normal(DIM).astype(np.float32),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def snapshot_rows(snapshot):
+    return {
+        snapshot.ids[i].decode(): (
+            snapshot.document_ids[i].decode() or None,
+            snapshot.file_names[snapshot.file_index[i]],
+            snapshot.content_bytes(i).decode("utf-8"),
+            np.asarray(snapshot.embeddings[i], dtype=np.float32),
+        )
+        for i in range(len(snapshot))
+    }
+
+
+def assert_matches(snapshot, rows):
+    actual = snapshot_rows(snapshot)
+    assert sorted(actual) == sorted(row["id"] for row in rows)
+    for row in rows:
+        document_id, file_name, content, embedding = actual[row["id"]]
+        assert document_id == row["document_id"]
+        assert file_name == row["file_name"]
+        assert content == row["content"]
+        np.testing.assert_array_equal(embedding, row["embedding"])
+
+
+def test_compose_from_scratch(tmp_path):
+    rows = make_rows(10)
+
+    snapshot = _compose(str(tmp_path), None, rows, (), (), np.dtype(np.float32))
+
+    assert_matches(snapshot, rows)
+    assert snapshot.generation == _current_generation(str(tmp_path))
+    assert_matches(_load(str(tmp_path), snapshot.generation), rows)
+
+
+def test_compose_applies_deletes_replacements_and_inserts(tmp_path):
+    rows = make_rows(12)
+    old = _compose(str(tmp_path), None, rows, (), (), np.dtype(np.float32))
+
+    replaced = make_rows(1, start=4, seed=99)
+    added = make_rows(3, start=12)
+    snapshot = _compose(
+        str(tmp_path), old, replaced + added,
+        deleted_ids=["chunk-1", "chunk-7"],
+        deleted_documents=["doc-b"],
+        dtype=np.dtype(np.float32),
+    )
+
+    expected = [
+        row for row in rows
+        if row["id"] not in ("chunk-1", "chunk-7", "chunk-4") and row["document_id"] != "doc-b"
+    ] + replaced + added  # deleted_documents only applies to the old rows
+    assert_matches(snapshot, expected)
+    assert len(set(snapshot.file_names)) == len(snapshot.file_names)
+
+
+def test_compose_drops_unused_file_names(tmp_path):
+    rows = [dict(row, file_name=row["id"] + ".txt") for row in make_rows(3)]
+    old = _compose(str(tmp_path), None, rows, (), (), np.dtype(np.float32))
+
+    snapshot = _compose(str(tmp_path), old, (), ["chunk-1"], (), np.dtype(np.float32))
+
+    assert snapshot.file_names == ["chunk-0.txt", "chunk-2.txt"]
+    assert_matches(snapshot, [rows[0], rows[2]])
+
+
+def test_compose_without_changes_writes_nothing(tmp_path):
+    old = _compose(str(tmp_path), None, make_rows(4), (), (), np.dtype(np.float32))
+
+    assert _compose(str(tmp_path), old, (), ["missing"], ["missing-doc"], np.dtype(np.float32)) is None
+    assert _current_generation(str(tmp_path)) == old.generation
+
+
+def test_compose_delete_everything(tmp_path):
+    rows = make_rows(3)
+    old = _compose(str(tmp_path), None, rows, (), (), np.dtype(np.float32))
+
+    snapshot = _compose(str(tmp_path), old, (), [row["id"] for row in rows], (), np.dtype(np.float32))
+
+    assert len(snapshot) == 0
+    assert snapshot.embeddings.shape == (0, DIM)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "ip", "l2"])
+def test_top_k_matches_brute_force(tmp_path, monkeypatch, metric):
+    monkeypatch.setattr(settings, "VECTOR_METRIC", metric)
+    rows = make_rows(200)
+    snapshot = _compose(str(tmp_path), None, rows, (), (), np.dtype(np.float32))
+    query = np.random.default_rng(7).standard_normal(DIM).astype(np.float32)
+
+    matrix = np.stack([row["embedding"] for row in rows])
+    if metric == "cosine":
+        distances = 1.0 - matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    elif metric == "ip":
+        distances = -(matrix @ query)
+    else:
+        distances = np.linalg.norm(matrix - query, axis=1)
+    expected = [rows[i]["id"] for i in np.argsort(distances)[:10]]
+
+    results = MemoryVectorIndex._top_k(snapshot, query, 10)
+
+    assert [row["id"] for row in results] == expected
+    np.testing.assert_allclose([row["distance"] for row in results], np.sort(distances)[:10], rtol=1e-4, atol=1e-5)
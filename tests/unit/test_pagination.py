@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor, next_page_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(created_at, "row-1")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "row-1")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", encode_cursor(datetime(2026, 1, 1), "x")[:-3]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_no_cursor_means_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+def test_next_page_cursor_only_after_a_full_page():
+    rows = [SimpleNamespace(created_at=datetime(2026, 1, day), id=f"row-{day}") for day in (3, 2, 1)]
+
+    assert next_page_cursor(rows, limit=4) is None
+    assert decode_cursor(next_page_cursor(rows, limit=3)) == (datetime(2026, 1, 1), "row-1")
@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import rag_service
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.rag_service import RAGService
+
+ROWS = [
+    {
+        "id": f"chunk-{i}",
+        "document_id": "doc-1",
+        "content": f"lexical hit {i}",
+        "file_name": "faq.txt",
+        "distance": None,
+        "lexical_match": True,
+        "embedding": None,
+    }
+    for i in range(2)
+]
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    """stream_answer with retrieval and the LLM stubbed out"""
+    calls = {"embeddings": 0, "llm": 0}
+
+    async def refresh(*args, **kwargs):
+        pass
+
+    async def get_query_embedding(*args, **kwargs):
+        calls["embeddings"] += 1
+        raise RuntimeError("embeddings unavailable")
+
+    async def semantic_search(db, query, **kwargs):
+        return [dict(row) for row in ROWS]
+
+    async def stream_llm(query, context):
+        calls["llm"] += 1
+        yield "an answer"
+
+    monkeypatch.setattr(rag_service.embedding_spaces, "refresh", refresh)
+    monkeypatch.setattr(RAGService, "get_query_embedding", get_query_embedding)
+    monkeypatch.setattr(RAGService, "semantic_search", semantic_search)
+    monkeypatch.setattr(rag_service.AsyncLLMService, "stream_answer", stream_llm)
+    monkeypatch.setattr(rag_service, "answer_cache", SemanticAnswerCache(100, 60, 0.95))
+    monkeypatch.setattr(rag_service.settings, "ANSWER_CACHE_ENABLED", True)
+    return calls
+
+
+def answer(query, mode):
+    async def run():
+        return [event async for event in RAGService.stream_answer(None, query, mode=mode)]
+    return dict(asyncio.run(run()))
+
+
+def test_lexical_answer_never_embeds_the_query(rag):
+    events = answer("Opening hours?", "lexical")
+
+    assert events["done"] == {"answer": "an answer", "cached": False}
+    assert events["metadata"]["mode"] == "lexical"
+    assert rag["embeddings"] == 0
+
+
+def test_lexical_answer_is_cached_by_query_text(rag):
+    answer("Opening  hours?", "lexical")
+
+    assert answer("opening hours?", "lexical")["done"]["cached"] is True
+    assert answer("closing hours?", "lexical")["done"]["cached"] is False
+    assert rag["llm"] == 2
+
+
+def test_vector_modes_still_embed(rag):
+    with pytest.raises(RuntimeError):
+        answer("Opening hours?", "hybrid")
+    assert rag["embeddings"] == 1
+
+
+def test_answer_cache_matches_similar_embeddings():
+    cache = SemanticAnswerCache(100, 60, 0.95)
+    embedding = np.array([1.0, 0.0], dtype=np.float32)
+    cache.store(embedding, ["a", "b"], ["doc"], "cached answer", "first phrasing")
+
+    close = np.array([0.99, 0.14], dtype=np.float32)
+    far = np.array([0.0, 1.0], dtype=np.float32)
+    assert cache.lookup(close, ["b", "a"], "second phrasing") == "cached answer"
+    assert cache.lookup(far, ["a", "b"], "third phrasing") is None
+    assert cache.lookup(close, ["a"], "second phrasing") is None
+
+    cache.invalidate_documents(["doc"])
+    assert cache.lookup(embedding, ["a", "b"], "first phrasing") is None